@@ -9,25 +9,20 @@ It outputs JSON for the Claude command to process.
 import sys
 import os
 import json
-import subprocess
 import glob
 import shutil
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hooks'))
+import git_metadata
+import write_journal
+
 
 def get_git_branch():
     """Get current git branch name if in a git repository."""
-    try:
-        result = subprocess.run(
-            ['git', 'branch', '--show-current'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return None
+    repo = git_metadata.find_repository(os.getcwd())
+    return repo.branch() if repo else None
 
 
 def find_claude_project_root(start_path=None):
@@ -59,16 +54,8 @@ def find_claude_project_root(start_path=None):
 
 def get_git_root():
     """Get git repository root directory."""
-    try:
-        result = subprocess.run(
-            ['git', 'rev-parse', '--show-toplevel'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return Path(result.stdout.strip())
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return None
+    repo = git_metadata.find_repository(os.getcwd())
+    return Path(repo.worktree) if repo else None
 
 
 def sanitize_filename(name):
@@ -97,6 +84,7 @@ def copy_session_file(source_path, target_path):
     """Copy session file from source to target path."""
     try:
         shutil.copy2(source_path, target_path)
+        write_journal.record(target_path, os.path.getsize(target_path), 'copy', source_path)
         return True
     except Exception as e:
         return False, str(e)
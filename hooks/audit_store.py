@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Central SQLite audit store for PreToolUse hook calls.
+
+Every evaluated tool call (allowed or blocked) becomes one row in a single
+database shared by all projects, instead of a JSON log in each project's
+logs/ directory. Rows are indexed on session_id, tool_name, cwd, timestamp
+and verdict, so questions like "blocked rm commands last week" or "tool mix
+per session" are answered from the indexes.
+
+The guard daemon batches inserts through AuditWriter; a standalone hook
+process inserts its single row directly. Large payload values are kept in
+a blob store next to the database (see blob_store.py); payload() returns
+an event's payload with them put back. Existing JSONL/JSON logs can be
+imported (they never stored a timestamp, so imported rows have none).
+
+Usage:
+    python3 audit_store.py import LOG_DIR [LOG_DIR ...]
+    python3 audit_store.py query [--verdict block] [--rule rm_] [--tool Bash]
+                                 [--session ID] [--cwd DIR] [--since 7d]
+                                 [--limit N]
+    python3 audit_store.py mix [--since 7d] [--session ID]
+    python3 audit_store.py payload EVENT_ID
+    python3 audit_store.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import blob_store
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'audit.sqlite')
+
+# Never wait longer than this (seconds) for another process holding the lock
+BUSY_TIMEOUT = 0.5
+
+# AuditWriter flushes after this many rows or this many seconds
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL,          -- NULL for rows imported from old logs
+    session_id TEXT,
+    tool_name TEXT,
+    cwd TEXT,
+    verdict TEXT NOT NULL,   -- 'allow' or 'block'
+    rule TEXT,
+    command TEXT,
+    file_path TEXT,
+    payload TEXT NOT NULL,   -- The hook payload as JSON, large values as blob references
+    import_key TEXT UNIQUE   -- Deduplicates imported log records
+);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_verdict ON events (verdict, timestamp);
+CREATE INDEX IF NOT EXISTS events_session ON events (session_id, tool_name);
+CREATE INDEX IF NOT EXISTS events_tool ON events (tool_name, timestamp);
+CREATE INDEX IF NOT EXISTS events_cwd ON events (cwd, timestamp);
+"""
+
+COLUMNS = ('timestamp', 'session_id', 'tool_name', 'cwd', 'verdict', 'rule',
+           'command', 'file_path', 'payload', 'import_key')
+
+INSERT = 'INSERT OR IGNORE INTO events (%s) VALUES (%s)' % (
+    ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS)))
+
+
+def make_event(input_data, blocked, rule=None, cwd=None, timestamp=None, import_key=None):
+    """
+    Build an events row (a tuple in COLUMNS order) from a hook payload. The
+    payload stays a dict until AuditStore.add() stores it.
+    """
+    tool_input = input_data.get('tool_input')
+    if not isinstance(tool_input, dict):
+        tool_input = {}
+    command = tool_input.get('command')
+    file_path = tool_input.get('file_path') or tool_input.get('notebook_path') or tool_input.get('path')
+    return (
+        time.time() if timestamp is None and import_key is None else timestamp,
+        input_data.get('session_id'),
+        input_data.get('tool_name'),
+        input_data.get('cwd') or cwd,
+        'block' if blocked else 'allow',
+        rule,
+        command if isinstance(command, str) else None,
+        file_path if isinstance(file_path, str) else None,
+        input_data,
+        import_key,
+    )
+
+
+class AuditStore:
+    """SQLite store of hook events; use add() with batches of make_event() rows."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.blobs = blob_store.BlobStore(os.path.join(os.path.dirname(path) or '.', 'blobs'))
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def encode_payload(self, payload):
+        """Serialize a payload dict, moving large values to the blob store."""
+        if not isinstance(payload, str):
+            if blob_store.MIN_BYTES > 0:
+                payload = self.blobs.externalize(payload)
+            payload = json.dumps(payload, separators=(',', ':'))
+        return payload
+
+    def add(self, events):
+        """Insert a batch of events in one transaction; returns rows inserted."""
+        payload_index = COLUMNS.index('payload')
+        events = [event[:payload_index] + (self.encode_payload(event[payload_index]),)
+                  + event[payload_index + 1:] for event in events]
+        with self.lock, self.db:
+            before = self.db.total_changes
+            self.db.executemany(INSERT, events)
+            return self.db.total_changes - before
+
+    def import_log_dir(self, log_dir, batch_size=5000):
+        """
+        Import the records of a hook log directory. Re-importing is a no-op:
+        each record is keyed by its content and how many identical records
+        preceded it in the directory. Returns the number of new rows.
+        """
+        import tool_use_log
+
+        cwd = os.path.dirname(os.path.abspath(log_dir))
+        seen = {}
+        batch = []
+        inserted = 0
+        for record in tool_use_log.iter_records(log_dir, rehydrate=True):
+            if not isinstance(record, dict):
+                continue
+            text = json.dumps(record, sort_keys=True, separators=(',', ':'))
+            digest = hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+            seen[digest] = seen.get(digest, 0) + 1
+            key = f'{os.path.abspath(log_dir)}:{digest}:{seen[digest]}'
+            batch.append(make_event(record, False, cwd=cwd, import_key=key))
+            if len(batch) >= batch_size:
+                inserted += self.add(batch)
+                batch = []
+        if batch:
+            inserted += self.add(batch)
+        return inserted
+
+    def query(self, verdict=None, rule=None, tool_name=None, session_id=None,
+              cwd=None, since=None, limit=100):
+        """Return matching events (newest first) as dicts without the payload (see payload())."""
+        where, params = [], []
+        for column, value in (('verdict', verdict), ('tool_name', tool_name),
+                              ('session_id', session_id), ('cwd', cwd)):
+            if value is not None:
+                where.append(f'{column} = ?')
+                params.append(value)
+        if rule is not None:
+            # Prefix match, e.g. 'rm_' for every rm rule
+            where.append("rule LIKE ? ESCAPE '\\'")
+            params.append(rule.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if since is not None:
+            where.append('timestamp >= ?')
+            params.append(since)
+        sql = ('SELECT id, timestamp, session_id, tool_name, cwd, verdict, rule, command, file_path '
+               'FROM events')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY timestamp DESC LIMIT ?'
+        params.append(limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        names = ('id', 'timestamp', 'session_id', 'tool_name', 'cwd', 'verdict', 'rule', 'command', 'file_path')
+        return [dict(zip(names, row)) for row in rows]
+
+    def payload(self, event_id, rehydrate=True):
+        """Return the hook payload of an event, or None if there is no such event."""
+        with self.lock:
+            row = self.db.execute('SELECT payload FROM events WHERE id = ?', (event_id,)).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[0])
+        return self.blobs.rehydrate(payload) if rehydrate else payload
+
+    def tool_mix(self, session_id=None, since=None):
+        """Return {session_id: {tool_name: calls}}."""
+        where, params = [], []
+        if session_id is not None:
+            where.append('session_id = ?')
+            params.append(session_id)
+        if since is not None:
+            where.append('timestamp >= ?')
+            params.append(since)
+        sql = 'SELECT session_id, tool_name, COUNT(*) FROM events'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' GROUP BY session_id, tool_name'
+        mix = {}
+        with self.lock:
+            for session, tool_name, calls in self.db.execute(sql, params):
+                mix.setdefault(session, {})[tool_name] = calls
+        return mix
+
+    def stats(self):
+        """Return row counts by verdict and the time span covered."""
+        with self.lock:
+            counts = dict(self.db.execute('SELECT verdict, COUNT(*) FROM events GROUP BY verdict'))
+            first, last = self.db.execute('SELECT MIN(timestamp), MAX(timestamp) FROM events').fetchone()
+        return {'events': sum(counts.values()), 'allowed': counts.get('allow', 0),
+                'blocked': counts.get('block', 0), 'first': first, 'last': last}
+
+    def close(self):
+        self.db.close()
+
+
+class AuditWriter:
+    """
+    Batches events for an AuditStore on a background thread, so callers only
+    pay for a queue put. Used by the guard daemon.
+    """
+
+    def __init__(self, store, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, event):
+        self.queue.put(event)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    event = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            if batch:
+                try:
+                    self.store.add(batch)
+                except sqlite3.Error as e:
+                    self.errors += len(batch)
+                    print(f"audit_store: dropped {len(batch)} events: {e}", file=sys.stderr)
+
+    def close(self):
+        """Flush pending events and stop the thread."""
+        self.queue.put(None)
+        self.thread.join()
+
+
+def default_path():
+    return os.environ.get('CLAUDE_GUARD_AUDIT_DB', DEFAULT_PATH)
+
+
+def parse_since(value):
+    """'7d', '12h', '30m' or an epoch timestamp -> epoch seconds."""
+    units = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+    if value[-1:] in units:
+        return time.time() - float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tool-use audit store')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help='Import hook log directories')
+    importer.add_argument('log_dirs', nargs='+')
+
+    query = commands.add_parser('query', help='List matching events, newest first')
+    query.add_argument('--verdict', choices=('allow', 'block'))
+    query.add_argument('--rule', help="Rule name prefix, e.g. 'rm_'")
+    query.add_argument('--tool', dest='tool_name')
+    query.add_argument('--session', dest='session_id')
+    query.add_argument('--cwd')
+    query.add_argument('--since', type=parse_since, help="e.g. 7d, 12h or an epoch time")
+    query.add_argument('--limit', type=int, default=100)
+
+    mix = commands.add_parser('mix', help='Tool calls per session')
+    mix.add_argument('--session', dest='session_id')
+    mix.add_argument('--since', type=parse_since)
+
+    payload = commands.add_parser('payload', help='Print the full payload of an event')
+    payload.add_argument('event_id', type=int)
+
+    commands.add_parser('stats', help='Event counts')
+    args = parser.parse_args()
+
+    store = AuditStore(default_path())
+    if args.command == 'import':
+        for log_dir in args.log_dirs:
+            print(f"{log_dir}: imported {store.import_log_dir(log_dir)} records")
+    elif args.command == 'query':
+        for row in store.query(args.verdict, args.rule, args.tool_name, args.session_id,
+                               args.cwd, args.since, args.limit):
+            print(json.dumps(row))
+    elif args.command == 'payload':
+        payload = store.payload(args.event_id)
+        if payload is None:
+            print(f"No event {args.event_id}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(payload, indent=2))
+    elif args.command == 'mix':
+        print(json.dumps(store.tool_mix(args.session_id, args.since), indent=2))
+    else:
+        print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
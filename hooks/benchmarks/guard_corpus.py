@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Differential corpus harness for PreToolUse guard implementations.
+
+Runs one corpus of tool calls through any number of guard implementations,
+each in its own pool of worker processes, and reports per implementation
+its throughput (calls per second) and every call whose verdict differs from
+the first (reference) implementation or from the verdict the corpus
+expects. A faster matcher can ship once it reports no disagreements:
+
+    python3 guard_corpus.py git:HEAD worktree --generate 50000
+
+Implementations (IMPL):
+    worktree        hooks/ in this checkout
+    git:REV         hooks/*.py as of a git revision, e.g. git:HEAD~3
+    PATH[:FUNC]     a module file, or a directory holding pre_tool_use.py;
+                    FUNC(tool_name, tool_input) returns a bool or a Verdict
+
+Modules are called through check_tool_use() when they have it, otherwise
+through is_env_file_access() and is_dangerous_rm_command() as the hook's
+main() did before check_tool_use existed.
+
+Corpus (all sources are combined):
+    --generate N    N calls from a seeded grammar of rm, .env and compound
+                    commands and file-tool paths (default 20000, --seed)
+    --logs DIR      payloads recorded in a hook log directory
+                    (default: hooks/logs and agents/logs)
+    --corpus FILE   JSONL of {"tool_name", "tool_input", "expect": "block" |
+                    "allow"}; "{home}" in strings is replaced by the user's
+                    home (default: tests/corpus/guard_regression.jsonl)
+
+Prints a JSON report and exits 1 if any implementation disagrees with the
+reference or with an expectation.
+
+Usage:
+    python3 guard_corpus.py [--generate N] [--seed S] [--logs DIR ...]
+                            [--corpus FILE ...] [--jobs J] [--rules]
+                            [--show N] [--output report.json] IMPL [IMPL ...]
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(HOOKS_DIR)
+sys.path.insert(0, HOOKS_DIR)
+
+import tool_use_log
+
+DEFAULT_LOG_DIRS = [os.path.join(REPO_DIR, 'hooks', 'logs'), os.path.join(REPO_DIR, 'agents', 'logs')]
+REGRESSION_CORPUS = os.path.join(HOOKS_DIR, 'tests', 'corpus', 'guard_regression.jsonl')
+
+# Calls per task sent to a worker
+CHUNK_SIZE = 500
+
+# Settings that would make workers write caches and stats while checking
+WORKER_ENV_OFF = ('CLAUDE_GUARD_VERDICT_CACHE', 'CLAUDE_GUARD_AUDIT',
+                  'CLAUDE_GUARD_RULE_STATS', 'CLAUDE_HOOK_METRICS_TEXTFILE')
+
+
+# Corpus
+
+RM_PREFIXES = ['', '', '', 'sudo ', 'command ', 'env FOO=1 ', 'nohup ', 'time ', '/bin/']
+RM_FLAGS = ['-rf', '-fr', '-Rf', '-r -f', '-f -r', '--recursive --force', '--rec --forc',
+            '-rfv', '-rf --', '-r', '-f', '', '-i']
+DANGEROUS_PATHS = ['/', '/*', '~', '~/', '$HOME', '.', '..', '../*', '*', '/usr', '/usr/local',
+                   '/etc', '/etc/nginx', '/var', '/var/log', '/boot', '/sys', '/proc', '.git',
+                   'repo/.git', './.git/objects', '~/Documents', '/home', '/opt/app']
+SAFE_PATHS = ['node_modules', 'build', 'dist', './build', './dist/output', '../node_modules',
+              '../build', 'cache/', 'logs/', '.cache', '__pycache__', '.pytest_cache', 'temp.log',
+              'out.tmp', 'coverage', 'target', '.next', '{home}/projects/app/node_modules',
+              '{home}/code/site/build', '{home}/tmp/debug.log', 'src/generated', 'tmp']
+SEPARATORS = [' && ', '; ', ' || ', ' | ', '\n']
+OTHER_COMMANDS = ['ls -la', 'git status', 'npm run build', 'pytest -q', 'echo rm -rf /',
+                  'git rm -rf --cached old', 'grep -r "rm -rf" .', 'find . -name "*.pyc" -delete',
+                  'cat .env', 'cat .env.example', 'cp .env.sample .env.local', 'source .env.production',
+                  'echo KEY=1 >> .env', 'cat README.md', 'docker rm -f web', 'make clean']
+FILE_TOOLS = ['Read', 'Edit', 'MultiEdit', 'Write']
+FILE_PATHS = ['{home}/app/.env', '.env', '.env.local', 'config/.env.production', '.env.example',
+              '.env.sample', 'src/main.py', 'README.md', '/etc/passwd', 'docs/env.md',
+              'app/.environment', 'tests/.envrc']
+OTHER_TOOLS = ['Glob', 'Grep', 'TodoWrite', 'WebFetch', 'mcp__Playwright__browser_click']
+
+
+def quote(rng, word):
+    style = rng.random()
+    if style < 0.1:
+        return f'"{word}"'
+    if style < 0.15:
+        return f"'{word}'"
+    return word
+
+
+def generate_rm(rng):
+    paths = [quote(rng, rng.choice(DANGEROUS_PATHS if rng.random() < 0.35 else SAFE_PATHS))
+             for _ in range(rng.choice((0, 1, 1, 1, 2, 3)))]
+    words = [rng.choice(RM_PREFIXES) + 'rm', rng.choice(RM_FLAGS)] + paths
+    return ' '.join(word for word in words if word)
+
+
+def generate_command(rng, depth=0):
+    parts = [generate_rm(rng) if rng.random() < 0.6 else rng.choice(OTHER_COMMANDS)
+             for _ in range(rng.choice((1, 1, 1, 2, 3)))]
+    command = parts[0]
+    for part in parts[1:]:
+        command += rng.choice(SEPARATORS) + part
+    wrap = rng.random()
+    if depth < 2 and wrap < 0.05:
+        return f'echo $({generate_command(rng, depth + 1)})'
+    if depth < 2 and wrap < 0.08:
+        return f'({generate_command(rng, depth + 1)})'
+    if depth < 2 and wrap < 0.10:
+        return f'for d in a b; do {generate_command(rng, depth + 1)}; done'
+    return command
+
+
+def generate_calls(count, seed=0):
+    """`count` tool calls from the grammar above; the same seed gives the same calls."""
+    rng = random.Random(seed)
+    calls = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.8:
+            calls.append({'tool_name': 'Bash', 'tool_input': {'command': generate_command(rng)}})
+        elif kind < 0.95:
+            calls.append({'tool_name': rng.choice(FILE_TOOLS),
+                          'tool_input': {'file_path': rng.choice(FILE_PATHS)}})
+        else:
+            calls.append({'tool_name': rng.choice(OTHER_TOOLS),
+                          'tool_input': {'pattern': rng.choice(DANGEROUS_PATHS + FILE_PATHS)}})
+    return [expand_home(call) for call in calls]
+
+
+def expand_home(value, home=None):
+    """Replace "{home}" in every string of `value` with the user's home directory."""
+    home = home or os.path.expanduser('~')
+    if isinstance(value, str):
+        return value.replace('{home}', home)
+    if isinstance(value, dict):
+        return {key: expand_home(item, home) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand_home(item, home) for item in value]
+    return value
+
+
+def recorded_calls(log_dirs):
+    """Tool calls recorded in hook log directories."""
+    calls = []
+    for log_dir in log_dirs:
+        if not os.path.isdir(log_dir):
+            continue
+        for record in tool_use_log.iter_records(log_dir, rehydrate=True):
+            if isinstance(record.get('tool_input'), dict) and record.get('tool_name'):
+                calls.append({'tool_name': record['tool_name'], 'tool_input': record['tool_input']})
+    return calls
+
+
+def corpus_calls(paths):
+    """Calls (with their "expect" verdicts) from JSONL corpus files."""
+    calls = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    calls.append(expand_home(json.loads(line)))
+    return calls
+
+
+# Implementations
+
+def export_revision(rev, directory):
+    """Write hooks/*.py as of git revision `rev` into `directory`."""
+    names = subprocess.run(['git', 'ls-tree', '--name-only', rev, 'hooks/'], cwd=REPO_DIR,
+                           capture_output=True, text=True, check=True).stdout.split()
+    for name in names:
+        if name.endswith('.py'):
+            source = subprocess.run(['git', 'show', f'{rev}:{name}'], cwd=REPO_DIR,
+                                    capture_output=True, check=True).stdout
+            with open(os.path.join(directory, os.path.basename(name)), 'wb') as f:
+                f.write(source)
+
+
+def resolve(spec, staging):
+    """IMPL spec -> (module path, function name or None)."""
+    if spec == 'worktree':
+        return os.path.join(HOOKS_DIR, 'pre_tool_use.py'), None
+    if spec.startswith('git:'):
+        directory = os.path.join(staging, f'impl{len(os.listdir(staging))}')
+        os.makedirs(directory)
+        export_revision(spec[4:], directory)
+        return os.path.join(directory, 'pre_tool_use.py'), None
+
+    path, function = spec, None
+    if not os.path.exists(spec) and ':' in spec:
+        path, _, function = spec.rpartition(':')
+    if os.path.isdir(path):
+        path = os.path.join(path, 'pre_tool_use.py')
+    if not os.path.isfile(path):
+        raise ValueError(f"{spec}: no such module")
+    return os.path.abspath(path), function
+
+
+_CHECK = None
+
+
+def load_implementation(module_path, function):
+    """Worker initializer: import the implementation and set _CHECK."""
+    global _CHECK
+    for name in WORKER_ENV_OFF:
+        os.environ.pop(name, None)
+    # Its sibling modules (shell_lexer, ...) must shadow the ones in hooks/
+    sys.path.insert(0, os.path.dirname(module_path))
+    name = os.path.splitext(os.path.basename(module_path))[0]
+    spec = importlib.util.spec_from_file_location(name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+    if function:
+        check = getattr(module, function)
+    elif hasattr(module, 'check_tool_use'):
+        check = module.check_tool_use
+    else:
+        def check(tool_name, tool_input):
+            if module.is_env_file_access(tool_name, tool_input):
+                return True
+            return tool_name == 'Bash' and module.is_dangerous_rm_command(tool_input.get('command', ''))
+    _CHECK = check
+
+
+def check_chunk(calls):
+    """Worker task: [(blocked, rule)] for `calls` and the seconds spent checking."""
+    results = []
+    started = time.perf_counter()
+    for call in calls:
+        try:
+            verdict = _CHECK(call['tool_name'], call['tool_input'])
+        except Exception as e:
+            results.append((None, f'error:{type(e).__name__}'))
+            continue
+        if hasattr(verdict, 'blocked'):
+            results.append((bool(verdict.blocked), getattr(verdict, 'rule', None)))
+        else:
+            results.append((bool(verdict), None))
+    return results, time.perf_counter() - started
+
+
+def run_implementation(module_path, function, calls, jobs):
+    """Check `calls` in `jobs` worker processes; returns (verdicts, stats)."""
+    chunks = [calls[i:i + CHUNK_SIZE] for i in range(0, len(calls), CHUNK_SIZE)]
+    # spawn: workers must not inherit guard modules imported by another implementation
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=load_implementation,
+                             initargs=(module_path, function)) as pool:
+        pool.submit(time.sleep, 0).result()  # Start-up is not part of the throughput
+        started = time.perf_counter()
+        results = list(pool.map(check_chunk, chunks))
+        wall = time.perf_counter() - started
+
+    verdicts = [verdict for chunk_verdicts, _ in results for verdict in chunk_verdicts]
+    busy = sum(seconds for _, seconds in results)
+    return verdicts, {
+        'calls_per_second': round(len(calls) / wall, 1) if wall else None,
+        'calls_per_second_per_worker': round(len(calls) / busy, 1) if busy else None,
+        'wall_seconds': round(wall, 3),
+        'blocked': sum(1 for blocked, _ in verdicts if blocked),
+        'errors': sum(1 for blocked, _ in verdicts if blocked is None),
+    }
+
+
+def compare(specs, calls, verdicts_by_spec, rules=False, show=20):
+    """Build the disagreement and expectation sections of the report."""
+    reference = specs[0]
+
+    def key(verdict):
+        return verdict if rules else verdict[0]
+
+    disagreements, failures = [], []
+    counts = {spec: {'disagreements': 0, 'expectation_failures': 0} for spec in specs}
+    for i, call in enumerate(calls):
+        verdicts = {spec: verdicts_by_spec[spec][i] for spec in specs}
+        differing = [spec for spec in specs[1:] if key(verdicts[spec]) != key(verdicts[reference])]
+        for spec in differing:
+            counts[spec]['disagreements'] += 1
+        if differing and len(disagreements) < show:
+            disagreements.append({'tool_name': call['tool_name'], 'tool_input': call['tool_input'],
+                                  'verdicts': {spec: list(v) for spec, v in verdicts.items()}})
+
+        expect = call.get('expect')
+        if expect is None:
+            continue
+        wrong = [spec for spec in specs if verdicts[spec][0] is not (expect == 'block')]
+        for spec in wrong:
+            counts[spec]['expectation_failures'] += 1
+        if wrong and len(failures) < show:
+            failures.append({'tool_name': call['tool_name'], 'tool_input': call['tool_input'],
+                             'expect': expect, 'verdicts': {spec: list(verdicts[spec]) for spec in wrong}})
+    return counts, disagreements, failures
+
+
+def run(specs, calls, jobs, rules=False, show=20):
+    """Check `calls` with every implementation; returns the report document."""
+    report = {'python': sys.version.split()[0], 'calls': len(calls), 'jobs': jobs,
+              'reference': specs[0], 'implementations': {}}
+    verdicts_by_spec = {}
+    with tempfile.TemporaryDirectory() as staging:
+        for spec in specs:
+            module_path, function = resolve(spec, staging)
+            verdicts_by_spec[spec], stats = run_implementation(module_path, function, calls, jobs)
+            report['implementations'][spec] = stats
+
+    counts, disagreements, failures = compare(specs, calls, verdicts_by_spec, rules, show)
+    for spec in specs:
+        report['implementations'][spec].update(counts[spec])
+    report['disagreements'] = disagreements
+    report['expectation_failures'] = failures
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Differential corpus harness for guard implementations')
+    parser.add_argument('implementations', nargs='+', metavar='IMPL',
+                        help='worktree, git:REV or PATH[:FUNC]; the first is the reference')
+    parser.add_argument('--generate', type=int, default=20000, help='Generated calls (default 20000)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated calls')
+    parser.add_argument('--logs', action='append', help='Hook log directory with recorded calls')
+    parser.add_argument('--corpus', action='append', help='JSONL corpus file with expected verdicts')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes per implementation')
+    parser.add_argument('--rules', action='store_true', help='Also compare the deciding rule, not only block/allow')
+    parser.add_argument('--show', type=int, default=20, help='Disagreements to include in the report')
+    parser.add_argument('--output', help='Write the report JSON here as well')
+    args = parser.parse_args()
+
+    calls = (corpus_calls(args.corpus or [REGRESSION_CORPUS])
+             + recorded_calls(args.logs or DEFAULT_LOG_DIRS)
+             + generate_calls(args.generate, args.seed))
+    try:
+        report = run(args.implementations, calls, max(1, args.jobs), args.rules, args.show)
+    except (ValueError, subprocess.CalledProcessError) as e:
+        parser.error(str(e))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    failed = any(stats['disagreements'] or stats['expectation_failures']
+                 for stats in report['implementations'].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
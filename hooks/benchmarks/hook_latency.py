@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for the PreToolUse hook.
+
+Replays the tool_input payloads recorded in hooks/logs and agents/logs plus
+synthetic large payloads, and measures three ways of running the guard:
+
+    cold        a fresh `python3 pre_tool_use.py` process per call
+    warm        guard_client.py talking to a running guard daemon
+                (what settings.json runs)
+    in-process  pre_tool_use.evaluate() + log_tool_use() in this interpreter
+
+Reports p50/p95/p99 per mode as JSON. Save a baseline once, then compare
+later runs against it; the comparison exits 1 on a regression. A run that
+cannot be timed honestly exits 2: a hook that exits other than 0 or 2, or
+a guard daemon that does not come up (guard_client.py would fall back to
+evaluating in its own process and warm would time that instead).
+
+Usage:
+    python3 hook_latency.py [--repeat N] [--modes cold,warm,in-process]
+                            [--output results.json] [--compare baseline.json]
+                            [--tolerance 0.25] [LOG_DIR ...]
+"""
+
+import argparse
+import json
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(HOOKS_DIR)
+sys.path.insert(0, HOOKS_DIR)
+
+import tool_use_log
+
+DEFAULT_LOG_DIRS = [os.path.join(REPO_DIR, 'hooks', 'logs'), os.path.join(REPO_DIR, 'agents', 'logs')]
+MODES = ('cold', 'warm', 'in-process')
+
+# Ignore regressions smaller than this many milliseconds (timer noise)
+ABSOLUTE_SLACK_MS = 0.5
+
+# Allow and block; anything else is a crashed hook
+HOOK_EXIT_CODES = (0, 2)
+
+# Seconds to wait for the guard daemon's socket
+DAEMON_START_TIMEOUT = 5.0
+
+
+class BenchmarkError(RuntimeError):
+    """The hooks under test did not run as they do in production."""
+
+
+def recorded_payloads(log_dirs):
+    """Hook payloads recorded in the given log directories."""
+    payloads = []
+    for log_dir in log_dirs:
+        if os.path.isdir(log_dir):
+            payloads.extend(r for r in tool_use_log.iter_records(log_dir) if 'tool_name' in r)
+    return payloads
+
+
+def synthetic_payloads():
+    """Large payloads that stress the lexer, the matchers and the logger."""
+    def payload(tool_name, tool_input):
+        return {'session_id': 'benchmark', 'hook_event_name': 'PreToolUse',
+                'tool_name': tool_name, 'tool_input': tool_input}
+
+    heredoc_line = 'echo "step $i" && ls -la | grep -v node_modules; # done\n'
+    return [
+        payload('Bash', {'command': "cat <<'EOF' > notes.md\n" + heredoc_line * 2000 + 'EOF'}),
+        payload('Bash', {'command': 'cat <<EOF > notes.md\n' + heredoc_line * 20000 + 'EOF\nrm -rf dist'}),
+        payload('Bash', {'command': ' && '.join(f'rm -rf build/out{i}' for i in range(500))}),
+        payload('Write', {'file_path': '/tmp/bench/big.txt', 'content': 'x' * (1024 * 1024)}),
+        payload('TodoWrite', {'todos': [{'content': f'Task {i} ' * 20, 'status': 'pending',
+                                         'priority': 'high', 'id': str(i)} for i in range(200)]}),
+    ]
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile (q in 0..100) of a sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples_ms):
+    values = sorted(samples_ms)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'mean_ms': round(sum(values) / len(values), 3) if values else 0.0,
+        'max_ms': round(values[-1], 3) if values else 0.0,
+    }
+
+
+def time_process(argv, payload_text, cwd, env):
+    started = time.perf_counter()
+    result = subprocess.run(argv, input=payload_text, cwd=cwd, env=env,
+                            capture_output=True, text=True, timeout=60)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.returncode not in HOOK_EXIT_CODES:
+        raise BenchmarkError(f"{os.path.basename(argv[-1])} exited with status {result.returncode}: "
+                             f"{result.stderr.strip()[-500:]}")
+    return elapsed_ms
+
+
+def bench_cold(payloads, repeat, workdir, env):
+    argv = [sys.executable, os.path.join(HOOKS_DIR, 'pre_tool_use.py')]
+    return [time_process(argv, json.dumps(p), workdir, env)
+            for _ in range(repeat) for p in payloads]
+
+
+def start_daemon(workdir, env):
+    """
+    Run a guard daemon on a socket in `workdir`; returns (process, socket
+    path). It runs in its own process: importing guard_server here would
+    turn on its verdict cache, audit and rule stats defaults for the
+    in-process mode as well. Raises BenchmarkError if the daemon exits or
+    its socket does not appear within DAEMON_START_TIMEOUT.
+    """
+    socket_path = os.path.join(workdir, 'guard.sock')
+    log_path = os.path.join(workdir, 'guard.log')
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen([sys.executable, os.path.join(HOOKS_DIR, 'guard_server.py'),
+                                    '--socket', socket_path], env=env, cwd=workdir,
+                                   stdout=subprocess.DEVNULL, stderr=log)
+    deadline = time.monotonic() + DAEMON_START_TIMEOUT
+    while process.poll() is None:
+        try:
+            if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                return process, socket_path
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            process.terminate()
+            process.wait(timeout=10)
+            raise BenchmarkError(f"guard daemon did not create {socket_path} "
+                                 f"within {DAEMON_START_TIMEOUT:g}s")
+        time.sleep(0.02)
+    with open(log_path, errors='replace') as log:
+        raise BenchmarkError(f"guard daemon exited with status {process.returncode}: "
+                             f"{log.read().strip()[-500:]}")
+
+
+def bench_warm(payloads, repeat, workdir, env):
+    argv = [sys.executable, os.path.join(HOOKS_DIR, 'guard_client.py')]
+    return [time_process(argv, json.dumps(p), workdir, env)
+            for _ in range(repeat) for p in payloads]
+
+
+def bench_in_process(payloads, repeat, workdir, env):
+    import pre_tool_use
+
+    samples = []
+    for _ in range(repeat):
+        for payload in payloads:
+            text = json.dumps(payload)
+            started = time.perf_counter()
+            input_data = json.loads(text)
+            if not pre_tool_use.evaluate(input_data).blocked:
+                pre_tool_use.log_tool_use(input_data, workdir)
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+BENCHMARKS = {'cold': bench_cold, 'warm': bench_warm, 'in-process': bench_in_process}
+
+
+def run(payload_sets, modes, repeat):
+    """Run each mode over each payload set; returns the results document."""
+    results = {'python': sys.version.split()[0], 'repeat': repeat, 'modes': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the verdict cache, audit store, rule stats and logs of the replayed calls out of the tree
+        os.environ['CLAUDE_GUARD_CACHE'] = os.path.join(workdir, 'verdicts.sqlite')
+        os.environ['CLAUDE_GUARD_AUDIT_DB'] = os.path.join(workdir, 'audit.sqlite')
+        os.environ['CLAUDE_GUARD_RULE_STATS_DB'] = os.path.join(workdir, 'rule_stats.sqlite')
+        env = dict(os.environ)
+        daemon = None
+        if 'warm' in modes:
+            daemon, env['CLAUDE_GUARD_SOCKET'] = start_daemon(workdir, env)
+        try:
+            for mode in modes:
+                mode_result = {}
+                all_samples = []
+                for name, payloads in payload_sets.items():
+                    if not payloads:
+                        continue
+                    BENCHMARKS[mode](payloads, 1, workdir, env)  # Warm-up, not timed
+                    samples = BENCHMARKS[mode](payloads, repeat, workdir, env)
+                    if mode == 'warm' and daemon.poll() is not None:
+                        raise BenchmarkError(f"guard daemon exited with status {daemon.returncode} "
+                                             f"during the {name} payloads")
+                    mode_result[name] = summarize(samples)
+                    all_samples.extend(samples)
+                mode_result['all'] = summarize(all_samples)
+                results['modes'][mode] = mode_result
+        finally:
+            if daemon is not None:
+                daemon.terminate()
+                daemon.wait(timeout=10)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression descriptions (empty if none)."""
+    regressions = []
+    for mode, groups in results['modes'].items():
+        for group, stats in groups.items():
+            base = baseline.get('modes', {}).get(mode, {}).get(group)
+            if not base:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+                limit = base[metric] * (1 + tolerance) + ABSOLUTE_SLACK_MS
+                if stats[metric] > limit:
+                    regressions.append(
+                        f"{mode}/{group} {metric}: {stats[metric]:.3f} > {limit:.3f} "
+                        f"(baseline {base[metric]:.3f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PreToolUse hook latency benchmark')
+    parser.add_argument('log_dirs', nargs='*', default=DEFAULT_LOG_DIRS,
+                        help='Directories with recorded pre_tool_use logs')
+    parser.add_argument('--repeat', type=int, default=5, help='Replays of each payload per mode')
+    parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated modes to run')
+    parser.add_argument('--output', help='Write the results JSON here (e.g. a baseline)')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative slowdown before a comparison fails')
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    payload_sets = {
+        'recorded': recorded_payloads(args.log_dirs),
+        'synthetic': synthetic_payloads(),
+    }
+    try:
+        results = run(payload_sets, modes, args.repeat)
+    except BenchmarkError as e:
+        print(f"hook_latency: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
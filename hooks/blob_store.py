@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Content-addressed blob store for large values in hook log records.
+
+Write/Edit/MultiEdit payloads carry whole file contents and TodoWrite the
+whole todo list, so most log volume is repeated copies of the same text.
+externalize() replaces every string (and every list) whose size reaches
+MIN_BYTES with a reference
+
+    {"$blob": "<sha256>", "bytes": <size>}            # a string
+    {"$blob": "<sha256>", "bytes": <size>, "json": true}  # a list, as JSON
+
+and stores the value once, gzipped, under BLOB_DIR/<aa>/<sha256>.gz (a
+list is stored with its own large strings already replaced by references).
+A value that is already stored is not compressed or written again.
+rehydrate() puts the original values back.
+
+Usage:
+    python3 blob_store.py stats BLOB_DIR
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+# Values smaller than this many bytes stay inline
+MIN_BYTES = int(os.environ.get('CLAUDE_HOOK_LOG_BLOB_MIN_BYTES', 4096))
+
+REF_KEY = '$blob'
+
+
+def is_ref(value):
+    return isinstance(value, dict) and isinstance(value.get(REF_KEY), str)
+
+
+class BlobStore:
+    """Gzipped blobs in a directory, named by the SHA-256 of their text."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def blob_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest + '.gz')
+
+    def put(self, text):
+        """Store `text` (if new) and return a reference to it."""
+        data = text.encode('utf-8', 'surrogatepass')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.tmp.{os.getpid()}'
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=6, mtime=0))
+            # Concurrent writers of the same blob write identical bytes
+            os.replace(tmp_path, path)
+        return {REF_KEY: digest, 'bytes': len(data)}
+
+    def get(self, digest):
+        """Return the text stored under `digest`; raises OSError if missing."""
+        with open(self.blob_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8', 'surrogatepass')
+
+    def externalize(self, value, min_bytes=MIN_BYTES):
+        """Return `value` with large strings and lists replaced by references."""
+        if isinstance(value, str):
+            return value if len(value) < min_bytes else self.put(value)
+        if isinstance(value, dict):
+            return {key: self.externalize(item, min_bytes) for key, item in value.items()}
+        if isinstance(value, list):
+            items = [self.externalize(item, min_bytes) for item in value]
+            # Still large with its big strings moved out (e.g. a todo list)
+            text = json.dumps(items, separators=(',', ':'))
+            if len(text) < min_bytes:
+                return items
+            return dict(self.put(text), json=True)
+        return value
+
+    def rehydrate(self, value):
+        """
+        Return `value` with references replaced by the stored values.
+        References to missing blobs are left in place.
+        """
+        if is_ref(value):
+            try:
+                text = self.get(value[REF_KEY])
+            except OSError:
+                return value
+            return self.rehydrate(json.loads(text)) if value.get('json') else text
+        if isinstance(value, dict):
+            return {key: self.rehydrate(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.rehydrate(item) for item in value]
+        return value
+
+    def stats(self):
+        """Return the number of blobs and their total stored bytes."""
+        count = size = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith('.gz'):
+                    count += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return {'blobs': count, 'bytes': size}
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != 'stats':
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(BlobStore(sys.argv[2]).stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
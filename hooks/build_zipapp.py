@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Build single-file zipapp bundles of the hook entry points.
+
+Each bundle holds the entry script and the modules it imports, each with a
+precompiled .pyc next to it, plus a small __main__ that runs the entry point.
+The .pyc files use unchecked-hash invalidation, so Python imports them
+straight from the archive without reading the source or checking mtimes, and
+nothing has to be compiled (or written to __pycache__) on each hook call.
+
+Bundles are written to dist/ at the repository root:
+
+    dist/pre_tool_use.pyz   PreToolUse guard (pre_tool_use + its modules)
+    dist/status_line.pyz    Status line script
+
+Run a bundle the same way as the script it replaces, e.g.
+`python3 dist/pre_tool_use.pyz < payload.json`. Logs still go to ./logs in
+the working directory. The verdict cache cannot live inside the archive, so
+a bundled guard only uses it when CLAUDE_GUARD_CACHE points at a file.
+
+Usage:
+    python3 build_zipapp.py [--output-dir DIR] [BUNDLE ...]
+"""
+
+import argparse
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import zipapp
+
+HOOKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(HOOKS_DIR)
+DEFAULT_OUTPUT_DIR = os.path.join(REPO_DIR, 'dist')
+
+# Bundle name -> (entry module, source files relative to the repository root)
+BUNDLES = {
+    'pre_tool_use': ('pre_tool_use', [
+        'hooks/pre_tool_use.py',
+        'hooks/shell_lexer.py',
+        'hooks/secret_scanner.py',
+        'hooks/tool_use_log.py',
+        'hooks/blob_store.py',
+        'hooks/verdict_cache.py',
+        'hooks/audit_store.py',
+        'hooks/rule_stats.py',
+        'hooks/hook_metrics.py',
+        'hooks/hook_timing.py',
+        'hooks/write_journal.py',
+    ]),
+    'status_line': ('status_line', [
+        'status/status_line.py',
+        'status/segments.py',
+        'hooks/transcript_tail.py',
+        'hooks/tool_use_log.py',
+        'hooks/blob_store.py',
+        'hooks/write_journal.py',
+        'hooks/git_metadata.py',
+    ]),
+}
+
+MAIN_TEMPLATE = """\
+import runpy
+runpy.run_module({entry!r}, run_name='__main__', alter_sys=True)
+"""
+
+
+def compile_to_pyc(source_path):
+    """Compile `source_path` to a sibling .pyc importable from a zip archive."""
+    # Zip imports look for name.pyc next to name.py, not in __pycache__
+    py_compile.compile(source_path, cfile=source_path + 'c', doraise=True,
+                       invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+
+def build_bundle(name, output_dir=DEFAULT_OUTPUT_DIR):
+    """Build dist/<name>.pyz; returns its path."""
+    entry, sources = BUNDLES[name]
+    os.makedirs(output_dir, exist_ok=True)
+    target = os.path.join(output_dir, name + '.pyz')
+
+    with tempfile.TemporaryDirectory() as staging:
+        for source in sources:
+            staged = os.path.join(staging, os.path.basename(source))
+            shutil.copyfile(os.path.join(REPO_DIR, source), staged)
+            compile_to_pyc(staged)
+
+        main_path = os.path.join(staging, '__main__.py')
+        with open(main_path, 'w') as f:
+            f.write(MAIN_TEMPLATE.format(entry=entry))
+        compile_to_pyc(main_path)
+
+        # Stored, not deflated: decompressing costs more than reading a few KB
+        zipapp.create_archive(staging, target, interpreter='/usr/bin/env python3',
+                              compressed=False)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build zipapp bundles of the hooks')
+    parser.add_argument('bundles', nargs='*', default=sorted(BUNDLES),
+                        help=f"Bundles to build (default: all of {', '.join(sorted(BUNDLES))})")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help='Directory for the .pyz files')
+    args = parser.parse_args()
+
+    unknown = set(args.bundles) - set(BUNDLES)
+    if unknown:
+        parser.error(f"unknown bundles: {', '.join(sorted(unknown))}")
+
+    for name in args.bundles:
+        print(build_bundle(name, args.output_dir))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
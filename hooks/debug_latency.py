@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Hook and MCP call latency from Claude Code debug logs (~/.claude/debug/*.txt).
+
+Each log is memory-mapped and scanned with one regular expression; the
+files of a directory are spread over a process pool. Events are paired in
+order, per command or per (server, tool):
+
+    [DEBUG] Executing hook command: CMD with timeout Nms
+    [DEBUG] Hook command completed with status N: CMD
+
+    [DEBUG] MCP server "S": Calling MCP tool: T
+    [DEBUG] MCP server "S": Tool 'T' completed successfully in Nms
+    [DEBUG] MCP server "S": Tool 'T' failed after Ns: ...
+
+MCP completions carry their duration, and the slowest calls are listed
+as outliers. Hook lines carry no time at all (the few timestamped lines
+near them are too sparse to bound a hook usefully). For hook times, run
+the hooks with CLAUDE_HOOK_TIMING_LOG=FILE (see hook_timing.py) and pass
+the file with --timings: each run reports its own time in main() and, on
+Linux, its age at exit (process startup included). A log is named after
+its session, so the timing records of that session, in order of exit,
+are paired with its completions of the commands that run the hook
+("pre_tool_use" with ".../pre_tool_use.py"), and each hook row gets the
+`run_ms` and `age_ms` of its `timed` runs. Records left over are counted
+as unmatched `hook_timings`.
+
+Usage:
+    python3 debug_latency.py [DEBUG_DIR_OR_FILE ...] [--timings FILE] [--top N] [--jobs N]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_DEBUG_DIR = os.path.join(os.path.expanduser('~'), '.claude', 'debug')
+
+# Slowest MCP calls kept per file and printed
+DEFAULT_TOP = 10
+
+EVENT_PATTERN = re.compile(
+    rb'^\[DEBUG\] (?:'
+    rb'Executing hook command: (?P<hook_start>.*?) with timeout \d+ms'
+    rb'|Hook command completed with status (?P<status>-?\d+): (?P<hook_end>.*?)'
+    rb'|MCP server "(?P<server>[^"]*)": (?:'
+    rb'Calling MCP tool: (?P<tool_start>\S+)'
+    rb"|Tool '(?P<tool_end>[^']*)' (?:completed successfully in|failed after(?P<failed>)) "
+    rb'(?P<duration>\d+(?:\.\d+)?)(?P<unit>ms|s)\b.*?)'
+    rb')\r?$',
+    re.MULTILINE)
+
+
+def runs_hook(command, hook):
+    """Whether hook `command` runs the script of timing record name `hook`."""
+    return re.search(rb'(?<![\w.-])' + re.escape(hook.encode('utf-8')) + rb'\.py\b', command) is not None
+
+
+def debug_dir():
+    return os.environ.get('CLAUDE_DEBUG_DIR', DEFAULT_DEBUG_DIR)
+
+
+def find_logs(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.txt'))
+        else:
+            files.append(path)
+    return files
+
+
+def scan_events(data):
+    """Yield (offset, match) for the hook and MCP lines of `data`."""
+    for match in EVENT_PATTERN.finditer(data):
+        yield match.start(), match
+
+
+def analyze_file(path, top=DEFAULT_TOP, timings=None):
+    """
+    Pair the events of one log, and its hook completions with `timings`
+    ({hook: [(run_ms, age_ms), ...]} of its session, in order of exit).
+    Returns {'hooks': {command: stats}, 'mcp': {"server/tool": stats},
+    'outliers': [...], 'unmatched': {...}}.
+    """
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            data = b''  # Empty file
+    try:
+        return pair_events(path, data, top, timings)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def pair_events(path, data, top, timings=None):
+    hooks = defaultdict(lambda: {'count': 0, 'statuses': {}, 'run_ms': [], 'age_ms': []})
+    mcp_calls = []           # (key, ms, failed, start offset or None, end offset)
+    open_hooks = defaultdict(deque)
+    open_tools = defaultdict(deque)
+    unmatched = {'hook_starts': 0, 'hook_ends': 0, 'mcp_starts': 0, 'mcp_ends': 0, 'hook_timings': 0}
+    timings = {hook: deque(runs) for hook, runs in (timings or {}).items()}
+    timed_by = {}            # command -> its hook's timings, or None
+
+    for offset, match in scan_events(data):
+        group = match.group
+        if group('hook_start') is not None:
+            open_hooks[group('hook_start')].append(offset)
+        elif group('hook_end') is not None:
+            starts = open_hooks[group('hook_end')]
+            if not starts:
+                unmatched['hook_ends'] += 1
+                continue
+            starts.popleft()
+            stats = hooks[group('hook_end').decode('utf-8', 'replace')]
+            stats['count'] += 1
+            status = group('status').decode('ascii')
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            command = group('hook_end')
+            if command not in timed_by:
+                timed_by[command] = next((runs for hook, runs in timings.items() if runs_hook(command, hook)), None)
+            runs = timed_by[command]
+            if runs:
+                run_ms, age_ms = runs.popleft()
+                stats['run_ms'].append(run_ms)
+                if age_ms is not None:
+                    stats['age_ms'].append(age_ms)
+        elif group('tool_start') is not None:
+            open_tools[(group('server'), group('tool_start'))].append(offset)
+        elif group('tool_end') is not None:
+            starts = open_tools[(group('server'), group('tool_end'))]
+            if starts:
+                start = starts.popleft()
+            else:
+                start = None
+                unmatched['mcp_ends'] += 1
+            scale = 1 if group('unit') == b'ms' else 1000
+            mcp_calls.append((group('server') + b'/' + group('tool_end'),
+                              float(group('duration')) * scale, group('failed') is not None, start, offset))
+    unmatched['hook_starts'] = sum(len(starts) for starts in open_hooks.values())
+    unmatched['mcp_starts'] = sum(len(starts) for starts in open_tools.values())
+    unmatched['hook_timings'] = sum(len(runs) for runs in timings.values())
+
+    mcp = defaultdict(lambda: {'count': 0, 'failed': 0, 'ms': []})
+    outliers = []
+    for key, ms, failed, start, end in mcp_calls:
+        stats = mcp[key.decode('utf-8', 'replace')]
+        stats['count'] += 1
+        stats['failed'] += failed
+        stats['ms'].append(ms)
+        outliers.append((key, ms, failed, start if start is not None else end))
+
+    outliers.sort(key=lambda item: item[1], reverse=True)
+    del outliers[top:]
+    return {
+        'hooks': dict(hooks),
+        'mcp': dict(mcp),
+        'unmatched': unmatched,
+        'outliers': [{'tool': key.decode('utf-8', 'replace'), 'ms': ms, 'failed': failed,
+                      'file': path, 'line': data[:offset].count(b'\n') + 1}
+                     for key, ms, failed, offset in outliers],
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {'mean': round(sum(values) / len(values), 1), 'p50': percentile(values, 0.5),
+            'p95': percentile(values, 0.95), 'max': max(values)}
+
+
+def merge(results, top=DEFAULT_TOP):
+    """Combine per-file results into the report."""
+    hooks = {}
+    mcp = {}
+    unmatched = defaultdict(int)
+    outliers = []
+    for result in results:
+        for command, stats in result['hooks'].items():
+            total = hooks.setdefault(command, {'count': 0, 'statuses': {}, 'run_ms': [], 'age_ms': []})
+            total['count'] += stats['count']
+            for status, count in stats['statuses'].items():
+                total['statuses'][status] = total['statuses'].get(status, 0) + count
+            total['run_ms'] += stats['run_ms']
+            total['age_ms'] += stats['age_ms']
+        for key, stats in result['mcp'].items():
+            total = mcp.setdefault(key, {'count': 0, 'failed': 0, 'ms': []})
+            total['count'] += stats['count']
+            total['failed'] += stats['failed']
+            total['ms'] += stats['ms']
+        for key, count in result['unmatched'].items():
+            unmatched[key] += count
+        outliers += result['outliers']
+    outliers.sort(key=lambda item: item['ms'], reverse=True)
+    return {
+        # Times only with --timings, for the runs paired with a timing record
+        'hooks': [{'command': command, 'count': stats['count'], 'statuses': stats['statuses'],
+                   'timed': len(stats['run_ms']), 'run_ms': summarize(stats['run_ms']),
+                   'age_ms': summarize(stats['age_ms'])}
+                  for command, stats in sorted(hooks.items(), key=lambda item: -item[1]['count'])],
+        'mcp': [{'tool': key, 'count': stats['count'], 'failed': stats['failed'], 'ms': summarize(stats['ms']),
+                 'total_ms': round(sum(stats['ms']), 1)}
+                for key, stats in sorted(mcp.items(), key=lambda item: -sum(item[1]['ms']))],
+        'unmatched': dict(unmatched),
+        'outliers': outliers[:top],
+    }
+
+
+def read_timings(path):
+    """The records of a CLAUDE_HOOK_TIMING_LOG file (see hook_timing.py)."""
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def session_timings(path):
+    """
+    {session: {hook: [(run_ms, age_ms), ...]}} from a CLAUDE_HOOK_TIMING_LOG
+    file, each list in order of exit. Records without a session are left out.
+    """
+    records = defaultdict(lambda: defaultdict(list))
+    for record in read_timings(path):
+        if record.get('session') is None:
+            continue
+        age_ms = round(record['age_ns'] / 1e6, 3) if record.get('age_ns') is not None else None
+        records[record['session']][record.get('hook')].append(
+            (record['end_ns'], round(record['run_ns'] / 1e6, 3), age_ms))
+    return {session: {hook: [(run_ms, age_ms) for _, run_ms, age_ms in sorted(runs)]
+                      for hook, runs in hooks.items()}
+            for session, hooks in records.items()}
+
+
+def analyze(paths, jobs=None, top=DEFAULT_TOP, timings=None):
+    """Report over the logs under `paths`; `timings` as from session_timings()."""
+    files = find_logs(paths)
+    timings = timings or {}
+    file_timings = [timings.get(os.path.splitext(os.path.basename(path))[0]) for path in files]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(min(jobs, len(files))) as pool:
+            results = list(pool.map(analyze_file, files, [top] * len(files), file_timings))
+    else:
+        results = [analyze_file(path, top, runs) for path, runs in zip(files, file_timings)]
+    report = merge(results, top)
+    report['files'] = len(files)
+    return report
+
+
+def timing_report(path):
+    """Per-hook summary of a CLAUDE_HOOK_TIMING_LOG file, paired with a debug log or not."""
+    runs = defaultdict(lambda: {'count': 0, 'statuses': {}, 'run_ms': [], 'age_ms': []})
+    for record in read_timings(path):
+        stats = runs[record.get('hook')]
+        stats['count'] += 1
+        status = str(record.get('status'))
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+        stats['run_ms'].append(record['run_ns'] / 1e6)
+        if record.get('age_ns') is not None:
+            stats['age_ms'].append(record['age_ns'] / 1e6)
+    return [{'hook': hook, 'count': stats['count'], 'statuses': stats['statuses'],
+             'run_ms': summarize([round(ms, 3) for ms in stats['run_ms']]),
+             'age_ms': summarize([round(ms, 3) for ms in stats['age_ms']])}
+            for hook, stats in sorted(runs.items(), key=lambda item: -item[1]['count'])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hook and MCP call latency from Claude Code debug logs')
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help='Debug log files or directories (default: $CLAUDE_DEBUG_DIR or ~/.claude/debug)')
+    parser.add_argument('--timings', help='Hook timing log written with CLAUDE_HOOK_TIMING_LOG')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Slowest MCP calls to list')
+    parser.add_argument('--jobs', type=int, default=None, help='Parser processes (default: CPU count)')
+    args = parser.parse_args()
+
+    paths = args.paths or [debug_dir()]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(json.dumps({'error': f"No debug logs at {', '.join(missing)}"}))
+        sys.exit(1)
+    timings = session_timings(args.timings) if args.timings else None
+    report = analyze(paths, args.jobs, args.top, timings)
+    if args.timings:
+        report['timings'] = timing_report(args.timings)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
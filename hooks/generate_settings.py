@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Generate the settings.json hook block from the guard's policy.
+
+The PreToolUse guard only inspects pre_tool_use.GUARDED_TOOLS; every other
+tool is always allowed and only logged. Registering the hook with an empty
+matcher starts a Python process for each TodoWrite, Glob, Grep and MCP call
+just to write that log line. The generated block instead:
+
+- registers guard_client.py for PreToolUse with a matcher listing exactly
+  the guarded tools ("Bash|Read|Edit|MultiEdit|Write");
+- registers log_unguarded_tools.py for Stop and SubagentStop, which logs the
+  other tools' calls from the transcript in one batch per turn.
+
+Without --settings the block is printed as JSON. With --settings FILE the
+block is merged into that file's "hooks" (entries for other scripts are
+kept) and the result printed, or written back with --write.
+
+Usage:
+    python3 generate_settings.py [--hooks-dir DIR] [--python CMD]
+                                 [--settings FILE [--write]]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+HOOKS_DIR = os.path.dirname(os.path.abspath(__file__))
+if HOOKS_DIR not in sys.path:
+    sys.path.insert(0, HOOKS_DIR)
+
+GUARD_SCRIPT = 'guard_client.py'
+LOGGER_SCRIPT = 'log_unguarded_tools.py'
+
+# Scripts whose existing entries the generated ones replace when merging
+MANAGED_SCRIPTS = (GUARD_SCRIPT, LOGGER_SCRIPT, 'pre_tool_use.py')
+
+
+def tool_matcher(tools):
+    """Matcher regex that matches exactly `tools`: 'Bash|Read|...'."""
+    return '|'.join(re.escape(tool) for tool in tools)
+
+
+def hook_entry(matcher, command):
+    return {'matcher': matcher, 'hooks': [{'type': 'command', 'command': command}]}
+
+
+def generate_hooks(hooks_dir=HOOKS_DIR, python='python3', tools=None):
+    """Return the {event: [entries]} hook block for the guard and the batch logger."""
+    if tools is None:
+        import pre_tool_use
+        tools = pre_tool_use.GUARDED_TOOLS
+    guard = f'{python} {os.path.join(hooks_dir, GUARD_SCRIPT)}'
+    logger = f'{python} {os.path.join(hooks_dir, LOGGER_SCRIPT)}'
+    return {
+        'PreToolUse': [hook_entry(tool_matcher(tools), guard)],
+        'Stop': [hook_entry('', logger)],
+        'SubagentStop': [hook_entry('', logger)],
+    }
+
+
+def is_managed(entry):
+    """True if a settings hook entry runs one of the scripts this module generates."""
+    commands = [hook.get('command', '') for hook in entry.get('hooks', []) if isinstance(hook, dict)]
+    return any(os.path.basename(word) in MANAGED_SCRIPTS
+               for command in commands for word in command.split())
+
+
+def merge_hooks(settings, generated):
+    """Return a copy of `settings` with the generated entries in place of managed ones."""
+    merged = dict(settings)
+    hooks = {event: list(entries) for event, entries in settings.get('hooks', {}).items()}
+    for event, entries in generated.items():
+        kept = [entry for entry in hooks.get(event, []) if not is_managed(entry)]
+        hooks[event] = entries + kept
+    merged['hooks'] = hooks
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the settings.json hook block')
+    parser.add_argument('--hooks-dir', default=HOOKS_DIR,
+                        help='Directory the hook scripts are installed in (default: this one)')
+    parser.add_argument('--python', default='python3', help='Interpreter command for the hooks')
+    parser.add_argument('--settings', help='settings.json to merge the block into')
+    parser.add_argument('--write', action='store_true', help='Write the merged settings back')
+    args = parser.parse_args()
+    if args.write and not args.settings:
+        parser.error('--write requires --settings')
+
+    generated = generate_hooks(args.hooks_dir, args.python)
+    if not args.settings:
+        print(json.dumps({'hooks': generated}, indent=2))
+        return
+
+    with open(args.settings) as f:
+        settings = json.load(f)
+    text = json.dumps(merge_hooks(settings, generated), indent=2) + '\n'
+    if not args.write:
+        sys.stdout.write(text)
+        return
+    tmp_path = f'{args.settings}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, args.settings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+In-process reader for git repository metadata, without forking git.
+
+Shared by the status line and the command scripts. It reads:
+
+- HEAD and refs: loose refs, then packed-refs, following symbolic refs;
+- `gitdir:` links of submodules and linked worktrees (and their commondir);
+- the index: header, and entries compared with lstat() of the working tree.
+
+Results are memoized for the life of the process (clear_cache() forgets
+them, for long-running callers).
+
+has_tracked_changes() answers "would `git status` show a change to a
+tracked file?" and stops at the first changed entry. Like git it trusts
+the stat data in the index, and hashes only racily clean entries (modified
+in the same second the index was written). Nothing is staged when the
+root of the index's cache-tree is valid and names HEAD's tree. Git leaves
+the root invalid after many steps that stage nothing in the end (checkout
+of a path, stash pop, read-tree), and a soft reset keeps it valid for a
+different tree, so otherwise the staged state is unknown: the answer is
+None, or with run_git=True that of `git diff --cached --quiet`, the only
+time git is run. Untracked files are ignored.
+
+Usage:
+    python3 git_metadata.py [PATH]    # print what is known about PATH's repository
+"""
+
+import json
+import os
+import struct
+import subprocess
+import sys
+import zlib
+from functools import lru_cache
+from stat import S_ISLNK, S_ISREG
+
+INDEX_SIGNATURE = b'DIRC'
+
+# Index entry flags
+CE_VALID = 0x8000            # assume-unchanged
+CE_EXTENDED = 0x4000
+CE_STAGE_MASK = 0x3000
+CE_SKIP_WORKTREE = 0x4000    # extended flags
+CE_INTENT_TO_ADD = 0x2000    # extended flags
+
+S_IFGITLINK = 0o160000
+S_IFLNK = 0o120000
+
+NS = 1000000000
+
+# Pack object types
+OBJ_COMMIT = 1
+
+# _has_tracked_changes(): the working tree matches the index, staged state unknown
+STAGED_UNKNOWN = 'staged-unknown'
+
+
+class IndexFormatError(ValueError):
+    """The index could not be parsed."""
+
+
+def find_git_path(start_path):
+    """Walk up from `start_path` to the nearest .git directory or file."""
+    path = os.path.abspath(start_path)
+    while True:
+        git_path = os.path.join(path, '.git')
+        if os.path.exists(git_path):
+            return git_path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def read_text(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def resolve_git_dir(git_path):
+    """Follow a `gitdir:` file (submodules, worktrees) to the real git directory."""
+    if os.path.isfile(git_path):
+        content = (read_text(git_path) or '').strip()
+        if not content.startswith('gitdir: '):
+            return None
+        git_path = os.path.normpath(os.path.join(os.path.dirname(git_path), content[len('gitdir: '):]))
+    return git_path if os.path.isdir(git_path) else None
+
+
+class Repository:
+    """Metadata of one repository; every reader is computed at most once."""
+
+    def __init__(self, worktree, git_dir):
+        self.worktree = worktree
+        self.git_dir = git_dir
+        commondir = read_text(os.path.join(git_dir, 'commondir'))
+        self.common_dir = (os.path.normpath(os.path.join(git_dir, commondir.strip()))
+                           if commondir else git_dir)
+        self._memo = {}
+
+    def _once(self, name, compute):
+        if name not in self._memo:
+            self._memo[name] = compute()
+        return self._memo[name]
+
+    # Refs
+
+    def head(self):
+        """('ref', 'refs/heads/x') for a branch, ('detached', sha), or None."""
+        def compute():
+            content = (read_text(os.path.join(self.git_dir, 'HEAD')) or '').strip()
+            if content.startswith('ref: '):
+                return ('ref', content[5:])
+            return ('detached', content) if content else None
+        return self._once('head', compute)
+
+    def branch(self):
+        """Current branch name, or None on a detached HEAD."""
+        head = self.head()
+        if head and head[0] == 'ref' and head[1].startswith('refs/heads/'):
+            return head[1][len('refs/heads/'):]
+        return None
+
+    def packed_refs(self):
+        """{ref name: sha} from packed-refs."""
+        def compute():
+            refs = {}
+            for line in (read_text(os.path.join(self.common_dir, 'packed-refs')) or '').splitlines():
+                if line and line[0] not in '#^':
+                    sha, _, name = line.partition(' ')
+                    refs[name] = sha
+            return refs
+        return self._once('packed_refs', compute)
+
+    def resolve_ref(self, name):
+        """The sha a ref points to, following symbolic refs; None if unknown."""
+        for _ in range(5):
+            # Per-worktree refs live in git_dir, shared ones in common_dir
+            per_worktree = name == 'HEAD' or name.startswith(('refs/bisect/', 'refs/worktree/'))
+            content = read_text(os.path.join(self.git_dir if per_worktree else self.common_dir, name))
+            if content is None:
+                return self.packed_refs().get(name)
+            content = content.strip()
+            if not content.startswith('ref: '):
+                return content or None
+            name = content[5:]
+        return None
+
+    def head_commit(self):
+        return self._once('head_commit', lambda: self.resolve_ref('HEAD'))
+
+    def short_head(self):
+        """Branch name, or the short sha of a detached HEAD ('' if unknown)."""
+        head = self.head()
+        if head is None:
+            return ''
+        return self.branch() or (head[1][:7] if head[0] == 'detached' else head[1])
+
+    def object_format(self):
+        def compute():
+            config = (read_text(os.path.join(self.common_dir, 'config')) or '').lower()
+            return 'sha256' if 'objectformat = sha256' in config else 'sha1'
+        return self._once('object_format', compute)
+
+    def hash_size(self):
+        return 32 if self.object_format() == 'sha256' else 20
+
+    # Objects
+
+    def read_object(self, sha):
+        """
+        (type name, content) of a loose object or an undeltified packed one,
+        or None (not found, deltified, alternates).
+        """
+        objects = os.path.join(self.common_dir, 'objects')
+        try:
+            with open(os.path.join(objects, sha[:2], sha[2:]), 'rb') as f:
+                raw = zlib.decompress(f.read())
+            header, _, content = raw.partition(b'\0')
+            return header.split(b' ')[0].decode('ascii'), content
+        except (OSError, zlib.error, UnicodeDecodeError):
+            pass
+        try:
+            names = os.listdir(os.path.join(objects, 'pack'))
+        except OSError:
+            return None
+        for name in names:
+            if name.endswith('.idx'):
+                offset = pack_offset(os.path.join(objects, 'pack', name), bytes.fromhex(sha), self.hash_size())
+                if offset is not None:
+                    return read_packed_object(os.path.join(objects, 'pack', name[:-4] + '.pack'), offset)
+        return None
+
+    def head_tree(self):
+        """Tree sha (hex) of the HEAD commit, or None if it cannot be read."""
+        def compute():
+            commit = self.head_commit()
+            try:
+                found = self.read_object(commit) if commit else None
+            except (ValueError, OSError, struct.error, zlib.error):
+                return None
+            if found is None or found[0] != 'commit' or not found[1].startswith(b'tree '):
+                return None
+            return found[1][5:found[1].index(b'\n')].decode('ascii')
+        return self._once('head_tree', compute)
+
+    # Index
+
+    def index_path(self):
+        return os.path.join(self.git_dir, 'index')
+
+    def read_index(self):
+        """The index file's bytes, or None if it does not exist."""
+        def compute():
+            try:
+                with open(self.index_path(), 'rb') as f:
+                    return f.read()
+            except OSError:
+                return None
+        return self._once('index', compute)
+
+    def index_header(self):
+        """(version, entry count) from the index header, or None."""
+        def compute():
+            data = self.read_index()
+            if not data or len(data) < 12 or data[:4] != INDEX_SIGNATURE:
+                return None
+            return struct.unpack('>II', data[4:12])
+        return self._once('index_header', compute)
+
+    def iter_index_entries(self):
+        """
+        Yield (path, stat tuple, mode, sha, flags, extended flags) per index
+        entry, then return the offset of the extensions. The stat tuple is
+        (ctime s, ctime ns, mtime s, mtime ns, dev, ino, uid, gid, size).
+        """
+        data = self.read_index()
+        header = self.index_header()
+        if header is None:
+            raise IndexFormatError('missing or invalid index')
+        version, count = header
+        if version not in (2, 3, 4):
+            raise IndexFormatError(f'unsupported index version {version}')
+        hash_size = self.hash_size()
+        entry = struct.Struct(f'>10I{hash_size}sH')
+        offset, previous = 12, b''
+        for _ in range(count):
+            (ctime_s, ctime_ns, mtime_s, mtime_ns, dev, ino, mode, uid, gid, size,
+             sha, flags) = entry.unpack_from(data, offset)
+            start = offset
+            offset += entry.size
+            extended = 0
+            if flags & CE_EXTENDED:
+                (extended,) = struct.unpack_from('>H', data, offset)
+                offset += 2
+            if version == 4:
+                # Path is prefix-compressed against the previous entry's path
+                strip, offset = read_varint(data, offset)
+                end = data.index(b'\0', offset)
+                path = previous[:len(previous) - strip] + data[offset:end]
+                offset = end + 1
+            else:
+                end = data.index(b'\0', offset)
+                path = data[offset:end]
+                # Entries are NUL-padded to a multiple of 8 bytes
+                offset = start + ((end - start + 8) & ~7)
+            previous = path
+            yield (path, (ctime_s, ctime_ns, mtime_s, mtime_ns, dev, ino, uid, gid, size),
+                   mode, sha, flags, extended)
+        return offset
+
+    def index_extensions(self, offset):
+        """{signature: payload} of the extensions starting at `offset`."""
+        data = self.read_index()
+        extensions = {}
+        end = len(data) - self.hash_size()
+        while offset + 8 <= end:
+            signature = data[offset:offset + 4]
+            (size,) = struct.unpack_from('>I', data, offset + 4)
+            extensions[signature] = data[offset + 8:offset + 8 + size]
+            offset += 8 + size
+        return extensions
+
+    def has_tracked_changes(self, run_git=False):
+        """
+        True if a tracked file differs from the index or something is staged,
+        False if neither, None if unknown: the index cannot be read this way
+        (split index, unsupported version), or the cache-tree cannot tell
+        whether something is staged. With `run_git`, the latter is settled
+        by running `git diff --cached --quiet`.
+        """
+        changed = self._once('has_tracked_changes', self._has_tracked_changes)
+        if changed is STAGED_UNKNOWN:
+            return self._once('staged_changes', self.git_staged_changes) if run_git else None
+        return changed
+
+    def git_staged_changes(self):
+        """Whether `git diff --cached` shows anything, or None if git fails."""
+        try:
+            result = subprocess.run(['git', 'diff', '--cached', '--quiet', '--no-ext-diff'],
+                                    cwd=self.worktree, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL, env=dict(os.environ, GIT_DIR=self.git_dir,
+                                                                        GIT_WORK_TREE=self.worktree))
+        except OSError:
+            return None
+        return {0: False, 1: True}.get(result.returncode)
+
+    def _has_tracked_changes(self):
+        if self.read_index() is None:
+            # No index: a repository without commits or files
+            return self.head_commit() is not None
+        try:
+            index_stat = os.stat(self.index_path())
+            entries = self.iter_index_entries()
+            while True:
+                try:
+                    path, stat, mode, sha, flags, extended = next(entries)
+                except StopIteration as done:
+                    extensions_offset = done.value
+                    break
+                if entry_changed(self, path, stat, mode, sha, flags, extended, index_stat):
+                    return True
+            extensions = self.index_extensions(extensions_offset)
+        except (IndexFormatError, ValueError, struct.error, OSError):
+            return None
+        if b'link' in extensions:
+            return None  # Split index: most entries live in the shared index
+        if self.head_commit() is None:
+            return self.index_header()[1] > 0  # Staged before the first commit
+        if self.index_header()[1] == 0:
+            return True  # Everything removed
+        root = cache_tree_root(extensions.get(b'TREE'), self.hash_size())
+        if root is None or root != self.head_tree():
+            return STAGED_UNKNOWN
+        return False
+
+
+def read_varint(data, offset):
+    """Git's offset varint (index v4 path prefixes); returns (value, new offset)."""
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def cache_tree_root(tree, hash_size):
+    """Tree sha (hex) of the root of the TREE extension, or None if missing or invalidated."""
+    if not tree or tree[:1] != b'\0':
+        return None
+    # Root entry: "" NUL "<entry_count> <subtrees>\n" <sha>; entry_count -1 means invalidated
+    try:
+        end = tree.index(b'\n', 1)
+        entry_count = int(tree[1:end].split(b' ')[0])
+    except ValueError:
+        return None
+    sha = tree[end + 1:end + 1 + hash_size]
+    return sha.hex() if entry_count >= 0 and len(sha) == hash_size else None
+
+
+def pack_offset(idx_path, sha, hash_size):
+    """Offset of object `sha` (bytes) in the pack of a version 2 .idx file, or None."""
+    with open(idx_path, 'rb') as f:
+        data = f.read()
+    if data[:8] != b'\377tOc\0\0\0\2':
+        return None
+    # Fanout table: number of objects whose first byte is <= i
+    fanout = struct.unpack_from('>256I', data, 8)
+    first = fanout[sha[0] - 1] if sha[0] else 0
+    last = fanout[sha[0]]
+    count = fanout[255]
+    names = 8 + 1024
+    while first < last:
+        middle = (first + last) // 2
+        found = data[names + middle * hash_size:names + (middle + 1) * hash_size]
+        if found < sha:
+            first = middle + 1
+        elif found > sha:
+            last = middle
+        else:
+            offsets = names + count * (hash_size + 4)
+            (offset,) = struct.unpack_from('>I', data, offsets + 4 * middle)
+            if offset & 0x80000000:
+                (offset,) = struct.unpack_from('>Q', data, offsets + 4 * count + 8 * (offset & 0x7FFFFFFF))
+            return offset
+    return None
+
+
+def read_packed_object(pack_path, offset):
+    """(type name, content) of an undeltified commit in a pack, or None."""
+    with open(pack_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(64 * 1024)
+        byte = data[0]
+        kind, size, position, shift = (byte >> 4) & 7, byte & 15, 1, 4
+        while byte & 0x80:
+            byte = data[position]
+            size |= (byte & 0x7F) << shift
+            position, shift = position + 1, shift + 7
+        if kind != OBJ_COMMIT:
+            return None  # Trees, blobs and tags are not needed; deltas are not resolved
+        inflater = zlib.decompressobj()
+        content = inflater.decompress(data[position:], size)
+        while len(content) < size and not inflater.eof:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            content += inflater.decompress(chunk, size - len(content))
+    return ('commit', content) if len(content) == size else None
+
+
+def entry_changed(repo, path, stat, mode, sha, flags, extended, index_stat):
+    """Whether the working tree file of one index entry differs from it."""
+    if flags & CE_STAGE_MASK or extended & CE_INTENT_TO_ADD:
+        return True  # Unmerged, or added with --intent-to-add
+    if flags & CE_VALID or extended & CE_SKIP_WORKTREE or mode & 0o170000 == S_IFGITLINK:
+        return False  # Git does not look at these either
+    full_path = os.path.join(repo.worktree, os.fsdecode(path))
+    try:
+        st = os.lstat(full_path)
+    except OSError:
+        return True  # Deleted
+    ctime_s, ctime_ns, mtime_s, mtime_ns, dev, ino, uid, gid, size = stat
+    # One lstat per entry: the file type comes from its st_mode, not more stat calls
+    if mode & 0o170000 == S_IFLNK:
+        if not S_ISLNK(st.st_mode):
+            return True
+    elif not S_ISREG(st.st_mode):
+        return True
+    elif (mode & 0o100) != (st.st_mode & 0o100):
+        return True  # Executable bit changed
+    if (st.st_size & 0xFFFFFFFF != size or st.st_mtime_ns // NS & 0xFFFFFFFF != mtime_s
+            or st.st_ctime_ns // NS & 0xFFFFFFFF != ctime_s or (ino and st.st_ino & 0xFFFFFFFF != ino)):
+        return True
+    if mtime_ns and st.st_mtime_ns % NS != mtime_ns:
+        return True
+    # Racily clean: written in the same instant as the index, so compare contents
+    if (mtime_s, mtime_ns) >= (index_stat.st_mtime_ns // NS, index_stat.st_mtime_ns % NS):
+        return blob_sha(repo, full_path, mode) != sha
+    return False
+
+
+def blob_sha(repo, path, mode):
+    import hashlib  # Only for racily clean entries
+
+    if mode & 0o170000 == S_IFLNK:
+        content = os.fsencode(os.readlink(path))
+    else:
+        with open(path, 'rb') as f:
+            content = f.read()
+    digest = hashlib.new(repo.object_format())
+    digest.update(b'blob %d\0' % len(content))
+    digest.update(content)
+    return digest.digest()
+
+
+@lru_cache(maxsize=None)
+def find_repository(start_path):
+    """The Repository containing `start_path`, or None (memoized per path)."""
+    git_path = find_git_path(start_path)
+    if git_path is None:
+        return None
+    git_dir = resolve_git_dir(git_path)
+    if git_dir is None:
+        return None
+    return Repository(os.path.dirname(git_path), git_dir)
+
+
+def clear_cache():
+    """Forget all memoized repositories and their metadata."""
+    find_repository.cache_clear()
+
+
+def main():
+    repo = find_repository(sys.argv[1] if len(sys.argv) > 1 else os.getcwd())
+    if repo is None:
+        print(json.dumps({'error': 'not a git repository'}))
+        sys.exit(1)
+    header = repo.index_header()
+    print(json.dumps({
+        'worktree': repo.worktree,
+        'git_dir': repo.git_dir,
+        'common_dir': repo.common_dir,
+        'branch': repo.branch(),
+        'head': repo.head_commit(),
+        'index_version': header[0] if header else None,
+        'index_entries': header[1] if header else None,
+        'tracked_changes': repo.has_tracked_changes(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
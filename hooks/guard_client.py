@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Thin PreToolUse hook client for the resident guard daemon (guard_server.py).
+
+Forwards the hook JSON from stdin to the daemon over a Unix domain socket and
+mirrors its verdict: exit code 0 (allow) or 2 (block) plus the stderr text.
+If the daemon is not running or does not answer, the payload is evaluated
+in-process with pre_tool_use.main(), so protection never fails open.
+
+Without XDG_RUNTIME_DIR the socket path in /tmp is predictable, so another
+local user could bind it first and allow every call. The client only uses
+a socket owned by the current user whose listening process runs as that
+user too; anything else counts as no daemon.
+"""
+
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+
+# Seconds to wait for the daemon before falling back to in-process evaluation
+CLIENT_TIMEOUT = 2.0
+
+
+def socket_path():
+    """Return the guard socket path (override with CLAUDE_GUARD_SOCKET)."""
+    path = os.environ.get('CLAUDE_GUARD_SOCKET')
+    if path:
+        return path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(runtime_dir, f'claude-guard-{os.getuid()}.sock')
+
+
+def is_trusted(sock, path):
+    """True if the socket at `path` and its peer on `sock` belong to the current user."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        return False
+    if hasattr(socket, 'SO_PEERCRED'):
+        ucred = struct.Struct('3i')  # pid, uid, gid
+        _pid, uid, _gid = ucred.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, ucred.size))
+        return uid == os.getuid()
+    return True
+
+
+def ask_daemon(payload, cwd, path=None, timeout=CLIENT_TIMEOUT):
+    """
+    Send one hook payload to the daemon and return its reply dict
+    ({"exit_code": int, "stderr": str}), or None if the daemon is unavailable.
+    """
+    request = json.dumps({'cwd': cwd, 'payload': payload}).encode('utf-8') + b'\n'
+    path = path or socket_path()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            if not is_trusted(sock, path):
+                return None
+            sock.sendall(request)
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        reply = json.loads(b''.join(chunks).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(reply, dict) or reply.get('exit_code') not in (0, 2):
+        return None
+    return reply
+
+
+def run_in_process(payload):
+    """Evaluate the payload with the regular hook entry point (exits)."""
+    import io
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import pre_tool_use
+    sys.stdin = io.StringIO(payload)
+    pre_tool_use.main()
+
+
+def main():
+    timing_log = os.environ.get('CLAUDE_HOOK_TIMING_LOG')
+    if timing_log:
+        import time
+        started_ns = time.monotonic_ns()
+    payload = sys.stdin.read()
+
+    reply = ask_daemon(payload, os.getcwd())
+    if reply is None:
+        run_in_process(payload)
+        sys.exit(0)
+
+    if reply.get('stderr'):
+        sys.stderr.write(reply['stderr'])
+    if timing_log:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import hook_timing
+        hook_timing.record('guard_client', started_ns, reply['exit_code'], timing_log,
+                           hook_timing.session_of(payload))
+    sys.exit(reply['exit_code'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Resident PreToolUse guard daemon.
+
+Keeps the pre_tool_use policy (is_dangerous_rm_command, is_env_file_access)
+and the logger loaded behind a Unix domain socket so each tool call only pays
+for a tiny client (guard_client.py) instead of interpreter startup, uv
+resolution and regex compilation.
+
+Protocol: the client sends one JSON line {"cwd": str, "payload": str} and
+half-closes; the server answers with one JSON line
+{"exit_code": 0|2, "stderr": str}.
+
+Metrics (see hook_metrics.py) are kept in memory; --metrics-port serves
+them over HTTP on 127.0.0.1, and CLAUDE_HOOK_METRICS_TEXTFILE makes the
+daemon add them to a node-exporter textfile every HOUSEKEEPING_INTERVAL.
+
+Usage:
+    python3 guard_server.py [--socket PATH] [--metrics-port PORT]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The resident process keeps the verdict cache connection warm
+os.environ.setdefault('CLAUDE_GUARD_VERDICT_CACHE', '1')
+# ...and batches audit events (see audit_store.AuditWriter)
+os.environ.setdefault('CLAUDE_GUARD_AUDIT', '1')
+# ...and rule hit counters, flushed every HOUSEKEEPING_INTERVAL seconds
+os.environ.setdefault('CLAUDE_GUARD_RULE_STATS', '1')
+HOUSEKEEPING_INTERVAL = 5.0
+
+import audit_store
+import hook_metrics
+import pre_tool_use
+from guard_client import socket_path
+
+
+class GuardState:
+    """Holds the loaded policy module and reloads it when the file changes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.module = pre_tool_use
+        self.mtime = self._module_mtime()
+        self.flushed = time.monotonic()
+        self.metrics = hook_metrics.Metrics()
+        self.textfile = None
+        if hook_metrics.textfile_path():
+            self.textfile = hook_metrics.TextfileExporter(self.metrics, hook_metrics.textfile_path())
+        self.audit = None
+        if os.environ.get('CLAUDE_GUARD_AUDIT') == '1':
+            try:
+                self.audit = audit_store.AuditWriter(audit_store.AuditStore(audit_store.default_path()))
+            except Exception as e:
+                print(f"Audit store unavailable: {e!r}", file=sys.stderr)
+
+    def flush(self, force=False):
+        """
+        Persist the policy's rule counters and export metrics to the textfile,
+        at most once per HOUSEKEEPING_INTERVAL unless `force`.
+        """
+        now = time.monotonic()
+        if not force and now - self.flushed < HOUSEKEEPING_INTERVAL:
+            return
+        self.flushed = now
+        if self.module.RULE_STATS_ENABLED:
+            try:
+                self.module.flush_rule_stats()
+            except Exception as e:
+                self.metrics.inc('claude_hook_errors_total', tool='', stage='rule_stats')
+                print(f"Rule stats flush failed: {e!r}", file=sys.stderr)
+        if self.textfile is not None:
+            try:
+                self.textfile.export()
+            except OSError as e:
+                print(f"Metrics export failed: {e!r}", file=sys.stderr)
+
+    def close(self):
+        self.flush(force=True)
+        if self.audit is not None:
+            self.audit.close()
+
+    def _module_mtime(self):
+        try:
+            return os.stat(self.module.__file__).st_mtime_ns
+        except OSError:
+            return None
+
+    def policy(self):
+        """Return the policy module, reloading it if pre_tool_use.py changed."""
+        mtime = self._module_mtime()
+        if mtime != self.mtime:
+            with self.lock:
+                if mtime != self.mtime:
+                    self.flush(force=True)  # Reloading resets the rule counters
+                    self.module = importlib.reload(self.module)
+                    self.mtime = mtime
+        return self.module
+
+
+def handle_request(state, request):
+    """
+    Evaluate one client request and return the reply dict.
+    Mirrors pre_tool_use.run_hook(): invalid JSON and internal errors allow
+    the call, with a note on stderr.
+    """
+    metrics = state.metrics
+    started = time.perf_counter()
+    try:
+        input_data = json.loads(request.get('payload', ''))
+    except ValueError as e:
+        metrics.inc('claude_hook_errors_total', tool='', stage='parse')
+        return {'exit_code': 0, 'stderr': f"pre_tool_use: ignoring invalid JSON input: {e}\n"}
+    tool = input_data.get('tool_name', '') if isinstance(input_data, dict) else ''
+    metrics.observe('claude_hook_parse_seconds', time.perf_counter() - started, tool=tool)
+    metrics.inc('claude_hook_calls_total', tool=tool)
+
+    started = time.perf_counter()
+    try:
+        policy = state.policy()
+        verdict = policy.evaluate(input_data)
+    except Exception as e:
+        metrics.inc('claude_hook_errors_total', tool=tool, stage='evaluate')
+        return {'exit_code': 0, 'stderr': f"pre_tool_use: guard error, call allowed: {e!r}\n"}
+    metrics.observe('claude_hook_match_seconds', time.perf_counter() - started, tool=tool)
+
+    if state.audit is not None:
+        state.audit.add(audit_store.make_event(policy.audit_payload(input_data, verdict),
+                                               verdict.blocked, verdict.rule,
+                                               cwd=request.get('cwd')))
+    if verdict.blocked:
+        metrics.inc('claude_hook_blocks_total', tool=tool, rule=verdict.rule or '')
+        return {'exit_code': 2, 'stderr': ''.join(m + '\n' for m in verdict.messages)}
+
+    # Concurrent writers are serialized by the log's own file lock
+    started = time.perf_counter()
+    status = policy.log_tool_use(input_data, request.get('cwd'))
+    metrics.observe('claude_hook_log_write_seconds', time.perf_counter() - started, tool=tool)
+    if status == 'dropped':
+        metrics.inc('claude_hook_errors_total', tool=tool, stage='log')
+        return {'exit_code': 0, 'stderr': 'pre_tool_use: could not write the tool-use log '
+                                          '(see logs/pre_tool_use.dropped)\n'}
+    return {'exit_code': 0, 'stderr': ''}
+
+
+class GuardRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+        except ValueError:
+            return
+        if not isinstance(request, dict):
+            return
+        reply = handle_request(self.server.state, request)
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+        # The client reads until EOF: close our side before any housekeeping
+        self.wfile.flush()
+        self.connection.shutdown(socket.SHUT_WR)
+        self.server.state.flush()
+
+
+class GuardServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def is_listening(path):
+    """Return True if something accepts connections on the socket at `path`."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def serve(path, install_signals=True, metrics_port=None):
+    """
+    Bind the guard socket at `path` and serve until SIGTERM/SIGINT. With
+    `metrics_port`, also serve /metrics over HTTP on 127.0.0.1.
+    """
+    if os.path.exists(path):
+        # Refuse to steal the socket from a live daemon; remove a stale one
+        if is_listening(path):
+            print(f"Guard daemon already running on {path}", file=sys.stderr)
+            return 1
+        os.unlink(path)
+
+    old_umask = os.umask(0o177)
+    try:
+        server = GuardServer(path, GuardRequestHandler)
+    finally:
+        os.umask(old_umask)
+    server.state = GuardState()
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = hook_metrics.serve_http(server.state.metrics, metrics_port)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    if install_signals:
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+    print(f"Guard daemon listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        server.state.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resident PreToolUse guard daemon')
+    parser.add_argument('--socket', default=None, help='Unix socket path (default: $CLAUDE_GUARD_SOCKET or $XDG_RUNTIME_DIR/claude-guard-<uid>.sock)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics at http://127.0.0.1:PORT/metrics')
+    args = parser.parse_args()
+    sys.exit(serve(args.socket or socket_path(), metrics_port=args.metrics_port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for the PreToolUse hook.
+
+Counters for calls, blocks and errors by tool, and histograms for the time
+spent parsing the payload, matching it against the policy and writing the
+log. Values are aggregated in memory (a Metrics registry per process) and
+exported in the Prometheus text format:
+
+- as a node-exporter textfile: set CLAUDE_HOOK_METRICS_TEXTFILE to a .prom
+  path in the textfile collector directory. Each hook process adds its
+  counts to a state file next to it (under a lock, waiting at most
+  LOCK_TIMEOUT) and rewrites the .prom file atomically;
+- over HTTP from the guard daemon: guard_server.py --metrics-port PORT
+  serves /metrics on 127.0.0.1.
+
+Usage:
+    python3 hook_metrics.py show      # print the textfile state as metrics
+"""
+
+import json
+import os
+import sys
+import threading
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Longest a hook waits (seconds) for another process updating the textfile
+LOCK_TIMEOUT = 0.05
+
+# name -> (type, help)
+METRICS = {
+    'claude_hook_calls_total': ('counter', 'Hook calls by tool.'),
+    'claude_hook_blocks_total': ('counter', 'Blocked calls by tool and rule.'),
+    'claude_hook_errors_total': ('counter', 'Hook errors by tool and stage (parse, evaluate, log, audit).'),
+    'claude_hook_parse_seconds': ('histogram', 'Time to decode the hook payload.'),
+    'claude_hook_match_seconds': ('histogram', 'Time to evaluate the payload against the policy.'),
+    'claude_hook_log_write_seconds': ('histogram', 'Time to write the tool-use log.'),
+}
+
+
+def textfile_path():
+    return os.environ.get('CLAUDE_HOOK_METRICS_TEXTFILE')
+
+
+def format_labels(labels):
+    """{'tool': 'Bash'} -> 'tool="Bash"' (sorted, escaped)."""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms. Series are keyed by
+    "<name>\\t<formatted labels>" so the state is plain JSON.
+    """
+
+    def __init__(self, state=None):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}  # key -> [bucket counts..., +Inf count, sum]
+        if state:
+            self.merge(state)
+
+    def inc(self, name, amount=1, **labels):
+        key = f'{name}\t{format_labels(labels)}'
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = f'{name}\t{format_labels(labels)}'
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(BUCKETS)] += 1
+            series[-1] += seconds
+
+    def state(self):
+        """Return a JSON-serializable copy of all series."""
+        with self.lock:
+            return {'counters': dict(self.counters),
+                    'histograms': {key: list(series) for key, series in self.histograms.items()}}
+
+    def merge(self, state, sign=1):
+        """Add (or with sign=-1 subtract) the series of another state."""
+        with self.lock:
+            for key, value in state.get('counters', {}).items():
+                self.counters[key] = self.counters.get(key, 0) + sign * value
+            for key, other in state.get('histograms', {}).items():
+                series = self.histograms.setdefault(key, [0] * (len(BUCKETS) + 1) + [0.0])
+                if len(other) == len(series):
+                    for i, value in enumerate(other):
+                        series[i] += sign * value
+
+    def render(self):
+        """Return the registry in the Prometheus text exposition format."""
+        state = self.state()
+        by_name = {}
+        for kind in ('counters', 'histograms'):
+            for key, value in state[kind].items():
+                name, labels = key.split('\t', 1)
+                by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = METRICS.get(name, ('untyped', ''))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(by_name[name]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{{{labels}}} {value}')
+                    continue
+                cumulative = 0
+                sep = ',' if labels else ''
+                for bound, count in zip(BUCKETS + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {value[-1]:.9f}')
+                lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def read_state(path):
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def write_atomic(path, text):
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def update_textfile(path, state):
+    """
+    Add `state` to the totals kept in PATH.state.json and rewrite the .prom
+    file at `path`. Returns False if another process held the lock too long
+    (the counts are not written).
+    """
+    import tool_use_log
+
+    fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not tool_use_log.try_lock(fd, LOCK_TIMEOUT):
+            return False
+        totals = Metrics(read_state(path + '.state.json'))
+        totals.merge(state)
+        write_atomic(path + '.state.json', json.dumps(totals.state()))
+        write_atomic(path, totals.render())
+        return True
+    finally:
+        os.close(fd)
+
+
+class TextfileExporter:
+    """Writes the growth of a long-lived registry to the textfile (daemon use)."""
+
+    def __init__(self, metrics, path):
+        self.metrics = metrics
+        self.path = path
+        self.exported = Metrics()
+
+    def export(self):
+        current = self.metrics.state()
+        delta = Metrics(current)
+        delta.merge(self.exported.state(), sign=-1)
+        if update_textfile(self.path, delta.state()):
+            self.exported = Metrics(current)
+
+
+def serve_http(metrics, port, host='127.0.0.1'):
+    """Serve `metrics` at http://host:port/metrics on a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    path = textfile_path()
+    if len(sys.argv) != 2 or sys.argv[1] != 'show' or not path:
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(Metrics(read_state(path + '.state.json')).render())
+
+
+if __name__ == '__main__':
+    main()
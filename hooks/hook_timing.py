@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Exact timestamps of hook runs, for debug_latency.py.
+
+Claude Code's debug logs say when a hook command started and finished but
+carry no times. With CLAUDE_HOOK_TIMING_LOG set to a file, pre_tool_use.py
+and guard_client.py append one JSON line per run:
+
+    hook      entry point name
+    session   session_id of the hook payload (the debug log is <session>.txt)
+    pid       process id
+    status    exit code
+    end_ns    time.monotonic_ns() at exit
+    run_ns    time spent in main()
+    age_ns    time since the process was started, interpreter startup
+              included (Linux only, clock-tick resolution; else null)
+
+Each line is one O_APPEND write, so concurrent hooks do not interleave.
+debug_latency.py pairs the records of a session, in order of end_ns, with
+the hook completions of its debug log.
+"""
+
+import json
+import os
+import time
+
+
+def process_age_ns():
+    """Nanoseconds since this process was started, or None where unknown."""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            stat = f.read()
+        # Field 22 (starttime), counted after the parenthesized command name
+        start_ticks = int(stat.rsplit(b')', 1)[1].split()[19])
+        ticks = os.sysconf('SC_CLK_TCK')
+        return time.clock_gettime_ns(time.CLOCK_BOOTTIME) - start_ticks * 1000000000 // ticks
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def session_of(payload):
+    """The session_id of a hook payload (JSON text), or None."""
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return None
+    return data.get('session_id') if isinstance(data, dict) else None
+
+
+def record(hook, started_ns, status, path, session=None):
+    """Append the timing of a run that began at monotonic `started_ns` to `path`."""
+    end_ns = time.monotonic_ns()
+    line = json.dumps({'hook': hook, 'session': session, 'pid': os.getpid(), 'status': status,
+                       'end_ns': end_ns, 'run_ns': end_ns - started_ns, 'age_ns': process_age_ns()}) + '\n'
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    except OSError:
+        return
+    try:
+        os.write(fd, line.encode('utf-8'))
+    finally:
+        os.close(fd)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Batched, asynchronous tool-use log for the tools the guard does not inspect.
+
+The PreToolUse hook is only registered for pre_tool_use.GUARDED_TOOLS (see
+generate_settings.py), so calls to TodoWrite, Glob, Grep, MCP tools, etc.
+no longer start a process each. This script runs as a Stop / SubagentStop
+hook instead: it reads the tool_use blocks appended to the session
+transcript since its last run (transcript_tail.TranscriptTail) and appends
+one record per unguarded call to the same logs/pre_tool_use.jsonl, in a
+single batch under the log lock. Records have the PreToolUse payload fields
+plus "source": "transcript" and the transcript "timestamp".
+
+The calls are also added to the central audit store (audit_store.py) as
+allowed events, in one transaction, whenever auditing is on: with
+CLAUDE_GUARD_AUDIT=1 or once the store exists (the guard daemon audits by
+default). Events are keyed by tool_use_id, so a retried batch is not
+counted twice.
+
+By default the work happens in a detached child process so the hook
+returns immediately; --foreground does it in-process (tests, debugging).
+
+Usage:
+    python3 log_unguarded_tools.py [--foreground] < hook_payload.json
+"""
+
+import json
+import os
+import sys
+
+HOOKS_DIR = os.path.dirname(os.path.abspath(__file__))
+if HOOKS_DIR not in sys.path:
+    sys.path.insert(0, HOOKS_DIR)
+
+# Checkpoint namespace under transcript_tail.state_dir()
+CONSUMER = 'unguarded_tools'
+
+
+def unguarded_records(entries, payload, guarded):
+    """PreToolUse-shaped records for the unguarded tool calls in `entries`."""
+    import transcript_tail
+    records = []
+    for entry in entries:
+        for block in transcript_tail.tool_uses(entry):
+            if block.get('name') in guarded:
+                continue
+            records.append({
+                'session_id': payload.get('session_id'),
+                'transcript_path': payload.get('transcript_path'),
+                'cwd': entry.get('cwd') or payload.get('cwd'),
+                'hook_event_name': 'PreToolUse',
+                'tool_name': block.get('name'),
+                'tool_input': block.get('input', {}),
+                'tool_use_id': block.get('id'),
+                'source': 'transcript',
+                'timestamp': entry.get('timestamp'),
+            })
+    return records
+
+
+def audit_enabled():
+    """True if unguarded calls belong in the audit store as well."""
+    import audit_store
+    import pre_tool_use
+    return pre_tool_use.AUDIT_ENABLED or os.path.exists(audit_store.default_path())
+
+
+def epoch_seconds(timestamp):
+    """Epoch seconds of an ISO 8601 transcript timestamp, or None."""
+    from datetime import datetime
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def audit_records(records):
+    """Add `records` to the audit store as allowed events; False if it is unavailable."""
+    import sqlite3
+    import audit_store
+    events = [audit_store.make_event(record, False, timestamp=epoch_seconds(record.get('timestamp')),
+                                     import_key=record['tool_use_id'] and 'transcript:' + record['tool_use_id'])
+              for record in records]
+    try:
+        store = audit_store.AuditStore(audit_store.default_path())
+        try:
+            store.add(events)
+        finally:
+            store.close()
+    except (OSError, sqlite3.Error):
+        return False
+    return True
+
+
+def log_unguarded_tools(payload, base_dir=None):
+    """
+    Append the unguarded tool calls made since the last run to
+    base_dir/logs (defaults to the payload cwd). Returns the number of
+    records appended.
+    """
+    import pre_tool_use
+    import tool_use_log
+    import transcript_tail
+
+    transcript_path = payload.get('transcript_path')
+    if not transcript_path:
+        return 0
+    tail = transcript_tail.TranscriptTail(transcript_path, CONSUMER,
+                                          payload.get('session_id') or transcript_path)
+    with tail.locked() as acquired:
+        if not acquired:
+            return 0  # A concurrent run (Stop and SubagentStop) is logging them
+        records = unguarded_records(tail.read(), payload, pre_tool_use.GUARDED_TOOLS)
+        if records:
+            if audit_enabled() and not audit_records(records):
+                return 0  # Keep the checkpoint; the events are keyed, so not added twice
+            log_dir = os.path.join(base_dir or payload.get('cwd') or os.getcwd(), 'logs')
+            status = tool_use_log.append_records(log_dir, records,
+                                                 legacy=pre_tool_use.LOG_FORMAT == 'json')
+            if status == tool_use_log.DROPPED:
+                return 0  # Keep the checkpoint so the next run tries again
+        tail.commit()
+    return len(records)
+
+
+def detach():
+    """
+    Fork; the parent returns False and exits so the hook finishes at once,
+    the child (in its own session, with stdio closed so Claude Code does not
+    wait on the pipes) returns True. Without fork the work runs in-process.
+    """
+    if not hasattr(os, 'fork'):
+        return True
+    if os.fork() > 0:
+        return False
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    return True
+
+
+def main():
+    args = sys.argv[1:]
+    if args not in ([], ['--foreground']):
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        payload = json.load(sys.stdin)
+    except ValueError:
+        sys.exit(0)  # Never disturb the session over a logging hook
+    if not isinstance(payload, dict):
+        sys.exit(0)
+
+    if not args and not detach():
+        os._exit(0)
+    try:
+        log_unguarded_tools(payload)
+    except Exception as e:
+        print(f"log_unguarded_tools: {e!r}", file=sys.stderr)
+    if not args:
+        os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,392 +4,846 @@
 # ///
 
 import json
+import os
 import sys
 import re
-from pathlib import Path
+from collections import Counter, namedtuple
+
+# pathlib, hashlib and shell_lexer are imported inside the functions that need
+# them: most tool calls never reach those paths, and startup is most of the
+# hook's cost (see tests/test_import_budget.py).
+
+# Result of evaluating one hook payload. `messages` are the stderr lines shown
+# to Claude when the call is blocked (exit code 2); `rule` names the rule that
+# blocked it.
+Verdict = namedtuple('Verdict', ['blocked', 'messages', 'rule'], defaults=(None,))
+
+ALLOW = Verdict(False, [])
+
+# Log format: "jsonl" (append-only, see tool_use_log.py) or "json" (legacy array)
+LOG_FORMAT = os.environ.get('CLAUDE_HOOK_LOG_FORMAT', 'jsonl')
+
+# Verdict cache for Bash commands (see verdict_cache.py). The guard daemon turns
+# it on by default; one-shot hook runs opt in with CLAUDE_GUARD_VERDICT_CACHE=1.
+VERDICT_CACHE_ENABLED = os.environ.get('CLAUDE_GUARD_VERDICT_CACHE') == '1'
+
+# Central audit store of allowed and blocked calls (see audit_store.py). The
+# guard daemon turns it on by default; one-shot runs opt in with CLAUDE_GUARD_AUDIT=1.
+AUDIT_ENABLED = os.environ.get('CLAUDE_GUARD_AUDIT') == '1'
+
+# Rule hit counters and check timings (see rule_stats.py). Always counted in
+# memory; the guard daemon persists them by default, one-shot runs opt in with
+# CLAUDE_GUARD_RULE_STATS=1. The persisted hits order the path rules.
+RULE_STATS_ENABLED = os.environ.get('CLAUDE_GUARD_RULE_STATS') == '1'
+RULE_HITS = Counter()
+CHECK_NS = Counter()
+
+# Prometheus textfile for call/block/error counters and timings (see hook_metrics.py)
+METRICS_TEXTFILE = os.environ.get('CLAUDE_HOOK_METRICS_TEXTFILE')
+
+# Append exact run timings here (see hook_timing.py, debug_latency.py)
+TIMING_LOG = os.environ.get('CLAUDE_HOOK_TIMING_LOG')
+
+# Commands longer than this many characters are blocked without analysis
+MAX_COMMAND_CHARS = int(os.environ.get('CLAUDE_GUARD_MAX_COMMAND_CHARS', 4 * 1024 * 1024))
+
+# Commands that may run rm are lexed (see shell_lexer.py) only up to this
+# many characters; longer ones are blocked. The slowest input measured (one
+# backtick substitution per 4 characters) lexes 128 KiB in about 0.3s, well
+# within CHECK_DEADLINE. Commands that cannot run rm are not lexed at all.
+MAX_LEXED_CHARS = int(os.environ.get('CLAUDE_GUARD_MAX_LEXED_CHARS', 128 * 1024))
+
+# Checking one call may take at most this many seconds; past it the call is blocked
+CHECK_DEADLINE = float(os.environ.get('CLAUDE_GUARD_DEADLINE_MS', 1000)) / 1000
+
+# Scan Write/Edit/MultiEdit content for API keys and private keys (see
+# secret_scanner.py); CLAUDE_GUARD_SECRET_SCAN=0 turns it off.
+SECRET_SCAN_ENABLED = os.environ.get('CLAUDE_GUARD_SECRET_SCAN', '1') != '0'
+
+GIT_DIRECTORY_MESSAGE = "BLOCKED: Attempting to delete .git directory - this would destroy the project's version control history"
+
+# User home directory, expanded once per process
+USER_HOME = os.path.expanduser('~')
+
+# Common safe directory names
+SAFE_DIRECTORIES = [
+    'node_modules', 'build', 'dist', 'target', '.next', '.nuxt',
+    'tmp', 'temp', 'cache', 'logs', '.cache', 'coverage',
+    '__pycache__', '.pytest_cache', '.mypy_cache', '.gradle'
+]
+
+# Extra absolute roots where anything may be removed, separated by os.pathsep
+# (e.g. CLAUDE_GUARD_SAFE_ROOTS=/home/me/work:/srv/scratch)
+SAFE_ROOTS = ['/home/yoda/Library/Projects'] + [
+    root.rstrip('/') for root in os.environ.get('CLAUDE_GUARD_SAFE_ROOTS', '').split(os.pathsep) if root
+]
+
+_home = re.escape(USER_HOME)
+_build_dirs = r'(?:node_modules|build|dist|target|\.gradle|\.next|\.nuxt|tmp|temp|cache|logs|\.cache|coverage|__pycache__|\.pytest_cache|\.mypy_cache)'
+
+# Always dangerous paths (override whitelist). Rule name -> pattern.
+DANGEROUS_PATH_RULES = [
+    ('root', r'/'),                  # Root directory
+    ('root_wildcard', r'/\*'),       # Root with wildcard
+    ('home', r'~'),                  # Home directory
+    ('home_slash', r'~/'),           # Home directory path
+    ('home_var', r'\$HOME'),         # Home environment variable
+    ('parent', r'\.\.'),             # Parent directory (bare)
+    ('parent_wildcard', r'\.\./\*'), # Parent with wildcard
+    ('wildcard', r'\*'),             # Bare wildcard
+    ('current', r'\.'),              # Current directory (bare)
+    ('system_usr', r'/usr(?:/.*)?'), # System directories
+    ('system_etc', r'/etc(?:/.*)?'),
+    ('system_var', r'/var(?:/.*)?'),
+    ('system_boot', r'/boot(?:/.*)?'),
+    ('system_sys', r'/sys(?:/.*)?'),
+    ('system_proc', r'/proc(?:/.*)?'),
+]
+
+# Whitelisted paths, checked after the dangerous rules. Rule name -> pattern.
+SAFE_PATH_RULES = [
+    # Common safe directory names
+    ('safe_directory', r'(?:%s)/*' % '|'.join(re.escape(d) for d in SAFE_DIRECTORIES)),
+    # Safe relative paths
+    ('relative_path', r'\./[\w\-_./]+'),       # ./path/to/dir
+    ('relative_dir', r'[\w\-_.]+/'),           # dirname/
+    ('relative_name', r'[\w\-_.]+'),           # dirname
+    ('relative_safe_subdir', r'(?:node_modules|build|dist|target|\.next|\.nuxt|tmp|temp|cache|logs|\.cache|coverage|__pycache__|\.pytest_cache|\.mypy_cache|\.gradle)(?:/.*)?'),
+    # Safe parent directory patterns (specific named directories only)
+    ('parent_path', r'\.\./[\w\-_./]+'),       # ../specific/path
+    ('parent_dir', r'\.\./[\w\-_.]+/'),        # ../dirname/
+    ('parent_name', r'\.\./[\w\-_.]+'),        # ../dirname
+    ('parent_safe_subdir', r'\.\./(?:node_modules|build|dist|target|tmp|temp|logs|cache)(?:/.*)?'),
+] + [
+    # Allow all operations under configured roots
+    ('safe_root_%d' % i, re.escape(root) + r'(?:/.*)?') for i, root in enumerate(SAFE_ROOTS)
+] + [
+    # Project-related directories within home
+    ('home_project_build_dir', _home + r'/[\w\-_.]+/.*/' + _build_dirs + r'(?:/.*)?'),
+    # Direct safe directories in home subdirectories
+    ('home_build_dir', _home + r'/.*/' + _build_dirs + r'(?:/.*)?'),
+    # Safe file extensions in home directory
+    ('home_temp_file', _home + r'/.*\.(?:log|tmp|cache|temp)'),
+    # Safe file patterns
+    ('temp_file', r'.*\.(?:log|tmp|cache|temp)'),  # Safe file extensions
+    ('rotated_log', r'.*\.log\.\d+'),              # Rotated log files
+]
+
+def compile_path_rules(rules):
+    """
+    Compile (name, pattern) rules into one anchored regex with a named group
+    per rule. Alternatives are tried in order, so `match.lastgroup` names the
+    first rule that matches the whole path.
+    """
+    alternatives = '|'.join('(?P<%s>%s)' % (name, pattern) for name, pattern in rules)
+    return re.compile('^(?:%s)$' % alternatives)
+
+PATH_RULE_KINDS = dict(
+    [(name, 'dangerous') for name, _ in DANGEROUS_PATH_RULES] +
+    [(name, 'safe') for name, _ in SAFE_PATH_RULES]
+)
+
+def order_path_rules(hits=None):
+    """
+    Return the dangerous rules followed by the safe rules, each group sorted
+    by descending 'path:<rule>' hits (ties keep their written order).
+
+    Rules only move within their group and every dangerous rule still comes
+    before every safe one, so a path gets the same kind, and so the same
+    verdict, as with the written order. The dangerous rules match disjoint
+    sets of paths, so the blocking rule name is unchanged as well; only which
+    of several matching safe rules is reported can differ.
+    """
+    hits = hits or {}
+
+    def by_hits(rules):
+        return sorted(rules, key=lambda rule: -hits.get('path:' + rule[0], 0))
+
+    return by_hits(DANGEROUS_PATH_RULES) + by_hits(SAFE_PATH_RULES)
+
+# (path matcher, safe path matcher, rule order), compiled on first use by
+# path_matchers(); only rm commands need them. Published with one assignment,
+# as daemon threads reset it concurrently (see flush_rule_stats()).
+PATH_MATCHERS = None
+
+def path_matchers():
+    """Return (path matcher, safe path matcher), compiling them once."""
+    global PATH_MATCHERS
+    matchers = PATH_MATCHERS
+    if matchers is None:
+        stats = get_rule_stats() if RULE_STATS_ENABLED else None
+        try:
+            hits = stats.hits('path:') if stats else None
+        except Exception:
+            hits = None
+        rules = order_path_rules(hits)
+        matchers = (compile_path_rules(rules), compile_path_rules(SAFE_PATH_RULES),
+                    [name for name, _ in rules])
+        PATH_MATCHERS = matchers
+    return matchers[0], matchers[1]
+
+GIT_PATH_MATCHER = re.compile(
+    r'^(?:\.git|\.git/|\.git/.*|.*/\.git|.*/\.git/.*)$'  # .git itself or anything inside it
+)
+
+def classify_rm_path(path):
+    """
+    Classify an rm target in a single regex pass.
+    Returns (kind, rule): kind is 'dangerous', 'safe' or None (not whitelisted),
+    rule is the name of the matching rule or None.
+    """
+    match = path_matchers()[0].match(path.strip())
+    if match is None:
+        RULE_HITS['path:not_whitelisted'] += 1
+        return None, None
+    RULE_HITS['path:' + match.lastgroup] += 1
+    return PATH_RULE_KINDS[match.lastgroup], match.lastgroup
 
 def is_safe_rm_path(path):
     """
     Check if a path is safe for rm -rf operations.
     Returns True if the path matches known safe patterns.
     """
-    import os
-    path = path.strip()
-    
-    # Get user home directory
-    user_home = os.path.expanduser('~')
-    
-    # Safe relative paths
-    safe_relative_patterns = [
-        r'^\./[\w\-_./]+$',  # ./path/to/dir
-        r'^[\w\-_.]+/$',     # dirname/
-        r'^[\w\-_.]+$',      # dirname
-        r'^\.next$',         # .next directory
-        r'^\.next/$',        # .next/ directory
-        # Subdirectories within safe directories
-        r'^(node_modules|build|dist|target|\.next|\.nuxt|tmp|temp|cache|logs|\.cache|coverage|__pycache__|\.pytest_cache|\.mypy_cache|\.gradle)(/.*)?$',
-    ]
-    
-    # Safe parent directory patterns (specific named directories only)
-    safe_parent_patterns = [
-        r'^\.\./[\w\-_./]+$',      # ../specific/path
-        r'^\.\./[\w\-_.]+/$',      # ../dirname/
-        r'^\.\./[\w\-_.]+$',       # ../dirname
-        r'^\.\./(node_modules|build|dist|target|tmp|temp|logs|cache)(/.*)?$',  # ../safe_dirs
-    ]
-    
-    # Safe absolute paths within user home directory
-    safe_absolute_patterns = [
-        # Allow all operations under /home/yoda/Library/Projects
-        r'^/home/yoda/Library/Projects(/.*)?$',
-        # Project-related directories within home
-        rf'^{re.escape(user_home)}/[\w\-_.]+/.*/(node_modules|build|dist|target|\.gradle|\.next|\.nuxt|tmp|temp|cache|logs|\.cache|coverage|__pycache__|\.pytest_cache|\.mypy_cache)(/.*)?$',
-        # Direct safe directories in home subdirectories
-        rf'^{re.escape(user_home)}/.*/(node_modules|build|dist|target|\.gradle|\.next|\.nuxt|tmp|temp|cache|logs|\.cache|coverage|__pycache__|\.pytest_cache|\.mypy_cache)(/.*)?$',
-        # Safe file extensions in home directory
-        rf'^{re.escape(user_home)}/.*\.(log|tmp|cache|temp)$',
-    ]
-    
-    # Common safe directory names
-    safe_directories = [
-        'node_modules', 'build', 'dist', 'target', '.next', '.nuxt',
-        'tmp', 'temp', 'cache', 'logs', '.cache', 'coverage',
-        '__pycache__', '.pytest_cache', '.mypy_cache', '.gradle'
-    ]
-    
-    # Safe file patterns
-    safe_file_patterns = [
-        r'.*\.(log|tmp|cache|temp)$',  # Safe file extensions
-        r'.*\.log\.\d+$',              # Rotated log files
-    ]
-    
-    # Check safe directory names
-    if path in safe_directories or path.rstrip('/') in safe_directories:
-        return True
-    
-    # Check relative patterns
-    for pattern in safe_relative_patterns:
-        if re.match(pattern, path):
-            return True
-    
-    # Check parent directory patterns
-    for pattern in safe_parent_patterns:
-        if re.match(pattern, path):
-            return True
-    
-    # Check absolute patterns within user home
-    for pattern in safe_absolute_patterns:
-        if re.match(pattern, path):
-            return True
-    
-    # Check file patterns
-    for pattern in safe_file_patterns:
-        if re.match(pattern, path):
-            return True
-    
-    return False
+    return bool(path_matchers()[1].match(path.strip()))
 
 def contains_git_directory(paths):
     """
     Check if any path references a .git directory.
     Returns True if any path contains .git directory reference.
     """
-    git_patterns = [
-        r'^\.git$',              # Exact .git directory
-        r'^\.git/$',             # .git/ with trailing slash
-        r'^\.git/.*$',           # Any path within .git/
-        r'^.*/\.git$',           # Any path ending in .git
-        r'^.*/\.git/.*$',        # Any .git directory in subdirectories
-    ]
-
     for path in paths:
         path = path.strip().strip('"\'')  # Remove quotes and whitespace
-        for pattern in git_patterns:
-            if re.match(pattern, path):
-                return True
+        if GIT_PATH_MATCHER.match(path):
+            return True
 
     return False
 
 def parse_compound_command(command):
     """
     Parse a compound shell command and return individual command segments.
-    Splits on shell operators (&&, ||, ;, |) while preserving quoted strings.
-    """
-    
-    # Handle simple cases first
-    if not any(op in command for op in ['&&', '||', ';', '|']):
-        return [command.strip()]
-    
-    segments = []
-    current_segment = ""
+    Splits on shell operators (&&, ||, ;, |, &, newlines) while preserving
+    quoted strings; commands inside $(...) and backticks are included.
+    """
+    import shell_lexer
+    return [command[segment.start:segment.end].strip() for segment in shell_lexer.split_commands(command)]
+
+# Safe parent commands that can have 'rm' as a subcommand
+SAFE_PARENT_COMMANDS = {'git', 'docker', 'npm', 'yarn', 'cargo', 'apt', 'yum', 'brew', 'pip', 'conda'}
+
+# Commands that run their arguments as another command (sudo rm, xargs rm, ...)
+COMMAND_PREFIXES = {'sudo', 'doas', 'env', 'exec', 'xargs', 'parallel', 'command', 'builtin', 'nohup', 'nice', 'time', 'timeout'}
+
+# Reserved words that may precede a command in a segment ({ rm ...; }, if rm ...)
+SHELL_KEYWORDS = {'{', '}', '!', 'if', 'then', 'else', 'elif', 'fi', 'do', 'done', 'while', 'until', 'time'}
+
+ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+
+# Where the shell could see a word "rm" (or ".../rm"): r and m separated at
+# most by quotes and escapes, not joined to other word characters. A command
+# without a match cannot run rm, and is not lexed.
+RM_WORD_RE = re.compile(r'''(?<![^\s|&;()<>'"\\`/])r(?:['"]|\\\n?)*m(?![^\s|&;()<>'"\\`])''')
+
+def find_rm_invocation(words):
+    """
+    Return the words of the rm invocation in a segment (starting at 'rm'),
+    or None if the segment does not run rm.
+    """
     i = 0
-    in_quotes = False
-    quote_char = None
-    
-    while i < len(command):
-        char = command[i]
-        
-        # Handle quotes
-        if char in ['"', "'"] and (i == 0 or command[i-1] != '\\'):
-            if not in_quotes:
-                in_quotes = True
-                quote_char = char
-            elif char == quote_char:
-                in_quotes = False
-                quote_char = None
-        
-        # Check for operators only when not in quotes
-        if not in_quotes:
-            # Check for two-character operators first
-            if i < len(command) - 1:
-                two_char = command[i:i+2]
-                if two_char in ['&&', '||']:
-                    if current_segment.strip():
-                        segments.append(current_segment.strip())
-                    current_segment = ""
-                    i += 2
-                    continue
-            
-            # Check for single-character operators
-            if char in [';', '|']:
-                # Make sure it's not part of ||
-                if char == '|' and i < len(command) - 1 and command[i+1] == '|':
-                    pass  # Skip, will be handled by || above
-                elif char == '|' and i > 0 and command[i-1] == '|':
-                    pass  # Skip, already handled
-                else:
-                    if current_segment.strip():
-                        segments.append(current_segment.strip())
-                    current_segment = ""
-                    i += 1
-                    continue
-        
-        current_segment += char
+    while i < len(words) and (words[i] in SHELL_KEYWORDS or ASSIGNMENT_RE.match(words[i])):
         i += 1
-    
-    if current_segment.strip():
-        segments.append(current_segment.strip())
-    
-    return segments
+    if i == len(words):
+        return None
+
+    primary_command = os.path.basename(words[i])
+
+    # If primary command is 'rm', it's potentially dangerous
+    if primary_command == 'rm':
+        return words[i:]
+    # If primary command is a safe tool with 'rm' subcommand, skip it
+    if primary_command in SAFE_PARENT_COMMANDS:
+        return None
+    # Look for rm run through a prefix command: sudo rm, env VAR=val rm, etc.
+    if primary_command in COMMAND_PREFIXES:
+        for j in range(i + 1, len(words)):
+            if os.path.basename(words[j]) == 'rm':
+                return words[j:]
+    return None
 
 def extract_rm_commands(command_segments):
     """
     Extract only the segments that contain dangerous rm commands.
     Filters out safe subcommands like 'git rm', 'docker rm', etc.
-    Returns a list of rm command strings.
+    Takes Segments from shell_lexer.split_commands() and returns a list of
+    rm invocations, each a list of words starting with 'rm'.
     """
     rm_commands = []
-    
-    # Safe parent commands that can have 'rm' as a subcommand
-    safe_parent_commands = ['git', 'docker', 'npm', 'yarn', 'cargo', 'apt', 'yum', 'brew', 'pip', 'conda']
-    
     for segment in command_segments:
-        # Check if this segment contains an rm command
-        # Use word boundary to avoid matching 'form', 'arm', etc.
-        if not re.search(r'\brm\b', segment):
-            continue
-            
-        # Split the segment into tokens to check command structure
-        tokens = segment.strip().split()
-        if not tokens:
-            continue
-            
-        # Get the primary command (first non-flag token)
-        primary_command = tokens[0]
-        
-        # If primary command is 'rm', it's potentially dangerous
-        if primary_command == 'rm':
-            rm_commands.append(segment.strip())
-        # If primary command is a safe tool with 'rm' subcommand, skip it
-        elif primary_command in safe_parent_commands:
-            continue  # Safe subcommand, don't add to rm_commands
-        # Check for other patterns where rm might appear dangerously
-        # This handles cases like: sudo rm, env VAR=val rm, etc.
-        else:
-            # Look for rm as a standalone command after other prefixes
-            # Split on common command separators and check each part
-            rm_found = False
-            for i, token in enumerate(tokens):
-                if token == 'rm' and (i == 0 or tokens[i-1] in ['sudo', 'env', 'exec', 'xargs', 'parallel']):
-                    rm_found = True
-                    break
-            
-            if rm_found:
-                rm_commands.append(segment.strip())
-    
+        rm_words = find_rm_invocation(segment.words)
+        if rm_words:
+            rm_commands.append(rm_words)
     return rm_commands
 
-def is_dangerous_rm_command(command):
+def is_dangerous_rm_command(command, messages=None):
     """
     Detect dangerous rm commands using hybrid whitelist+blacklist approach.
     Blocks rm -rf unless all target paths are safe and none are dangerous.
     Now handles compound commands properly.
     """
-    # Parse compound command and extract only rm commands
-    command_segments = parse_compound_command(command)
-    rm_commands = extract_rm_commands(command_segments)
-    
-    # If no rm commands found, it's safe
-    if not rm_commands:
-        return False
-    
+    rule = rm_command_block_rule(command)
+    if rule == 'rm_git_directory' and messages is not None:
+        messages.append(GIT_DIRECTORY_MESSAGE)
+    return rule is not None
+
+def rm_command_block_rule(command, deadline=None):
+    """
+    Return the name of the rule that blocks an rm in `command`, or None if
+    every rm invocation in it is allowed. Raises shell_lexer.DeadlineExceeded
+    if time.monotonic() passes `deadline`.
+    """
+    import time
+    import shell_lexer
+    if not RM_WORD_RE.search(command):
+        return None
+    try:
+        command_segments = shell_lexer.split_commands(command, deadline)
+    except shell_lexer.ShellSyntaxError:
+        # Too deeply nested to analyse; refuse anything that mentions rm
+        return 'rm_unparseable' if re.search(r'\brm\b', command) else None
+
     # Check each rm command individually
-    for rm_command in rm_commands:
-        if is_dangerous_single_rm_command(rm_command):
-            return True
-    
-    return False
+    for rm_command in extract_rm_commands(command_segments):
+        if deadline is not None and time.monotonic() > deadline:
+            raise shell_lexer.DeadlineExceeded("rm targets took too long to check")
+        rule = rm_block_rule(rm_command)
+        if rule is not None:
+            return rule
+
+    # If no dangerous rm commands found, it's safe
+    return None
 
-def is_dangerous_single_rm_command(command):
+def parse_rm_arguments(rm_words):
     """
-    Check if a single rm command is dangerous.
-    This contains the original logic for checking individual rm commands.
+    Split the arguments of an rm invocation into (recursive, force, paths).
+    Options may appear anywhere before '--', and long options may be
+    abbreviated (--rec, --forc) as GNU rm allows.
+    """
+    recursive = force = False
+    paths = []
+    options_done = False
+    for arg in rm_words[1:]:
+        if options_done or arg == '-' or not arg.startswith('-'):
+            paths.append(arg)
+        elif arg == '--':
+            options_done = True
+        elif arg.startswith('--'):
+            name = arg[2:].lower()
+            recursive = recursive or 'recursive'.startswith(name)
+            force = force or 'force'.startswith(name)
+        else:
+            flags = arg[1:].lower()
+            recursive = recursive or 'r' in flags
+            force = force or 'f' in flags
+    return recursive, force, paths
+
+def rm_block_rule(rm_words):
+    """
+    Return the name of the rule that blocks one rm invocation (a list of
+    words starting with 'rm'), or None if it is allowed:
+    'rm_git_directory', 'rm_path:<dangerous rule>' or 'rm_path:not_whitelisted'.
     """
-    # Normalize command by removing extra spaces and converting to lowercase
-    normalized = ' '.join(command.lower().split())
-    
     # Check if command has recursive+force flags
-    has_rf_flags = bool(re.search(r'\brm\s+.*-[a-z]*r[a-z]*f|\brm\s+.*-[a-z]*f[a-z]*r|\brm\s+--recursive\s+--force|\brm\s+--force\s+--recursive|\brm\s+-r\s+.*-f|\brm\s+-f\s+.*-r', normalized))
-    
-    if not has_rf_flags:
-        return False  # Allow rm without recursive+force flags
-    
-    # Extract paths from the command
-    # Remove the rm command and flags to get the paths
-    path_part = re.sub(r'\brm\s+(-[a-z]*|--\w+)*\s*', '', command).strip()
-    
-    # Split paths (handle quoted paths)
-    import shlex
-    try:
-        paths = shlex.split(path_part) if path_part else []
-    except ValueError:
-        # If shlex fails, fall back to simple split
-        paths = path_part.split() if path_part else []
+    recursive, force, paths = parse_rm_arguments(rm_words)
+    if not (recursive and force):
+        return None  # Allow rm without recursive+force flags
 
     # Check for .git directory deletion first (with specific error message)
     if contains_git_directory(paths):
-        print("BLOCKED: Attempting to delete .git directory - this would destroy the project's version control history", file=sys.stderr)
-        return True
-
-    # Always dangerous patterns (override whitelist)
-    always_dangerous_patterns = [
-        r'^/$',              # Root directory
-        r'^/\*$',            # Root with wildcard
-        r'^~$',              # Home directory
-        r'^~/$',             # Home directory path
-        r'^\$HOME$',         # Home environment variable
-        r'^\.\.$',           # Parent directory (bare)
-        r'^\.\./\*$',        # Parent with wildcard
-        r'^\*$',             # Bare wildcard
-        r'^\.$',             # Current directory (bare)
-        r'^/usr(/.*)?$',     # System directories
-        r'^/etc(/.*)?$',
-        r'^/var(/.*)?$',
-        r'^/boot(/.*)?$',
-        r'^/sys(/.*)?$',
-        r'^/proc(/.*)?$',
-    ]
-    
-    # Check each path
+        return 'rm_git_directory'
+
+    # Check each path: always-dangerous rules override the whitelist
     for path in paths:
         path = path.strip().strip('"\'')  # Remove quotes
-        
-        # Check for always dangerous patterns first
-        for dangerous_pattern in always_dangerous_patterns:
-            if re.match(dangerous_pattern, path):
-                return True
-        
-        # Check if path is safe according to whitelist
-        if not is_safe_rm_path(path):
-            return True  # Block if not explicitly safe
-    
-    return False  # Allow if all paths are safe and none are dangerous
+
+        kind, rule = classify_rm_path(path)
+        if kind != 'safe':
+            # Block if dangerous or not explicitly safe
+            return 'rm_path:' + (rule or 'not_whitelisted')
+
+    return None  # Allow if all paths are safe and none are dangerous
+
+def is_dangerous_single_rm_command(command, messages=None):
+    """
+    Check if a single rm command is dangerous.
+    `command` is a list of words starting with 'rm' (or a command string,
+    which is lexed first).
+    Extra block messages (e.g. for .git deletion) are appended to `messages`.
+    """
+    if isinstance(command, str):
+        import shell_lexer
+        rm_commands = extract_rm_commands(shell_lexer.split_commands(command))
+        if not rm_commands:
+            return False
+        command = rm_commands[0]
+
+    rule = rm_block_rule(command)
+    if rule == 'rm_git_directory' and messages is not None:
+        messages.append(GIT_DIRECTORY_MESSAGE)
+    return rule is not None
+
+# .env files and variants (.env.local, .env.production, ...) but not the
+# .env.sample/.env.example templates. A literal followed by a fixed-length
+# lookahead, so a search is linear in the command length.
+ENV_FILE_PATTERN = re.compile(r'\.env(?!\.(?:sample|example))')
+
+# Tools whose input the guard inspects. Calls to any other tool are always
+# allowed, so generate_settings.py scopes the PreToolUse hook to these.
+FILE_TOOLS = ('Read', 'Edit', 'MultiEdit', 'Write')
+GUARDED_TOOLS = ('Bash',) + FILE_TOOLS
+
+# File tools whose input carries content that is written to the file
+CONTENT_TOOLS = ('Write', 'Edit', 'MultiEdit')
 
 def is_env_file_access(tool_name, tool_input):
     """
     Check if any tool is trying to access .env files containing sensitive data.
     """
-    if tool_name in ['Read', 'Edit', 'MultiEdit', 'Write', 'Bash']:
+    if tool_name in FILE_TOOLS:
         # Check file paths for file-based tools
-        if tool_name in ['Read', 'Edit', 'MultiEdit', 'Write']:
-            file_path = tool_input.get('file_path', '')
-            if '.env' in file_path and not (file_path.endswith('.env.sample') or file_path.endswith('.env.example')):
-                return True
-        
-        # Check bash commands for .env file access
-        elif tool_name == 'Bash':
-            command = tool_input.get('command', '')
-            # Pattern to detect .env file access (but allow .env.sample and .env.example)
-            # Matches: .env, .env.local, .env.stage, .env.production, etc.
-            # Excludes: .env.sample, .env.example
-            env_patterns = [
-                r'\.env(?!\.(sample|example))(\.\w+)?',  # .env and variants but not .env.sample/.env.example
-                r'cat\s+.*\.env(?!\.(sample|example))(\.\w+)?',  # cat .env*
-                r'echo\s+.*>\s*\.env(?!\.(sample|example))(\.\w+)?',  # echo > .env*
-                r'touch\s+.*\.env(?!\.(sample|example))(\.\w+)?',  # touch .env*
-                r'cp\s+.*\.env(?!\.(sample|example))(\.\w+)?',  # cp .env*
-                r'mv\s+.*\.env(?!\.(sample|example))(\.\w+)?',  # mv .env*
-            ]
-            
-            for pattern in env_patterns:
-                if re.search(pattern, command):
-                    return True
-    
+        file_path = tool_input.get('file_path', '')
+        if '.env' in file_path and not (file_path.endswith('.env.sample') or file_path.endswith('.env.example')):
+            return True
+
+    # Check bash commands for .env file access (cat .env, echo > .env.local, cp .env.prod ...)
+    elif tool_name == 'Bash':
+        if ENV_FILE_PATTERN.search(tool_input.get('command', '')):
+            return True
+
     return False
 
-def main():
+# Source files that define the policy; their contents version the verdict cache
+POLICY_FILES = [os.path.abspath(__file__),
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shell_lexer.py'),
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'secret_scanner.py')]
+
+def policy_version():
+    """Hash of the policy sources and the settings they read from the environment."""
+    import hashlib
+    digest = hashlib.sha256()
+    for path in POLICY_FILES:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            # Running from a zipapp bundle (see build_zipapp.py)
+            digest.update(__loader__.get_data(path))
+    settings = [USER_HOME] + SAFE_ROOTS + [
+        # Limits and switches that decide command_too_large, deadline and secret verdicts
+        str(MAX_COMMAND_CHARS), str(MAX_LEXED_CHARS), repr(CHECK_DEADLINE), str(SECRET_SCAN_ENABLED)]
+    digest.update('\0'.join(settings).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+_verdict_cache = None
+
+def get_verdict_cache():
+    """Open the verdict cache once per process; returns None if unavailable."""
+    global _verdict_cache
+    if _verdict_cache is None:
+        try:
+            import verdict_cache
+            path = os.environ.get('CLAUDE_GUARD_CACHE', verdict_cache.DEFAULT_PATH)
+            _verdict_cache = verdict_cache.VerdictCache(path, policy_version())
+        except Exception:
+            _verdict_cache = False  # Don't retry on every call
+    return _verdict_cache or None
+
+_rule_stats = None
+
+def get_rule_stats():
+    """Open the rule stats store once per process; returns None if unavailable."""
+    global _rule_stats
+    if _rule_stats is None:
+        try:
+            import rule_stats
+            _rule_stats = rule_stats.RuleStatsStore(rule_stats.default_path())
+        except Exception:
+            _rule_stats = False  # Don't retry on every call
+    return _rule_stats or None
+
+def flush_rule_stats():
+    """
+    Add the in-memory counters to the rule stats store, and recompile the
+    path matcher on next use if the persisted hits now rank the rules
+    differently. Increments from concurrent daemon threads may be lost
+    while flushing; the counts are statistics, not an audit trail.
+    """
+    global PATH_MATCHERS
+    store = get_rule_stats()
+    if store is None or not RULE_HITS:
+        return
+    hits, nanoseconds = dict(RULE_HITS), dict(CHECK_NS)
+    RULE_HITS.clear()
+    CHECK_NS.clear()
+    store.add(hits, nanoseconds)
+    matchers = PATH_MATCHERS
+    if matchers is not None:
+        order = [name for name, _ in order_path_rules(store.hits('path:'))]
+        if order != matchers[2]:
+            PATH_MATCHERS = None
+
+def record_check(name, started_ns):
+    """Count one run of check `name` that started at perf_counter_ns() `started_ns`."""
+    import time
+    RULE_HITS['check:' + name] += 1
+    CHECK_NS['check:' + name] += time.perf_counter_ns() - started_ns
+
+def check_tool_use(tool_name, tool_input):
+    """
+    Run the guard rules for one tool call and return a Verdict. Fails closed:
+    Bash commands over MAX_COMMAND_CHARS (or over MAX_LEXED_CHARS when they
+    may run rm), and calls whose check runs past CHECK_DEADLINE, are blocked.
+    """
+    import time
+    deadline = time.monotonic() + CHECK_DEADLINE
+
+    if tool_name == 'Bash' and len(tool_input.get('command', '')) > MAX_COMMAND_CHARS:
+        return Verdict(True, [
+            f"BLOCKED: Command is longer than {MAX_COMMAND_CHARS} characters and was not checked",
+            "Write large content to a file with the Write tool instead",
+        ], 'command_too_large')
+
+    # Check for .env file access (blocks access to sensitive environment files)
+    started = time.perf_counter_ns()
+    env_file_access = is_env_file_access(tool_name, tool_input)
+    record_check('env_file', started)
+    if env_file_access:
+        return Verdict(True, [
+            "BLOCKED: Access to .env files containing sensitive data is prohibited",
+            "Use .env.sample for template files instead",
+        ], 'env_file')
+
+    # Check content written to files for API keys and private keys
+    if SECRET_SCAN_ENABLED and tool_name in CONTENT_TOOLS:
+        import secret_scanner
+        import shell_lexer
+        started = time.perf_counter_ns()
+        try:
+            finding = secret_scanner.find_secret(tool_name, tool_input, deadline)
+        except shell_lexer.DeadlineExceeded:
+            return Verdict(True, [
+                f"BLOCKED: Content could not be checked within {CHECK_DEADLINE * 1000:.0f}ms",
+            ], 'deadline')
+        finally:
+            record_check('secrets', started)
+        if finding is not None:
+            return Verdict(True, [
+                f"BLOCKED: Content contains what looks like a secret ({finding.name} at character {finding.offset})",
+                "Read secrets from environment variables instead of writing them to files",
+            ], 'secret:' + finding.name)
+
+    # Check for dangerous rm -rf commands
+    if tool_name == 'Bash':
+        command = tool_input.get('command', '')
+        if len(command) > MAX_LEXED_CHARS and RM_WORD_RE.search(command):
+            return Verdict(True, [
+                f"BLOCKED: Command runs rm and is longer than {MAX_LEXED_CHARS} characters, too long to check",
+                "Split it into smaller commands, or write the script to a file first",
+            ], 'command_too_large')
+
+        # Block rm -rf commands with comprehensive pattern matching
+        import shell_lexer
+        started = time.perf_counter_ns()
+        try:
+            rule = rm_command_block_rule(command, deadline)
+        except shell_lexer.DeadlineExceeded:
+            return Verdict(True, [
+                f"BLOCKED: Command could not be checked within {CHECK_DEADLINE * 1000:.0f}ms",
+            ], 'deadline')
+        finally:
+            record_check('rm', started)
+        if rule is not None:
+            messages = [GIT_DIRECTORY_MESSAGE] if rule == 'rm_git_directory' else []
+            messages.append("BLOCKED: Dangerous rm command detected and prevented")
+            return Verdict(True, messages, rule)
+
+    return ALLOW
+
+def evaluate(input_data):
+    """
+    Evaluate a hook payload against the guard policy without exiting.
+    Returns a Verdict; callers decide how to surface it (exit code, socket reply).
+    Bash verdicts are served from the verdict cache when it is enabled.
+    """
+    tool_name = input_data.get('tool_name', '')
+    tool_input = input_data.get('tool_input', {})
+
+    cache = get_verdict_cache() if VERDICT_CACHE_ENABLED and tool_name == 'Bash' else None
+    if cache is None:
+        verdict = check_tool_use(tool_name, tool_input)
+    else:
+        verdict = check_cached(cache, input_data, tool_input)
+    RULE_HITS['verdict:' + (verdict.rule or 'allow')] += 1
+    return verdict
+
+def check_cached(cache, input_data, tool_input):
+    """check_tool_use() for a Bash call, through the verdict cache."""
+    key = cache.key(tool_input.get('command', ''))
     try:
-        # Read JSON input from stdin
-        input_data = json.load(sys.stdin)
-        
-        tool_name = input_data.get('tool_name', '')
-        tool_input = input_data.get('tool_input', {})
-        
-        # Check for .env file access (blocks access to sensitive environment files)
-        if is_env_file_access(tool_name, tool_input):
-            print("BLOCKED: Access to .env files containing sensitive data is prohibited", file=sys.stderr)
-            print("Use .env.sample for template files instead", file=sys.stderr)
-            sys.exit(2)  # Exit code 2 blocks tool call and shows error to Claude
-        
-        # Check for dangerous rm -rf commands
-        if tool_name == 'Bash':
-            command = tool_input.get('command', '')
-            
-            # Block rm -rf commands with comprehensive pattern matching
-            if is_dangerous_rm_command(command):
-                print("BLOCKED: Dangerous rm command detected and prevented", file=sys.stderr)
-                sys.exit(2)  # Exit code 2 blocks tool call and shows error to Claude
-        
-        # Ensure log directory exists
-        log_dir = Path.cwd() / 'logs'
-        log_dir.mkdir(parents=True, exist_ok=True)
-        log_path = log_dir / 'pre_tool_use.json'
-        
-        # Read existing log data or initialize empty list
-        if log_path.exists():
-            with open(log_path, 'r') as f:
-                try:
-                    log_data = json.load(f)
-                except (json.JSONDecodeError, ValueError):
-                    log_data = []
-        else:
-            log_data = []
-        
-        # Append new data
-        log_data.append(input_data)
-        
-        # Write back to file with formatting
-        with open(log_path, 'w') as f:
-            json.dump(log_data, f, indent=2)
-        
-        sys.exit(0)
-        
-    except json.JSONDecodeError:
-        # Gracefully handle JSON decode errors
-        sys.exit(0)
+        cached = cache.get(key)
+    except Exception:
+        cached = None
+    if cached is not None:
+        return Verdict(*cached)
+
+    verdict = check_tool_use('Bash', tool_input)
+    if verdict.rule == 'deadline':
+        return verdict  # Depends on load, not on the command; don't cache it
+    try:
+        cache.put(key, verdict.blocked, verdict.messages, verdict.rule)
     except Exception:
-        # Handle any other errors gracefully
-        sys.exit(0)
+        pass
+    return verdict
+
+def log_tool_use(input_data, base_dir=None):
+    """
+    Record the hook payload under base_dir/logs (defaults to the current
+    working directory). Appends one line to pre_tool_use.jsonl, or rewrites
+    the legacy pre_tool_use.json array when CLAUDE_HOOK_LOG_FORMAT=json.
+    Returns tool_use_log.WRITTEN, DELAYED or DROPPED.
+    """
+    import tool_use_log
+    log_dir = os.path.join(base_dir or os.getcwd(), 'logs')
+    return tool_use_log.append_record(log_dir, input_data, legacy=LOG_FORMAT == 'json',
+                                      session_id=input_data.get('session_id'))
+
+def audit_payload(input_data, verdict):
+    """
+    The payload to store in the audit log for `verdict`: a call blocked for
+    a secret has that secret redacted. Used in-process and by guard_server.py.
+    """
+    if not (verdict.rule or '').startswith('secret:'):
+        return input_data
+    import secret_scanner
+    return dict(input_data, tool_input=secret_scanner.redact_tool_input(
+        input_data.get('tool_name', ''), input_data.get('tool_input', {})))
+
+def audit_tool_use(input_data, verdict, base_dir=None):
+    """Insert one event for this call into the central audit store."""
+    import audit_store
+    store = audit_store.AuditStore(audit_store.default_path())
+    try:
+        store.add([audit_store.make_event(audit_payload(input_data, verdict), verdict.blocked, verdict.rule,
+                                          cwd=base_dir or os.getcwd())])
+    finally:
+        store.close()
+
+def replay_record(line_number, line):
+    """Evaluate one JSONL hook payload and return its verdict as a dict."""
+    try:
+        input_data = json.loads(line)
+        if not isinstance(input_data, dict):
+            raise ValueError("payload is not a JSON object")
+        verdict = check_tool_use(input_data.get('tool_name', ''), input_data.get('tool_input', {}))
+    except Exception as e:
+        return {'line': line_number, 'error': str(e) or type(e).__name__}
+    return {
+        'line': line_number,
+        'session_id': input_data.get('session_id'),
+        'tool_name': input_data.get('tool_name', ''),
+        'exit_code': 2 if verdict.blocked else 0,
+        'rule': verdict.rule,
+        'messages': verdict.messages,
+    }
+
+def replay_batch(batch):
+    """
+    Evaluate a list of (line_number, line) pairs.
+    Returns (output text, counts) so the parent only has to write and add up.
+    """
+    from collections import Counter
+    counts = Counter()
+    lines = []
+    for line_number, line in batch:
+        result = replay_record(line_number, line)
+        counts['records'] += 1
+        if 'error' in result:
+            counts['errors'] += 1
+        elif result['exit_code'] == 2:
+            counts['blocked'] += 1
+            counts['rule:' + result['rule']] += 1
+        lines.append(json.dumps(result))
+    lines.append('')
+    return '\n'.join(lines), counts
+
+def replay(argv):
+    """
+    Bulk evaluation: read hook payloads as JSONL (optionally gzipped), write
+    one verdict per line in input order, and print a per-rule summary to
+    stderr. Batches are evaluated in a process pool with a bounded number in
+    flight, so memory stays flat on inputs of millions of records.
+    """
+    import argparse
+    import gzip
+    from collections import Counter, deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(prog='pre_tool_use.py --replay',
+                                     description='Replay recorded hook payloads against the guard policy')
+    parser.add_argument('input', nargs='?', default='-', help='JSONL payloads (.gz ok), - for stdin')
+    parser.add_argument('--output', '-o', default='-', help='Verdict JSONL output, - for stdout')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        source = sys.stdin
+    elif args.input.endswith('.gz'):
+        source = gzip.open(args.input, 'rt', encoding='utf-8')
+    else:
+        source = open(args.input, 'r', encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    def batches():
+        batch = []
+        for line_number, line in enumerate(source, 1):
+            if line.strip():
+                batch.append((line_number, line))
+            if len(batch) >= args.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    counts = Counter()
+
+    def write(result):
+        text, batch_counts = result
+        out.write(text)
+        counts.update(batch_counts)
+
+    try:
+        if args.workers <= 1:
+            for batch in batches():
+                write(replay_batch(batch))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                pending = deque()
+                for batch in batches():
+                    pending.append(pool.submit(replay_batch, batch))
+                    if len(pending) >= args.workers * 2:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if source is not sys.stdin:
+            source.close()
+
+    summary = {'records': counts.pop('records', 0), 'blocked': counts.pop('blocked', 0),
+               'errors': counts.pop('errors', 0),
+               'rules': {k[len('rule:'):]: v for k, v in counts.most_common()}}
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+class NoMetrics:
+    """Stands in for a hook_metrics.Metrics registry when metrics are off."""
+
+    def inc(self, name, amount=1, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+def run_hook(stream, metrics=None):
+    """
+    Handle one hook call read from `stream`: print block messages and
+    problems to stderr and return the exit code (2 blocks the call).
+    Counts and times each stage in `metrics` (a hook_metrics.Metrics).
+    """
+    import time
+    metrics = metrics or NoMetrics()
+
+    started = time.perf_counter()
+    try:
+        # Read JSON input from stdin
+        input_data = json.load(stream)
+    except json.JSONDecodeError as e:
+        # Not a hook payload; nothing to guard
+        metrics.inc('claude_hook_errors_total', tool='', stage='parse')
+        print(f"pre_tool_use: ignoring invalid JSON input: {e}", file=sys.stderr)
+        return 0
+    tool = input_data.get('tool_name', '') if isinstance(input_data, dict) else ''
+    metrics.observe('claude_hook_parse_seconds', time.perf_counter() - started, tool=tool)
+    metrics.inc('claude_hook_calls_total', tool=tool)
+
+    started = time.perf_counter()
+    try:
+        verdict = evaluate(input_data)
+    except Exception as e:
+        # Fail open, but say so: a broken guard must not stop all tool calls
+        metrics.inc('claude_hook_errors_total', tool=tool, stage='evaluate')
+        print(f"pre_tool_use: guard error, call allowed: {e!r}", file=sys.stderr)
+        return 0
+    metrics.observe('claude_hook_match_seconds', time.perf_counter() - started, tool=tool)
+
+    if AUDIT_ENABLED:
+        try:
+            audit_tool_use(input_data, verdict)
+        except Exception as e:
+            metrics.inc('claude_hook_errors_total', tool=tool, stage='audit')
+            print(f"pre_tool_use: could not write the audit store: {e!r}", file=sys.stderr)
+
+    if RULE_STATS_ENABLED:
+        try:
+            flush_rule_stats()
+        except Exception as e:
+            metrics.inc('claude_hook_errors_total', tool=tool, stage='rule_stats')
+            print(f"pre_tool_use: could not write the rule stats: {e!r}", file=sys.stderr)
+
+    if verdict.blocked:
+        metrics.inc('claude_hook_blocks_total', tool=tool, rule=verdict.rule or '')
+        for message in verdict.messages:
+            print(message, file=sys.stderr)
+        return 2  # Exit code 2 blocks tool call and shows error to Claude
+
+    started = time.perf_counter()
+    if log_tool_use(input_data) == 'dropped':
+        metrics.inc('claude_hook_errors_total', tool=tool, stage='log')
+        print("pre_tool_use: could not write the tool-use log (see logs/pre_tool_use.dropped)",
+              file=sys.stderr)
+    metrics.observe('claude_hook_log_write_seconds', time.perf_counter() - started, tool=tool)
+    return 0
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--replay':
+        sys.exit(replay(sys.argv[2:]))
+
+    stream = sys.stdin
+    if TIMING_LOG:
+        import io
+        import time
+        started_ns = time.monotonic_ns()
+        # Kept for the session_id of the timing record
+        payload = stream.read()
+        stream = io.StringIO(payload)
+
+    if not METRICS_TEXTFILE:
+        exit_code = run_hook(stream)
+    else:
+        import hook_metrics
+        metrics = hook_metrics.Metrics()
+        try:
+            exit_code = run_hook(stream, metrics)
+        finally:
+            try:
+                hook_metrics.update_textfile(METRICS_TEXTFILE, metrics.state())
+            except OSError as e:
+                print(f"pre_tool_use: could not write metrics: {e!r}", file=sys.stderr)
+
+    if TIMING_LOG:
+        import hook_timing
+        hook_timing.record('pre_tool_use', started_ns, exit_code, TIMING_LOG, hook_timing.session_of(payload))
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Persistent per-rule hit counters and check timings for the PreToolUse guard.
+
+pre_tool_use counts in memory which rule decided each verdict and each rm
+target (RULE_HITS) and how long each check took (CHECK_NS). flush() adds
+those counts to a small SQLite database shared by all hook processes and the
+guard daemon. The aggregated hit counts decide the order in which the path
+rules are tried (see pre_tool_use.order_path_rules).
+
+Counter names:
+    verdict:<rule>|allow   rule that decided a call (or allow)
+    path:<rule>            path rule that classified an rm target
+    check:<name>           a check (env_file, secrets, rm); ns holds its total time
+
+Usage:
+    python3 rule_stats.py report [--prefix path:]
+    python3 rule_stats.py reset
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'rule_stats.sqlite')
+
+# Never wait longer than this (seconds) for another process holding the lock
+BUSY_TIMEOUT = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rule_stats (
+    name TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    total_ns INTEGER NOT NULL
+);
+"""
+
+
+def default_path():
+    return os.environ.get('CLAUDE_GUARD_RULE_STATS_DB', DEFAULT_PATH)
+
+
+class RuleStatsStore:
+    """SQLite table of aggregated hits and nanoseconds per counter name."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def add(self, hits, nanoseconds):
+        """Add {name: hits} and {name: ns} increments in one transaction."""
+        names = set(hits) | set(nanoseconds)
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO rule_stats VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET '
+                'hits = hits + excluded.hits, total_ns = total_ns + excluded.total_ns',
+                [(name, hits.get(name, 0), nanoseconds.get(name, 0)) for name in names])
+
+    def hits(self, prefix=''):
+        """Return {name: hits} for counters starting with `prefix`."""
+        rows = self.db.execute('SELECT name, hits FROM rule_stats WHERE substr(name, 1, ?) = ?',
+                               (len(prefix), prefix))
+        return dict(rows.fetchall())
+
+    def report(self, prefix=''):
+        """Return counters as dicts, most hits first, with the mean time per hit."""
+        rows = self.db.execute(
+            'SELECT name, hits, total_ns FROM rule_stats WHERE substr(name, 1, ?) = ? '
+            'ORDER BY hits DESC, name', (len(prefix), prefix)).fetchall()
+        return [{'name': name, 'hits': hits, 'total_ms': round(total_ns / 1e6, 3),
+                 'mean_us': round(total_ns / hits / 1e3, 3) if hits and total_ns else None}
+                for name, hits, total_ns in rows]
+
+    def reset(self):
+        with self.db:
+            self.db.execute('DELETE FROM rule_stats')
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Guard rule hit counters')
+    commands = parser.add_subparsers(dest='command', required=True)
+    report = commands.add_parser('report', help='Print counters, most hits first')
+    report.add_argument('--prefix', default='', help="Only counters starting with this, e.g. 'path:'")
+    commands.add_parser('reset', help='Delete all counters')
+    args = parser.parse_args()
+
+    path = default_path()
+    if not os.path.exists(path):
+        print(json.dumps({'error': f'No rule stats at {path}'}))
+        sys.exit(1)
+
+    store = RuleStatsStore(path)
+    if args.command == 'reset':
+        store.reset()
+    else:
+        for row in store.report(args.prefix):
+            print(json.dumps(row))
+
+
+if __name__ == '__main__':
+    main()
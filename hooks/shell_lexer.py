@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Single-pass shell lexer for the PreToolUse guard.
+
+Splits a Bash command into simple-command segments (on &&, ||, ;, |, &,
+newlines and subshell parentheses) and each segment into words with quotes
+and escapes removed, the way the shell would see them. Command substitutions
+($(...) and backticks), including those inside double quotes and unquoted
+heredoc bodies, are lexed recursively and reported as their own segments so
+the guard can check them too. Heredoc bodies are skipped as data.
+
+Every character is consumed once (runs of ordinary characters are taken with
+a single regex match), so the cost grows linearly with the command length.
+A caller can still pass a deadline (a time.monotonic() value); the lexer
+raises DeadlineExceeded once it is past.
+"""
+
+import re
+import time
+from collections import namedtuple
+
+# One simple command. `words` are the unquoted words (redirections removed),
+# `start`/`end` are offsets of the segment in the lexed source, `depth` is the
+# command substitution nesting level (0 = top level).
+Segment = namedtuple('Segment', ['words', 'start', 'end', 'depth'])
+
+# Nesting beyond this many command substitutions is refused
+MAX_NESTING = 64
+
+_BLANKS = re.compile(r'[ \t\r\f\v]+')
+_PLAIN = re.compile(r'[^\s|&;()<>\'"\\`$]+')
+# A whole word without quotes, escapes or substitutions (most words): taken
+# in one match. Not followed by < or >, which would make it a redirection.
+_SIMPLE_WORD = re.compile(r'[^\s|&;()<>\'"\\`$#][^\s|&;()<>\'"\\`$]*(?=[\s|&;()]|\Z)')
+# The same inside backticks, where a backtick also ends the word
+_SIMPLE_WORD_BQ = re.compile(r'[^\s|&;()<>\'"\\`$#][^\s|&;()<>\'"\\`$]*(?=[\s|&;()`]|\Z)')
+_DQ_PLAIN = re.compile(r'[^"\\`$]+')
+_BODY_PLAIN = re.compile(r'[^\\`$]+')
+_OPERATOR = re.compile(r'&&|\|\||;;&?|;&|\|&|[|&;()]')
+_REDIRECT = re.compile(r'(?:\d+|&)?(?:<<<|<<-|<<|>>|>&|<&|<>|>\||>|<)')
+_DQ_ESCAPABLE = '$`"\\\n'
+
+# Check the deadline once every this many lexer steps
+_DEADLINE_STEPS = 256
+
+
+class ShellSyntaxError(ValueError):
+    """Raised when a command cannot be lexed (e.g. nested too deeply)."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when lexing runs past the caller's deadline."""
+
+
+class _Lexer:
+    def __init__(self, source, depth=0, segments=None, deadline=None):
+        self.s = source
+        self.n = len(source)
+        self.base_depth = depth
+        self.segments = [] if segments is None else segments
+        self.pending_heredocs = []
+        self.deadline = deadline
+        self.steps = 0
+
+    def _tick(self):
+        """Count a lexer step; raise DeadlineExceeded if past the deadline."""
+        self.steps += 1
+        if (self.deadline is not None and self.steps % _DEADLINE_STEPS == 0
+                and time.monotonic() > self.deadline):
+            raise DeadlineExceeded("command took too long to lex")
+
+    # -- command lists -------------------------------------------------
+
+    def lex_list(self, pos, closer=None, depth=0):
+        """
+        Lex commands from `pos` until end of input or the `closer` character
+        (')' for $(...), '`' for backticks) at this level. Returns the position
+        after the closer.
+        """
+        if depth > MAX_NESTING:
+            raise ShellSyntaxError("command nested too deeply")
+
+        s, n = self.s, self.n
+        words = []
+        seg_start = pos
+        paren_depth = 0
+        redirect = None
+
+        deadline = self.deadline
+        simple_word = _SIMPLE_WORD_BQ if closer == '`' else _SIMPLE_WORD
+        while pos < n:
+            # Inlined _tick(): this loop runs once per token
+            self.steps += 1
+            if deadline is not None and self.steps % _DEADLINE_STEPS == 0 and time.monotonic() > deadline:
+                raise DeadlineExceeded("command took too long to lex")
+            c = s[pos]
+
+            m = _BLANKS.match(s, pos)
+            if m:
+                pos = m.end()
+                continue
+
+            m = simple_word.match(s, pos)
+            if m:
+                pos = m.end()
+                if redirect is None:
+                    words.append(m.group())
+                elif redirect in ('<<', '<<-'):
+                    self.pending_heredocs.append((m.group(), redirect == '<<-', False))
+                redirect = None
+                continue
+
+            if c == '\\' and s.startswith('\\\n', pos):
+                pos += 2  # Line continuation
+                continue
+
+            if c == '\n':
+                self._end_segment(words, seg_start, pos, depth)
+                words = []
+                pos += 1
+                if self.pending_heredocs:
+                    pos = self._read_heredocs(pos, depth)
+                seg_start = pos
+                continue
+
+            if c == '#':
+                eol = s.find('\n', pos)
+                pos = n if eol == -1 else eol
+                continue
+
+            if closer is not None and c == closer and paren_depth == 0:
+                self._end_segment(words, seg_start, pos, depth)
+                return pos + 1
+
+            m = _REDIRECT.match(s, pos)
+            if m:
+                pos = m.end()
+                # <(...) and >(...) are process substitutions, lexed as subshells
+                redirect = None if s.startswith('(', pos) else m.group().lstrip('0123456789&')
+                continue
+
+            m = _OPERATOR.match(s, pos)
+            if m:
+                op = m.group()
+                self._end_segment(words, seg_start, pos, depth)
+                words = []
+                redirect = None
+                if op == '(':
+                    paren_depth += 1
+                elif op == ')' and paren_depth > 0:
+                    paren_depth -= 1
+                pos = m.end()
+                seg_start = pos
+                continue
+
+            word_start = pos
+            word, quoted, pos = self.lex_word(pos, closer, depth)
+            if redirect is None:
+                words.append(word)
+            elif redirect in ('<<', '<<-'):
+                # Heredoc delimiter; the body starts after the next newline
+                self.pending_heredocs.append((word, redirect == '<<-', quoted))
+            redirect = None
+            if pos == word_start:
+                pos += 1  # Never stall on an unexpected character
+
+        self._end_segment(words, seg_start, pos, depth)
+        return pos
+
+    def _end_segment(self, words, start, end, depth):
+        if words:
+            self.segments.append(Segment(words, start, end, self.base_depth + depth))
+
+    # -- words ---------------------------------------------------------
+
+    def lex_word(self, pos, closer, depth):
+        """
+        Lex one word starting at `pos`. Returns (value, quoted, end) where
+        `value` has quotes and escapes removed and substitutions kept verbatim.
+        """
+        s, n = self.s, self.n
+        parts = []
+        quoted = False
+
+        while pos < n:
+            self._tick()
+            m = _PLAIN.match(s, pos)
+            if m:
+                parts.append(m.group())
+                pos = m.end()
+                continue
+
+            c = s[pos]
+            if c == '\\':
+                quoted = True
+                if pos + 1 < n and s[pos + 1] != '\n':
+                    parts.append(s[pos + 1])
+                pos += 2
+            elif c == "'":
+                quoted = True
+                end = s.find("'", pos + 1)
+                end = n if end == -1 else end
+                parts.append(s[pos + 1:end])
+                pos = end + 1
+            elif c == '"':
+                quoted = True
+                pos = self._lex_double_quoted(pos + 1, parts, depth)
+            elif c == '$':
+                pos = self._lex_dollar(pos, parts, depth)
+            elif c == '`' and closer != '`':
+                start = pos
+                pos = self.lex_list(pos + 1, '`', depth + 1)
+                parts.append(s[start:pos])
+            else:
+                break  # Metacharacter or whitespace ends the word
+
+        return ''.join(parts), quoted, min(pos, n)
+
+    def _lex_double_quoted(self, pos, parts, depth):
+        """Lex the inside of "...", starting after the opening quote."""
+        s, n = self.s, self.n
+        while pos < n:
+            self._tick()
+            m = _DQ_PLAIN.match(s, pos)
+            if m:
+                parts.append(m.group())
+                pos = m.end()
+                continue
+
+            c = s[pos]
+            if c == '"':
+                return pos + 1
+            if c == '\\':
+                nxt = s[pos + 1:pos + 2]
+                if nxt in _DQ_ESCAPABLE and nxt:
+                    if nxt != '\n':
+                        parts.append(nxt)
+                else:
+                    parts.append('\\' + nxt)
+                pos += 2
+            elif c == '$':
+                pos = self._lex_dollar(pos, parts, depth)
+            else:  # Backtick
+                start = pos
+                pos = self.lex_list(pos + 1, '`', depth + 1)
+                parts.append(s[start:pos])
+        return pos
+
+    def _lex_dollar(self, pos, parts, depth):
+        """Lex $(...), ${...} or a bare $ at `pos`; keeps the raw text."""
+        s = self.s
+        start = pos
+        if s.startswith('$(', pos):
+            pos = self.lex_list(pos + 2, ')', depth + 1)
+        elif s.startswith('${', pos):
+            end = s.find('}', pos + 2)
+            pos = self.n if end == -1 else end + 1
+        else:
+            pos += 1
+        parts.append(s[start:pos])
+        return pos
+
+    # -- heredocs ------------------------------------------------------
+
+    def _read_heredocs(self, pos, depth):
+        """Skip the bodies of pending heredocs; lex substitutions in unquoted ones."""
+        s, n = self.s, self.n
+        pending, self.pending_heredocs = self.pending_heredocs, []
+        for delimiter, strip_tabs, quoted in pending:
+            body_start = pos
+            body_end = n
+            while pos < n:
+                self._tick()
+                eol = s.find('\n', pos)
+                eol = n if eol == -1 else eol
+                line = s[pos:eol]
+                if strip_tabs:
+                    line = line.lstrip('\t')
+                if line == delimiter:
+                    body_end = pos
+                    pos = min(eol + 1, n)
+                    break
+                pos = eol + 1
+            else:
+                pos = n
+
+            if not quoted and body_end > body_start:
+                body = s[body_start:body_end]
+                if '$(' in body or '`' in body:
+                    _Lexer(body, self.base_depth + depth, self.segments, self.deadline).lex_body()
+        return pos
+
+    def lex_body(self):
+        """Lex an unquoted heredoc body: only substitutions are commands."""
+        s, n = self.s, self.n
+        pos = 0
+        parts = []
+        while pos < n:
+            self._tick()
+            m = _BODY_PLAIN.match(s, pos)
+            if m:
+                pos = m.end()
+                continue
+            c = s[pos]
+            if c == '\\':
+                pos += 2
+            elif c == '$':
+                pos = self._lex_dollar(pos, parts, 0)
+            else:
+                pos = self.lex_list(pos + 1, '`', 1)
+
+
+def split_commands(command, deadline=None):
+    """
+    Lex a shell command into a list of Segments: top-level commands in order,
+    with commands found inside substitutions and heredoc bodies included.
+    Raises ShellSyntaxError if the command is nested more than MAX_NESTING deep,
+    and DeadlineExceeded if time.monotonic() passes `deadline`.
+    """
+    lexer = _Lexer(command, deadline=deadline)
+    lexer.lex_list(0)
+    return lexer.segments
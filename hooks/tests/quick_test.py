@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
+import os
 import sys
-sys.path.insert(0, '/home/yoda/.claude/hooks')
-from test_rm_logic import new_is_dangerous_rm_command
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pre_tool_use import is_dangerous_rm_command
 
 cmd = 'rm -rf /home/yoda/Library/Projects/VR/bubbles-game/bubble-test/android/.gradle'
-result = new_is_dangerous_rm_command(cmd)
+result = is_dangerous_rm_command(cmd)
 print(f'Command: {cmd}')
 print(f'Blocked: {result}')
-print('✅ Command should now be ALLOWED' if not result else '❌ Command still blocked')
\ No newline at end of file
+print('✅ Command should now be ALLOWED' if not result else '❌ Command still blocked')
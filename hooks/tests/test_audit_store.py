@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the central audit store: batched inserts, the indexed queries,
+idempotent log import and the hook writing allowed and blocked calls.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import audit_store
+import tool_use_log
+from audit_store import AuditStore, AuditWriter, make_event
+
+
+def payload(session, tool_name, **tool_input):
+    return {'session_id': session, 'tool_name': tool_name, 'tool_input': tool_input}
+
+
+def test_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AuditStore(os.path.join(tmp, 'audit.sqlite'))
+        week_ago = time.time() - 8 * 86400
+        store.add([
+            make_event(payload('s1', 'Bash', command='rm -rf /'), True, 'rm_path:root', '/a'),
+            make_event(payload('s1', 'Bash', command='ls'), False, None, '/a'),
+            make_event(payload('s2', 'Read', file_path='/a/.env'), True, 'env_file', '/b'),
+            make_event(payload('s2', 'Bash', command='rm -rf ~'), True, 'rm_path:home', '/b',
+                       timestamp=week_ago),
+        ])
+
+        recent = store.query(verdict='block', rule='rm_', since=time.time() - 7 * 86400)
+        assert [row['command'] for row in recent] == ['rm -rf /']
+        assert len(store.query(verdict='block', rule='rm_')) == 2
+        assert store.query(tool_name='Read')[0]['file_path'] == '/a/.env'
+        assert store.tool_mix() == {'s1': {'Bash': 2}, 's2': {'Bash': 1, 'Read': 1}}
+        assert store.stats()['blocked'] == 3
+
+
+def test_indexes_are_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AuditStore(os.path.join(tmp, 'audit.sqlite'))
+        plan = store.db.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM events WHERE verdict = 'block' AND timestamp >= 0"
+        ).fetchall()
+        assert any('events_verdict' in row[-1] for row in plan), plan
+
+
+def test_import_is_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = os.path.join(tmp, 'logs')
+        for command in ('ls', 'ls', 'pwd'):
+            tool_use_log.append_record(log_dir, payload('s1', 'Bash', command=command))
+        store = AuditStore(os.path.join(tmp, 'audit.sqlite'))
+        assert store.import_log_dir(log_dir) == 3
+        assert store.import_log_dir(log_dir) == 0
+        tool_use_log.append_record(log_dir, payload('s1', 'Bash', command='ls'))
+        assert store.import_log_dir(log_dir) == 1
+        assert store.tool_mix() == {'s1': {'Bash': 4}}
+
+
+def test_writer_flushes_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AuditStore(os.path.join(tmp, 'audit.sqlite'))
+        writer = AuditWriter(store, batch_size=10, flush_interval=0.05)
+        for i in range(25):
+            writer.add(make_event(payload('s', 'Bash', command=f'echo {i}'), False))
+        writer.close()
+        assert store.stats()['events'] == 25
+
+
+def test_hook_records_blocked_and_allowed_calls():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'audit.sqlite')
+        env = dict(os.environ, CLAUDE_GUARD_AUDIT='1', CLAUDE_GUARD_AUDIT_DB=db)
+        for command, expected in (('rm -rf /', 2), ('ls', 0)):
+            result = subprocess.run(
+                [sys.executable, os.path.join(HOOKS_DIR, 'pre_tool_use.py')],
+                input=json.dumps(payload('s1', 'Bash', command=command)),
+                env=env, cwd=tmp, capture_output=True, text=True, timeout=30)
+            assert result.returncode == expected, result.stderr
+
+        rows = AuditStore(db).query()
+        assert {(row['command'], row['verdict'], row['cwd']) for row in rows} == {
+            ('rm -rf /', 'block', os.path.realpath(tmp)), ('ls', 'allow', os.path.realpath(tmp)),
+        }
+        assert rows[0]['rule'] or rows[1]['rule']
+
+
+def test_parse_since():
+    assert abs(audit_store.parse_since('7d') - (time.time() - 7 * 86400)) < 5
+    assert audit_store.parse_since('1700000000') == 1700000000.0
+
+
+if __name__ == '__main__':
+    test_queries()
+    test_indexes_are_used()
+    test_import_is_idempotent()
+    test_writer_flushes_batches()
+    test_hook_records_blocked_and_allowed_calls()
+    test_parse_since()
+    print("✅ Audit store tests passed")
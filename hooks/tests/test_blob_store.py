@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed blob store and its use by the hook log and
+the audit store.
+"""
+
+import os
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import tool_use_log
+from audit_store import AuditStore, make_event
+from blob_store import BlobStore, is_ref
+
+
+def write_payload(content, session='s1'):
+    return {'session_id': session, 'tool_name': 'Write',
+            'tool_input': {'file_path': '/repo/big.py', 'content': content}}
+
+
+def test_round_trip_and_dedup():
+    with tempfile.TemporaryDirectory() as tmp:
+        blobs = BlobStore(tmp)
+        todos = [{'content': f'Task {i} ' * 10, 'status': 'pending', 'id': str(i)} for i in range(100)]
+        value = {'content': 'x' * 10000, 'small': 'y', 'todos': todos, 'n': 3}
+
+        stored = blobs.externalize(value, min_bytes=1000)
+        assert is_ref(stored['content']) and stored['content']['bytes'] == 10000
+        assert is_ref(stored['todos']) and stored['todos']['json']
+        assert stored['small'] == 'y' and stored['n'] == 3
+        assert blobs.rehydrate(stored) == value
+
+        blobs.externalize(value, min_bytes=1000)
+        assert blobs.stats()['blobs'] == 2
+
+
+def test_missing_blob_keeps_reference():
+    with tempfile.TemporaryDirectory() as tmp:
+        ref = {'$blob': '0' * 64, 'bytes': 5}
+        assert BlobStore(tmp).rehydrate({'content': ref}) == {'content': ref}
+
+
+def test_log_keeps_references_and_rehydrates():
+    with tempfile.TemporaryDirectory() as tmp:
+        content = 'print("hello")\n' * 2000
+        for _ in range(10):
+            tool_use_log.append_record(tmp, write_payload(content))
+
+        raw = list(tool_use_log.iter_records(tmp))
+        assert all(is_ref(r['tool_input']['content']) for r in raw)
+        assert os.path.getsize(os.path.join(tmp, tool_use_log.ACTIVE_NAME)) < 10 * 1024
+        assert BlobStore(os.path.join(tmp, tool_use_log.BLOBS_NAME)).stats()['blobs'] == 1
+
+        records = list(tool_use_log.iter_records(tmp, rehydrate=True))
+        assert records == [write_payload(content)] * 10
+
+
+def test_audit_payload_is_rehydrated():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AuditStore(os.path.join(tmp, 'audit.sqlite'))
+        payload = write_payload('z' * 50000)
+        store.add([make_event(payload, False)])
+        event = store.query()[0]
+        assert event['file_path'] == '/repo/big.py'
+        assert is_ref(store.payload(event['id'], rehydrate=False)['tool_input']['content'])
+        assert store.payload(event['id']) == payload
+
+
+if __name__ == '__main__':
+    test_round_trip_and_dedup()
+    test_missing_blob_keeps_reference()
+    test_log_keeps_references_and_rehydrates()
+    test_audit_payload_is_rehydrated()
+    print("✅ Blob store tests passed")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the debug log latency analyzer: hook and MCP event pairing,
+parallel runs over a directory, and the exact timings written by hooks
+with CLAUDE_HOOK_TIMING_LOG.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import debug_latency
+
+HOOK = '/home/u/.claude/hooks/pre_tool_use.py'
+
+LOG = f"""\
+[DEBUG] Writing to temp file: /home/u/.claude.json.tmp.42.1760000000000
+[DEBUG] Executing hook command: uv run {HOOK} with timeout 60000ms
+[DEBUG] Executing hook command: uv run {HOOK} with timeout 60000ms
+[DEBUG] Writing to temp file: /home/u/.claude.json.tmp.42.1760000000100
+[DEBUG] Hook command completed with status 0: uv run {HOOK}
+[DEBUG] Writing to temp file: /home/u/.claude.json.tmp.42.1760000000400
+[DEBUG] Hook command completed with status 2: uv run {HOOK}
+[DEBUG] MCP server "ide": Calling MCP tool: getDiagnostics
+[DEBUG] MCP server "ide": Calling MCP tool: closeAllDiffTabs
+[DEBUG] MCP server "ide": Tool 'closeAllDiffTabs' completed successfully in 180ms
+[DEBUG] MCP server "ide": Tool 'getDiagnostics' completed successfully in 2s
+[DEBUG] MCP server "ide": Calling MCP tool: getDiagnostics
+[DEBUG] MCP server "ide": Tool 'getDiagnostics' failed after 0s: Not connected
+[DEBUG] Executing hook command: /home/u/.claude/hooks/stop_sound.sh with timeout 60000ms
+"""
+
+
+def write_log(directory, name, text=LOG):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def test_pairs_hooks_and_mcp_calls():
+    with tempfile.TemporaryDirectory() as tmp:
+        result = debug_latency.analyze_file(write_log(tmp, 'a.txt'))
+
+    hook = result['hooks'][f'uv run {HOOK}']
+    assert hook == {'count': 2, 'statuses': {'0': 1, '2': 1}, 'run_ms': [], 'age_ms': []}
+    assert result['unmatched'] == {'hook_starts': 1, 'hook_ends': 0, 'mcp_starts': 0, 'mcp_ends': 0,
+                                   'hook_timings': 0}
+
+    assert result['mcp']['ide/getDiagnostics'] == {'count': 2, 'failed': 1, 'ms': [2000.0, 0.0]}
+    assert result['mcp']['ide/closeAllDiffTabs']['ms'] == [180.0]
+    slowest = result['outliers'][0]
+    assert (slowest['tool'], slowest['ms'], slowest['line']) == ('ide/getDiagnostics', 2000.0, 8)
+
+
+def test_directory_in_parallel_matches_sequential():
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in range(4):
+            write_log(tmp, f'{index}.txt', LOG * (index + 1))
+        write_log(tmp, 'empty.txt', '')
+        write_log(tmp, 'ignored.log', LOG)
+        sequential = debug_latency.analyze([tmp], jobs=1, top=3)
+        parallel = debug_latency.analyze([tmp], jobs=3, top=3)
+    assert parallel == sequential
+    assert sequential['files'] == 5
+    (hook,) = sequential['hooks']  # stop_sound.sh never completes
+    assert hook == {'command': f'uv run {HOOK}', 'count': 2 * (1 + 2 + 3 + 4), 'statuses': {'0': 10, '2': 10},
+                    'timed': 0, 'run_ms': None, 'age_ms': None}
+    assert sequential['unmatched']['hook_starts'] == 1 + 2 + 3 + 4
+    assert sequential['mcp'][0]['tool'] == 'ide/getDiagnostics' and sequential['mcp'][0]['total_ms'] == 20000.0
+    assert [row['ms'] for row in sequential['outliers']] == [2000.0] * 3
+
+
+def test_hooks_write_exact_timings():
+    with tempfile.TemporaryDirectory() as tmp:
+        timing_log = os.path.join(tmp, 'timing.jsonl')
+        env = dict(os.environ, CLAUDE_HOOK_TIMING_LOG=timing_log, CLAUDE_GUARD_AUDIT='0',
+                   CLAUDE_GUARD_SOCKET=os.path.join(tmp, 'no-daemon.sock'))
+        calls = [('pre_tool_use.py', {'session_id': 's1', 'tool_name': 'Bash', 'tool_input': {'command': 'ls'}}),
+                 ('pre_tool_use.py', {'session_id': 's1', 'tool_name': 'Read',
+                                      'tool_input': {'file_path': '.env'}})]
+        for script, payload in calls:
+            subprocess.run([sys.executable, os.path.join(HOOKS_DIR, script)], input=json.dumps(payload),
+                           capture_output=True, text=True, cwd=tmp, env=env, timeout=30)
+
+        with open(timing_log) as f:
+            records = [json.loads(line) for line in f]
+        assert [(r['hook'], r['session'], r['status']) for r in records] == [('pre_tool_use', 's1', 0),
+                                                                             ('pre_tool_use', 's1', 2)]
+        assert all(r['run_ns'] > 0 and r['end_ns'] > 0 for r in records)
+        if sys.platform.startswith('linux'):
+            assert all(r['age_ns'] >= r['run_ns'] - 10 ** 7 for r in records)  # Tick resolution
+
+        (report,) = debug_latency.timing_report(timing_log)
+        assert report['hook'] == 'pre_tool_use' and report['statuses'] == {'0': 1, '2': 1}
+        assert report['run_ms']['max'] > 0
+
+        # The session's debug log gets the times in its hook row
+        logs = os.path.join(tmp, 'debug')
+        os.mkdir(logs)
+        write_log(logs, 's1.txt')
+        write_log(logs, 's2.txt')
+        timings = debug_latency.session_timings(timing_log)
+        assert list(timings) == ['s1'] and len(timings['s1']['pre_tool_use']) == 2
+        (hook,) = debug_latency.analyze([logs], jobs=2, timings=timings)['hooks']
+        assert (hook['count'], hook['timed']) == (4, 2)
+        assert hook['run_ms']['max'] == max(round(r['run_ns'] / 1e6, 3) for r in records)
+
+
+def test_timings_pair_by_session_and_order():
+    timings = {'pre_tool_use': [(1.0, 30.0), (2.0, 40.0), (9.0, None)], 'guard_client': [(5.0, 6.0)]}
+    with tempfile.TemporaryDirectory() as tmp:
+        text = LOG + '[DEBUG] Executing hook command: guard_client.py with timeout 60000ms\n' \
+                     '[DEBUG] Hook command completed with status 0: guard_client.py\n'
+        result = debug_latency.analyze_file(write_log(tmp, 'a.txt', text), timings=timings)
+    assert result['hooks'][f'uv run {HOOK}'] == {'count': 2, 'statuses': {'0': 1, '2': 1},
+                                                 'run_ms': [1.0, 2.0], 'age_ms': [30.0, 40.0]}
+    assert result['hooks']['guard_client.py']['run_ms'] == [5.0]
+    assert result['unmatched']['hook_timings'] == 1
+    assert not debug_latency.runs_hook(b'/x/my_pre_tool_use.py', 'pre_tool_use')
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process git metadata reader, checked against the git CLI:
+refs (loose, packed, detached), gitdir links, index versions 2-4 and the
+"any tracked change?" answer for common working tree states.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import git_metadata
+
+
+def git(repo, *args):
+    return subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args], cwd=repo,
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def repository(path):
+    git_metadata.clear_cache()
+    return git_metadata.find_repository(path)
+
+
+def tracked_changes(repo_path):
+    """
+    has_tracked_changes(run_git=True), asserted to agree with git status;
+    without git the answer must agree too, or be None (unknown).
+    """
+    expected = bool(git(repo_path, 'status', '--porcelain', '--untracked-files=no'))
+    fast = repository(repo_path).has_tracked_changes()
+    assert fast in (expected, None), (fast, expected)
+    changed = repository(repo_path).has_tracked_changes(run_git=True)
+    assert changed is expected, (changed, expected)
+    return changed
+
+
+def make_repo(tmp):
+    repo = os.path.join(tmp, 'repo')
+    os.makedirs(repo)
+    git(repo, 'init', '-q', '-b', 'main')
+    write(os.path.join(repo, 'src', 'app.py'), 'print(1)\n')
+    write(os.path.join(repo, 'README.md'), 'readme\n')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'init')
+    return repo
+
+
+def test_refs_loose_packed_and_detached():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        head = git(repo, 'rev-parse', 'HEAD')
+
+        meta = repository(os.path.join(repo, 'src'))
+        assert meta.worktree == repo
+        assert meta.branch() == 'main' and meta.head_commit() == head
+
+        git(repo, 'pack-refs', '--all')
+        assert not os.path.exists(os.path.join(repo, '.git', 'refs', 'heads', 'main'))
+        assert repository(repo).head_commit() == head
+
+        git(repo, 'checkout', '-q', '--detach')
+        meta = repository(repo)
+        assert meta.branch() is None and meta.short_head() == head[:7]
+
+
+def test_linked_worktree_and_gitdir_link():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        git(repo, 'branch', 'feature')
+        worktree = os.path.join(tmp, 'wt')
+        git(repo, 'worktree', 'add', '-q', worktree, 'feature')
+
+        meta = repository(worktree)
+        assert meta.worktree == worktree
+        assert meta.common_dir == os.path.join(repo, '.git')
+        assert meta.branch() == 'feature'
+        assert meta.head_commit() == git(worktree, 'rev-parse', 'HEAD')
+        assert tracked_changes(worktree) is False
+
+        # Relative link, as in submodules
+        sub = os.path.join(tmp, 'sub')
+        os.makedirs(sub)
+        write(os.path.join(sub, '.git'), 'gitdir: ../repo/.git\n')
+        assert repository(sub).git_dir == os.path.join(repo, '.git')
+
+
+def test_tracked_changes_match_git_status():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        app = os.path.join(repo, 'src', 'app.py')
+        assert tracked_changes(repo) is False
+        assert repository(repo).has_tracked_changes() is False  # Without running git
+
+        write(os.path.join(repo, 'untracked.txt'), 'x')
+        assert tracked_changes(repo) is False
+
+        # Same size, written right after the index: only the content differs
+        write(app, 'print(2)\n')
+        assert tracked_changes(repo) is True
+        git(repo, 'checkout', '-q', 'src/app.py')
+        assert tracked_changes(repo) is False
+
+        os.chmod(app, 0o755)
+        assert tracked_changes(repo) is True
+        os.chmod(app, 0o644)
+
+        os.remove(os.path.join(repo, 'README.md'))
+        assert tracked_changes(repo) is True
+        git(repo, 'checkout', '-q', 'README.md')
+
+        time.sleep(0.01)
+        write(os.path.join(repo, 'README.md'), 'readme, longer\n')
+        git(repo, 'add', 'README.md')
+        assert tracked_changes(repo) is True  # Staged only
+        git(repo, 'commit', '-q', '-m', 'second')
+        assert tracked_changes(repo) is False
+
+        # Steps that leave the cache-tree invalid, or valid for another tree
+        write(app, 'print(3)\n')
+        git(repo, 'add', 'src/app.py')
+        git(repo, 'checkout', 'HEAD', '--', 'src/app.py')
+        assert tracked_changes(repo) is False
+        git(repo, 'status')
+        assert tracked_changes(repo) is False
+
+        write(app, 'print(4)\n')
+        git(repo, 'stash', '-q')
+        git(repo, 'stash', 'pop', '-q')
+        git(repo, 'checkout', '-q', 'src/app.py')
+        assert tracked_changes(repo) is False
+
+        git(repo, 'read-tree', 'HEAD')
+        assert tracked_changes(repo) is False
+
+        git(repo, 'reset', '-q', '--soft', 'HEAD~1')
+        assert tracked_changes(repo) is True
+        git(repo, 'reset', '-q', '--soft', 'HEAD@{1}')
+        assert tracked_changes(repo) is False
+
+        # HEAD commit in a pack
+        git(repo, 'gc', '-q')
+        assert repository(repo).head_tree() == git(repo, 'rev-parse', 'HEAD^{tree}')
+        assert repository(repo).has_tracked_changes() is False
+
+
+def test_index_versions():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        for version in (2, 4):
+            git(repo, 'update-index', '--index-version', str(version))
+            meta = repository(repo)
+            assert meta.index_header() == (version, 2)
+            assert [entry[0] for entry in meta.iter_index_entries()] == [b'README.md', b'src/app.py']
+            assert tracked_changes(repo) is False
+        write(os.path.join(repo, 'src', 'app.py'), 'print("changed")\n')
+        assert tracked_changes(repo) is True
+        git(repo, 'checkout', '-q', 'src/app.py')
+
+        # Extended flags need version 3; git ignores skip-worktree entries
+        git(repo, 'update-index', '--index-version', '2')
+        git(repo, 'update-index', '--skip-worktree', 'README.md')
+        git(repo, 'write-tree')  # Revalidates the cache-tree the flag change dropped
+        assert repository(repo).index_header() == (3, 2)
+        write(os.path.join(repo, 'README.md'), 'not looked at\n')
+        assert tracked_changes(repo) is False
+
+
+def test_results_are_memoized():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        meta = repository(repo)
+        assert git_metadata.find_repository(repo) is meta
+        assert meta.has_tracked_changes() is False
+        write(os.path.join(repo, 'README.md'), 'changed\n')
+        assert meta.has_tracked_changes() is False  # Until clear_cache()
+        assert repository(repo).has_tracked_changes() is True
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the differential corpus harness: the generated corpus, loading
+implementations in worker processes, and disagreement reporting.
+"""
+
+import os
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+sys.path.insert(0, os.path.join(HOOKS_DIR, 'benchmarks'))
+
+import guard_corpus
+
+# Blocks every rm -rf, like the guard before the whitelist
+BLOCK_ALL_RM = """
+import re
+
+def check(tool_name, tool_input):
+    return tool_name == 'Bash' and bool(re.search(r'\\brm\\s+-rf\\b', tool_input.get('command', '')))
+"""
+
+
+def test_generated_corpus_is_deterministic():
+    first = guard_corpus.generate_calls(500, seed=7)
+    assert first == guard_corpus.generate_calls(500, seed=7)
+    assert first != guard_corpus.generate_calls(500, seed=8)
+    assert {call['tool_name'] for call in first} >= {'Bash', 'Read', 'Write'}
+    assert not any('{home}' in str(call) for call in first)
+
+
+def test_identical_implementations_agree():
+    calls = guard_corpus.corpus_calls([guard_corpus.REGRESSION_CORPUS]) + guard_corpus.generate_calls(300)
+    report = guard_corpus.run(['worktree', guard_corpus.HOOKS_DIR], calls, jobs=2)
+    for stats in report['implementations'].values():
+        assert stats['disagreements'] == 0
+        assert stats['expectation_failures'] == 0
+        assert stats['errors'] == 0
+        assert stats['calls_per_second'] > 0
+    assert report['calls'] == len(calls)
+
+
+def test_reports_disagreements_and_expectation_failures():
+    calls = [
+        {'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf node_modules'}, 'expect': 'allow'},
+        {'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf /'}, 'expect': 'block'},
+        {'tool_name': 'Read', 'tool_input': {'file_path': '.env'}, 'expect': 'block'},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'block_all_rm.py')
+        with open(path, 'w') as f:
+            f.write(BLOCK_ALL_RM)
+        spec = path + ':check'
+        report = guard_corpus.run(['worktree', spec], calls, jobs=1)
+
+    assert report['implementations'][spec]['disagreements'] == 2
+    assert report['implementations'][spec]['expectation_failures'] == 2
+    assert report['implementations']['worktree']['expectation_failures'] == 0
+    assert [d['tool_input'] for d in report['disagreements']] == [calls[0]['tool_input'], calls[2]['tool_input']]
+    assert report['disagreements'][0]['verdicts'] == {'worktree': [False, None], spec: [True, None]}
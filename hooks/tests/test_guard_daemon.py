@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the resident guard daemon and its socket client.
+Checks that daemon verdicts match in-process evaluation and that the client
+falls back to in-process evaluation when no daemon is listening or the
+socket is not the current user's.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+# Keep the daemon's verdict cache, audit store and rule stats out of the hooks directory
+_state_dir = tempfile.mkdtemp()
+os.environ.setdefault('CLAUDE_GUARD_CACHE', os.path.join(_state_dir, 'verdicts.sqlite'))
+os.environ.setdefault('CLAUDE_GUARD_AUDIT_DB', os.path.join(_state_dir, 'audit.sqlite'))
+os.environ.setdefault('CLAUDE_GUARD_RULE_STATS_DB', os.path.join(_state_dir, 'rule_stats.sqlite'))
+
+import audit_store
+import guard_client
+import guard_server
+from guard_client import ask_daemon
+
+PAYLOADS = [
+    ({"tool_name": "Bash", "tool_input": {"command": "rm -rf /"}}, 2),
+    ({"tool_name": "Bash", "tool_input": {"command": "rm -rf .git"}}, 2),
+    ({"tool_name": "Bash", "tool_input": {"command": "rm -rf node_modules"}}, 0),
+    ({"tool_name": "Read", "tool_input": {"file_path": "/app/.env"}}, 2),
+    ({"tool_name": "Read", "tool_input": {"file_path": "/app/.env.example"}}, 0),
+    ({"tool_name": "TodoWrite", "tool_input": {"todos": []}}, 0),
+]
+
+
+def run_client(payload, env, cwd):
+    client = os.path.join(HOOKS_DIR, 'guard_client.py')
+    return subprocess.run([sys.executable, client], input=payload, env=env, cwd=cwd,
+                          capture_output=True, text=True, timeout=30)
+
+
+def test_daemon_matches_in_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'guard.sock')
+        # Signal handlers can only be installed from the main thread
+        thread = threading.Thread(target=guard_server.serve, args=(path, False), daemon=True)
+        thread.start()
+        for _ in range(50):
+            if os.path.exists(path):
+                break
+            time.sleep(0.05)
+
+        for payload, expected in PAYLOADS:
+            reply = ask_daemon(json.dumps(payload), tmp, path=path)
+            assert reply is not None, "daemon did not answer"
+            assert reply['exit_code'] == expected, (payload, reply)
+            if expected == 2:
+                assert 'BLOCKED' in reply['stderr']
+
+        # Allowed calls are logged relative to the client's cwd
+        with open(os.path.join(tmp, 'logs', 'pre_tool_use.jsonl')) as f:
+            assert len(f.readlines()) == 3
+
+
+def test_daemon_audits_blocked_secret_redacted():
+    key = 'AKIA' + 'Q7XZ' * 4
+    payload = {'session_id': 's', 'tool_name': 'Write',
+               'tool_input': {'file_path': 'a.py', 'content': f'k = "{key}"'}}
+    with tempfile.TemporaryDirectory() as tmp:
+        state = guard_server.GuardState()
+        if state.audit is not None:
+            state.audit.close()
+        store = audit_store.AuditStore(os.path.join(tmp, 'audit.sqlite'))
+        state.audit = audit_store.AuditWriter(store)
+        try:
+            reply = guard_server.handle_request(state, {'cwd': tmp, 'payload': json.dumps(payload)})
+        finally:
+            state.close()
+        (row,) = store.query()
+        stored = store.payload(row['id'])
+        store.close()
+    assert reply['exit_code'] == 2 and row['rule'] == 'secret:aws_access_key'
+    assert stored['tool_input']['content'] == 'k = "[REDACTED:aws_access_key]"'
+    assert key not in json.dumps(stored)
+
+
+def test_client_falls_back_without_daemon():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, CLAUDE_GUARD_SOCKET=os.path.join(tmp, 'missing.sock'))
+        for payload, expected in PAYLOADS:
+            result = run_client(json.dumps(payload), env, tmp)
+            assert result.returncode == expected, (payload, result.stderr)
+
+
+def serve_allow_all(path):
+    """A listener at `path` that allows whatever it is sent."""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+
+    def reply():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                try:
+                    conn.recv(65536)
+                    conn.sendall(b'{"exit_code": 0, "stderr": ""}')
+                except OSError:
+                    pass  # The client hung up
+
+    threading.Thread(target=reply, daemon=True).start()
+    return server
+
+
+def test_client_ignores_sockets_of_other_users():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'guard.sock')
+        server = serve_allow_all(path)
+        link = os.path.join(tmp, 'link.sock')
+        os.symlink(path, link)
+        saved = os.getuid
+        try:
+            assert ask_daemon('{}', tmp, path=path) == {'exit_code': 0, 'stderr': ''}
+            # Not a socket itself
+            assert ask_daemon('{}', tmp, path=link) is None
+            # Owned by and served as another user
+            guard_client.os.getuid = lambda: saved() + 1
+            assert ask_daemon('{}', tmp, path=path) is None
+            guard_client.os.getuid = saved
+
+            # The hook evaluates the call itself instead
+            payload = json.dumps({"tool_name": "Bash", "tool_input": {"command": "rm -rf /"}})
+            result = run_client(payload, dict(os.environ, CLAUDE_GUARD_SOCKET=link), tmp)
+            assert result.returncode == 2, result.stderr
+        finally:
+            guard_client.os.getuid = saved
+            server.close()
+
+
+if __name__ == '__main__':
+    test_daemon_matches_in_process()
+    test_daemon_audits_blocked_secret_redacted()
+    test_client_falls_back_without_daemon()
+    test_client_ignores_sockets_of_other_users()
+    print("✅ Guard daemon tests passed")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the linear-time detectors and the fail-closed limits: the single
+.env matcher, the command size guards (checked at their limits against the
+deadline) and the per-call deadline.
+"""
+
+import os
+import sys
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import pre_tool_use
+import shell_lexer
+
+
+def bash(command):
+    return pre_tool_use.check_tool_use('Bash', {'command': command})
+
+
+def test_env_matcher():
+    blocked = ['cat .env', 'echo KEY=1 > .env.local', 'cp .env.production /tmp', 'source app/.env',
+               'mv .envrc x', 'cat .env.sample .env']
+    allowed = ['cat .env.sample', 'cp .env.example .env.sample', 'echo environment', 'ls -la']
+    for command in blocked:
+        assert bash(command).rule == 'env_file', command
+    for command in allowed:
+        assert not bash(command).blocked, command
+
+
+def fill(unit, size, tail=''):
+    """`size` characters: whole repeats of `unit`, blanks, then `tail`."""
+    body = unit * ((size - len(tail)) // len(unit))
+    return body + ' ' * (size - len(tail) - len(body)) + tail
+
+
+def check_in_time(command):
+    started = time.perf_counter()
+    verdict = bash(command)
+    assert time.perf_counter() - started < pre_tool_use.CHECK_DEADLINE
+    return verdict
+
+
+def test_long_command_is_linear():
+    command = 'echo ' + 'x.env.sample ' * 10000 + '&& rm -rf build'
+    assert len(command) < pre_tool_use.MAX_LEXED_CHARS
+    assert not check_in_time(command).blocked
+
+
+def test_commands_at_the_limits_are_checked_in_time():
+    # Cannot run rm: not lexed, allowed up to MAX_COMMAND_CHARS
+    assert not check_in_time(fill('echo a; ', pre_tool_use.MAX_COMMAND_CHARS)).blocked
+    assert not check_in_time(fill('echo format perm; ', pre_tool_use.MAX_COMMAND_CHARS)).blocked
+
+    # May run rm: lexed up to MAX_LEXED_CHARS, even in the slowest shape measured
+    limit = pre_tool_use.MAX_LEXED_CHARS
+    for unit in ('`a`;', 'a&&', 'a>b ', '"$(a)" ', 'echo a; '):
+        assert not check_in_time(fill(unit, limit, '; rm -rf build')).blocked, unit
+        assert check_in_time(fill(unit, limit, '; rm -rf /')).rule == 'rm_path:root', unit
+    assert check_in_time(fill('echo a; ', limit + 1, '; rm -rf build')).rule == 'command_too_large'
+    assert check_in_time(fill('echo a; ', limit + 1, "; 'r'm -rf build")).rule == 'command_too_large'
+
+
+def test_oversized_command_fails_closed():
+    limit = pre_tool_use.MAX_COMMAND_CHARS
+    try:
+        pre_tool_use.MAX_COMMAND_CHARS = 100
+        assert bash('echo ' + 'x' * 200).rule == 'command_too_large'
+        assert not bash('echo ok').blocked
+    finally:
+        pre_tool_use.MAX_COMMAND_CHARS = limit
+
+
+def test_deadline_fails_closed():
+    command = 'echo ' + 'a ' * 30000 + '&& rm -rf build'
+    try:
+        shell_lexer.split_commands(command, deadline=time.monotonic() - 1)
+    except shell_lexer.DeadlineExceeded:
+        pass
+    else:
+        raise AssertionError("expected DeadlineExceeded")
+
+    deadline = pre_tool_use.CHECK_DEADLINE
+    try:
+        pre_tool_use.CHECK_DEADLINE = 0
+        verdict = bash(command)
+        assert verdict.blocked and verdict.rule == 'deadline'
+    finally:
+        pre_tool_use.CHECK_DEADLINE = deadline
+    assert not bash(command).blocked
+
+
+if __name__ == '__main__':
+    test_env_matcher()
+    test_long_command_is_linear()
+    test_commands_at_the_limits_are_checked_in_time()
+    test_oversized_command_fails_closed()
+    test_deadline_fails_closed()
+    print("✅ Guard limit tests passed")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the hook latency benchmark: the percentile summary and the
+baseline comparison the regression gate relies on, a warm run that
+leaves the in-process mode's environment alone, and runs that fail
+rather than time a crashed hook or a missing daemon.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(HOOKS_DIR, 'benchmarks')
+sys.path.insert(0, HOOKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import hook_latency
+
+
+def results(p50, p95, p99, group='all', mode='warm'):
+    return {'modes': {mode: {group: {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}}}}
+
+
+def test_summarize():
+    stats = hook_latency.summarize([4.0, 1.0, 3.0, 2.0, 5.0])
+    assert stats == {'count': 5, 'p50_ms': 3.0, 'p95_ms': 4.8, 'p99_ms': 4.96, 'mean_ms': 3.0, 'max_ms': 5.0}
+    assert hook_latency.summarize([7.0])['p99_ms'] == 7.0
+    assert hook_latency.summarize([]) == {'count': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0,
+                                          'mean_ms': 0.0, 'max_ms': 0.0}
+
+
+def test_compare():
+    baseline = results(10.0, 20.0, 40.0)
+    # Within tolerance (25%) plus the absolute slack
+    assert hook_latency.compare(results(12.9, 25.4, 50.4), baseline, 0.25) == []
+    regressions = hook_latency.compare(results(13.1, 20.0, 40.0), baseline, 0.25)
+    assert regressions == ['warm/all p50_ms: 13.100 > 13.000 (baseline 10.000)']
+    assert len(hook_latency.compare(results(100.0, 100.0, 100.0), baseline, 0.25)) == 3
+    # Sub-millisecond baselines are compared with the slack, not the ratio alone
+    assert hook_latency.compare(results(0.5, 0.5, 0.5), results(0.1, 0.1, 0.1), 0.25) == []
+    # Groups and modes missing from the baseline are not compared
+    assert hook_latency.compare(results(100.0, 100.0, 100.0, group='recorded'), baseline, 0.25) == []
+    assert hook_latency.compare(results(100.0, 100.0, 100.0, mode='cold'), baseline, 0.25) == []
+
+
+def test_warm_daemon_does_not_change_in_process_environment():
+    script = (
+        "import os, hook_latency\n"
+        "payload = {'tool_name': 'Bash', 'tool_input': {'command': 'ls'}}\n"
+        "result = hook_latency.run({'one': [payload]}, ['warm', 'in-process'], 1)\n"
+        "assert set(result['modes']) == {'warm', 'in-process'}\n"
+        "leaked = [name for name in ('CLAUDE_GUARD_VERDICT_CACHE', 'CLAUDE_GUARD_AUDIT',\n"
+        "                            'CLAUDE_GUARD_RULE_STATS') if name in os.environ]\n"
+        "assert not leaked, leaked\n"
+    )
+    env = {name: value for name, value in os.environ.items() if not name.startswith('CLAUDE_GUARD')}
+    result = subprocess.run([sys.executable, '-c', script], cwd=BENCHMARKS_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+def test_crashed_hook_is_not_timed():
+    with tempfile.TemporaryDirectory() as tmp:
+        hook = 'import sys; text = sys.stdin.read(); sys.exit(int(text) if text.isdigit() else text)'
+        argv = [sys.executable, '-c', hook]
+        assert hook_latency.time_process(argv, '0', tmp, dict(os.environ)) > 0
+        assert hook_latency.time_process(argv, '2', tmp, dict(os.environ)) > 0  # Blocked
+        try:
+            hook_latency.time_process(argv, 'Traceback', tmp, dict(os.environ))
+        except hook_latency.BenchmarkError as e:
+            assert 'status 1: Traceback' in str(e)
+        else:
+            raise AssertionError('a crashed hook was timed')
+
+
+def test_daemon_that_does_not_start_fails_the_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        # A directory in the way of the socket: the daemon cannot bind and exits
+        os.mkdir(os.path.join(tmp, 'guard.sock'))
+        try:
+            hook_latency.start_daemon(tmp, dict(os.environ))
+        except hook_latency.BenchmarkError as e:
+            assert 'exited with status' in str(e)
+        else:
+            raise AssertionError('warm mode would time the in-process fallback')
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the hook metrics: the in-memory registry and its Prometheus
+rendering, the textfile shared by one-shot hook processes, and the daemon's
+counters and HTTP endpoint.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+# Keep the daemon state out of the hooks directory
+_state_dir = tempfile.mkdtemp()
+os.environ.setdefault('CLAUDE_GUARD_CACHE', os.path.join(_state_dir, 'verdicts.sqlite'))
+os.environ.setdefault('CLAUDE_GUARD_AUDIT_DB', os.path.join(_state_dir, 'audit.sqlite'))
+os.environ.setdefault('CLAUDE_GUARD_RULE_STATS_DB', os.path.join(_state_dir, 'rule_stats.sqlite'))
+
+import guard_server
+import hook_metrics
+
+
+def test_render():
+    metrics = hook_metrics.Metrics()
+    metrics.inc('claude_hook_calls_total', tool='Bash')
+    metrics.inc('claude_hook_calls_total', tool='Bash')
+    metrics.observe('claude_hook_match_seconds', 0.0003, tool='Bash')
+    metrics.observe('claude_hook_match_seconds', 2.0, tool='Bash')
+    text = metrics.render()
+    assert '# TYPE claude_hook_calls_total counter' in text
+    assert 'claude_hook_calls_total{tool="Bash"} 2' in text
+    assert 'claude_hook_match_seconds_bucket{tool="Bash",le="0.00025"} 0' in text
+    assert 'claude_hook_match_seconds_bucket{tool="Bash",le="0.0005"} 1' in text
+    assert 'claude_hook_match_seconds_bucket{tool="Bash",le="+Inf"} 2' in text
+    assert 'claude_hook_match_seconds_count{tool="Bash"} 2' in text
+
+
+def test_hook_processes_share_textfile():
+    with tempfile.TemporaryDirectory() as tmp:
+        prom = os.path.join(tmp, 'claude_hooks.prom')
+        env = dict(os.environ, CLAUDE_HOOK_METRICS_TEXTFILE=prom)
+        payloads = [
+            {'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf /'}},
+            {'tool_name': 'Bash', 'tool_input': {'command': 'ls'}},
+            {'tool_name': 'Read', 'tool_input': {'file_path': 'README.md'}},
+        ]
+        for payload in payloads:
+            subprocess.run([sys.executable, os.path.join(HOOKS_DIR, 'pre_tool_use.py')],
+                           input=json.dumps(payload), env=env, cwd=tmp, capture_output=True,
+                           text=True, timeout=30)
+        subprocess.run([sys.executable, os.path.join(HOOKS_DIR, 'pre_tool_use.py')],
+                       input='not json', env=env, cwd=tmp, capture_output=True, text=True, timeout=30)
+
+        with open(prom) as f:
+            text = f.read()
+        assert 'claude_hook_calls_total{tool="Bash"} 2' in text
+        assert 'claude_hook_blocks_total{rule="rm_path:root",tool="Bash"} 1' in text
+        assert 'claude_hook_errors_total{stage="parse",tool=""} 1' in text
+        assert 'claude_hook_log_write_seconds_count{tool="Read"} 1' in text
+
+
+def test_daemon_counts_and_serves_metrics():
+    state = guard_server.GuardState()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for command in ('rm -rf ~', 'pwd'):
+                payload = json.dumps({'tool_name': 'Bash', 'tool_input': {'command': command}})
+                guard_server.handle_request(state, {'cwd': tmp, 'payload': payload})
+            guard_server.handle_request(state, {'cwd': tmp, 'payload': '{'})
+
+        server = hook_metrics.serve_http(state.metrics, 0)
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+            text = urllib.request.urlopen(url, timeout=5).read().decode('utf-8')
+        finally:
+            server.shutdown()
+        assert 'claude_hook_calls_total{tool="Bash"} 2' in text
+        assert 'claude_hook_blocks_total{rule="rm_path:home",tool="Bash"} 1' in text
+        assert 'claude_hook_errors_total{stage="parse",tool=""} 1' in text
+        assert 'claude_hook_match_seconds_count{tool="Bash"} 2' in text
+    finally:
+        state.close()
+
+
+def test_exporter_adds_only_growth():
+    with tempfile.TemporaryDirectory() as tmp:
+        prom = os.path.join(tmp, 'claude_hooks.prom')
+        metrics = hook_metrics.Metrics()
+        exporter = hook_metrics.TextfileExporter(metrics, prom)
+        metrics.inc('claude_hook_calls_total', tool='Edit')
+        exporter.export()
+        metrics.inc('claude_hook_calls_total', tool='Edit')
+        exporter.export()
+        exporter.export()
+        with open(prom) as f:
+            assert 'claude_hook_calls_total{tool="Edit"} 2' in f.read()
+
+
+if __name__ == '__main__':
+    test_render()
+    test_hook_processes_share_textfile()
+    test_daemon_counts_and_serves_metrics()
+    test_exporter_adds_only_growth()
+    print("✅ Hook metrics tests passed")
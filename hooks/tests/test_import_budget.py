@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Startup budget for the PreToolUse hook: `python -X importtime` must show
+pre_tool_use (with everything it imports at module level) staying under
+IMPORT_BUDGET_MS, and the zipapp bundle must behave like the script.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import build_zipapp
+
+# Cumulative import time allowed for pre_tool_use, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get('CLAUDE_HOOK_IMPORT_BUDGET_MS', 60))
+
+# Modules the hook must not import on a plain allow path
+LAZY_MODULES = ('shell_lexer', 'pathlib', 'hashlib', 'subprocess', 'shlex', 'sqlite3')
+
+
+def import_times(module):
+    """Return {module name: cumulative microseconds} from -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=HOOKS_DIR, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time_within_budget():
+    # Best of three runs, to keep a busy machine from failing the test
+    best = min(import_times('pre_tool_use')['pre_tool_use'] for _ in range(3)) / 1000
+    assert best < IMPORT_BUDGET_MS, f"pre_tool_use imports in {best:.1f}ms (budget {IMPORT_BUDGET_MS}ms)"
+
+
+def test_heavy_modules_are_lazy():
+    times = import_times('pre_tool_use')
+    eager = [name for name in LAZY_MODULES if name in times]
+    assert not eager, f"imported at module level: {', '.join(eager)}"
+
+
+def run_bundle(bundle, payload, cwd):
+    return subprocess.run([sys.executable, bundle], input=json.dumps(payload), cwd=cwd,
+                          capture_output=True, text=True, timeout=60)
+
+
+def test_zipapp_bundle_matches_script():
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = build_zipapp.build_bundle('pre_tool_use', os.path.join(tmp, 'dist'))
+
+        blocked = run_bundle(bundle, {'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf /'}}, tmp)
+        assert blocked.returncode == 2
+        assert 'BLOCKED' in blocked.stderr
+
+        allowed = run_bundle(bundle, {'tool_name': 'Bash', 'tool_input': {'command': 'ls'}}, tmp)
+        assert allowed.returncode == 0, allowed.stderr
+        assert os.path.exists(os.path.join(tmp, 'logs', 'pre_tool_use.jsonl'))
+
+
+def test_status_line_bundle():
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = build_zipapp.build_bundle('status_line', tmp)
+        payload = {'model': {'display_name': 'Opus'}, 'workspace': {'current_dir': tmp}}
+        result = run_bundle(bundle, payload, tmp)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.startswith('[Opus]')
+
+
+if __name__ == '__main__':
+    test_import_time_within_budget()
+    test_heavy_modules_are_lazy()
+    test_zipapp_bundle_matches_script()
+    test_status_line_bundle()
+    print("✅ Import budget tests passed")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk replay mode: pre_tool_use.py --replay.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOOK = os.path.join(HOOKS_DIR, 'pre_tool_use.py')
+
+PAYLOADS = [
+    ({'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf /'}}, 'rm_path:root'),
+    ({'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf src/.git'}}, 'rm_git_directory'),
+    ({'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf node_modules'}}, None),
+    ({'tool_name': 'Read', 'tool_input': {'file_path': '.env.local'}}, 'env_file'),
+    ({'tool_name': 'Grep', 'tool_input': {'pattern': 'rm -rf /'}}, None),
+]
+
+
+def replay(input_path, workers):
+    result = subprocess.run(
+        [sys.executable, HOOK, '--replay', input_path, '--workers', str(workers), '--batch-size', '3'],
+        capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout, json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def test_replay_verdicts_and_summary():
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'payloads.jsonl')
+        with open(input_path, 'w') as f:
+            for _ in range(4):
+                for payload, _rule in PAYLOADS:
+                    f.write(json.dumps(payload) + '\n')
+            f.write('not json\n')
+
+        serial, summary = replay(input_path, 1)
+        parallel, parallel_summary = replay(input_path, 2)
+        assert serial == parallel
+        assert summary == parallel_summary
+
+        verdicts = [json.loads(line) for line in serial.splitlines()]
+        assert [v['line'] for v in verdicts] == list(range(1, 22))
+        for verdict, (_payload, rule) in zip(verdicts, PAYLOADS * 4):
+            assert verdict['rule'] == rule
+            assert verdict['exit_code'] == (2 if rule else 0)
+        assert 'error' in verdicts[-1]
+
+        assert summary['records'] == 21
+        assert summary['blocked'] == 12
+        assert summary['errors'] == 1
+        assert summary['rules'] == {'rm_path:root': 4, 'rm_git_directory': 4, 'env_file': 4}
+
+
+if __name__ == '__main__':
+    test_replay_verdicts_and_summary()
+    print("✅ Replay tests passed")
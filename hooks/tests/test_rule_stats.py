@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the rule hit counters, their persistence and the adaptive path
+rule order, which must give the same verdicts as the written order even
+while a daemon thread resets the compiled matchers.
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import pre_tool_use
+from rule_stats import RuleStatsStore
+
+SAMPLE_PATHS = [
+    '/', '/*', '~', '~/', '$HOME', '..', '../*', '*', '.', '/usr', '/usr/lib', '/etc/x',
+    '/var', '/boot/grub', '/sys', '/proc/1', 'node_modules', 'dist/', './build/out',
+    '../lib', '../tmp/x', 'src', 'a.log', 'x.log.1', '/tmp/x', '/opt/app', '.git',
+    os.path.join(pre_tool_use.USER_HOME, 'p/q/build'), os.path.join(pre_tool_use.USER_HOME, 'x.tmp'),
+]
+
+
+def random_paths(count, seed=7):
+    rng = random.Random(seed)
+    pieces = ['/', '.', '..', '~', '*', 'node_modules', 'build', 'src', 'usr', 'etc', '.log',
+              '.tmp', '1', 'a', '$HOME', ' ', '-', pre_tool_use.USER_HOME]
+    return [''.join(rng.choice(pieces) for _ in range(rng.randrange(1, 6))) for _ in range(count)]
+
+
+def test_any_group_order_gives_same_verdicts():
+    paths = SAMPLE_PATHS + random_paths(20000)
+    fixed = pre_tool_use.compile_path_rules(pre_tool_use.DANGEROUS_PATH_RULES + pre_tool_use.SAFE_PATH_RULES)
+    rng = random.Random(1)
+    for _ in range(5):
+        hits = {'path:' + name: rng.randrange(1000) for name in pre_tool_use.PATH_RULE_KINDS}
+        adaptive = pre_tool_use.compile_path_rules(pre_tool_use.order_path_rules(hits))
+        for path in paths:
+            a, b = fixed.match(path), adaptive.match(path)
+            kind_a = a and pre_tool_use.PATH_RULE_KINDS[a.lastgroup]
+            kind_b = b and pre_tool_use.PATH_RULE_KINDS[b.lastgroup]
+            assert kind_a == kind_b, path
+            if kind_a == 'dangerous':
+                assert a.lastgroup == b.lastgroup, path
+
+
+def test_frequent_rules_come_first():
+    order = [name for name, _ in pre_tool_use.order_path_rules(
+        {'path:relative_name': 50, 'path:safe_directory': 900, 'path:system_etc': 3})]
+    assert order[0] == 'system_etc'
+    dangerous = len(pre_tool_use.DANGEROUS_PATH_RULES)
+    assert order[dangerous:dangerous + 2] == ['safe_directory', 'relative_name']
+
+
+def test_counters_are_recorded_and_persisted():
+    with tempfile.TemporaryDirectory() as tmp:
+        pre_tool_use.RULE_HITS.clear()
+        pre_tool_use.CHECK_NS.clear()
+        for command in ('rm -rf node_modules dist', 'rm -rf /', 'ls'):
+            pre_tool_use.evaluate({'tool_name': 'Bash', 'tool_input': {'command': command}})
+        pre_tool_use.evaluate({'tool_name': 'Read', 'tool_input': {'file_path': '.env'}})
+
+        hits = pre_tool_use.RULE_HITS
+        assert hits['path:safe_directory'] == 2 and hits['path:root'] == 1
+        assert hits['verdict:allow'] == 2 and hits['verdict:rm_path:root'] == 1
+        assert hits['verdict:env_file'] == 1
+        assert hits['check:rm'] == 3 and pre_tool_use.CHECK_NS['check:rm'] > 0
+
+        store = RuleStatsStore(os.path.join(tmp, 'rule_stats.sqlite'))
+        saved = pre_tool_use._rule_stats
+        try:
+            pre_tool_use._rule_stats = store
+            pre_tool_use.flush_rule_stats()
+            pre_tool_use.evaluate({'tool_name': 'Bash', 'tool_input': {'command': 'rm -rf dist'}})
+            pre_tool_use.flush_rule_stats()
+        finally:
+            pre_tool_use._rule_stats = saved
+        assert not pre_tool_use.RULE_HITS
+        assert store.hits('path:')['path:safe_directory'] == 3
+        report = {row['name']: row for row in store.report('check:')}
+        assert report['check:rm']['hits'] == 4 and report['check:rm']['mean_us'] > 0
+
+
+def test_matchers_survive_a_concurrent_reset():
+    compile_path_rules = pre_tool_use.compile_path_rules
+
+    def compile_then_reset(rules):
+        # flush_rule_stats() in another thread, between compiling and returning
+        matcher = compile_path_rules(rules)
+        pre_tool_use.PATH_MATCHERS = None
+        return matcher
+
+    pre_tool_use.PATH_MATCHERS = None
+    pre_tool_use.compile_path_rules = compile_then_reset
+    try:
+        matcher, safe_matcher = pre_tool_use.path_matchers()
+    finally:
+        pre_tool_use.compile_path_rules = compile_path_rules
+    assert matcher is not None and safe_matcher is not None
+    assert matcher.match('/').lastgroup == 'root'
+
+
+if __name__ == '__main__':
+    test_any_group_order_gives_same_verdicts()
+    test_frequent_rules_come_first()
+    test_counters_are_recorded_and_persisted()
+    test_matchers_survive_a_concurrent_reset()
+    print("✅ Rule stats tests passed")
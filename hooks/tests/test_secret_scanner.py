@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the secret scanner and the guard blocking secrets written through
+Write, Edit and MultiEdit. Fake secrets are assembled at runtime so the
+repository itself never contains a string that looks like a credential.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import pre_tool_use
+import secret_scanner
+import shell_lexer
+
+AWS_KEY = 'AKIA' + 'Q7XZ' * 4
+GITHUB_TOKEN = 'ghp' + '_' + 'a1B2c3D4e5' * 4
+PRIVATE_KEY = '-----BEGIN ' + 'OPENSSH PRIVATE KEY-----\nb3BlbnNzaC1rZXktdjEAAAAA\n'
+
+
+def scan(text):
+    return [(f.name, f.offset) for f in secret_scanner.get_scanner().scan(text, first_only=False)]
+
+
+def test_finds_secrets_and_their_offsets():
+    text = f'aws = "{AWS_KEY}"\ntoken: {GITHUB_TOKEN}\n{PRIVATE_KEY}'
+    assert scan(text) == [
+        ('aws_access_key', text.index(AWS_KEY)),
+        ('github_token', text.index(GITHUB_TOKEN)),
+        ('private_key', text.index('-----BEGIN')),
+    ]
+
+
+def test_ignores_lookalikes():
+    assert scan('AKIA' + 'short') == []
+    assert scan('XAKIA' + 'Q7XZ' * 4) == []          # Inside a longer identifier
+    assert scan('AKIA' + 'Q7XZ' * 4 + 'Q') == []     # Too long for an access key id
+    assert scan('AKIAIOSFODNN7' + 'EXAMPLE') == []   # AWS documentation placeholder
+    assert scan('-----BEGIN ' + 'PUBLIC KEY-----') == []
+    assert scan('def ghp_helper(): pass') == []
+
+
+def test_matches_across_chunk_boundaries():
+    chunk = secret_scanner.CHUNK_CHARS
+    for start in (chunk - 2, chunk - len(GITHUB_TOKEN) // 2, chunk):
+        text = 'x ' * (start // 2) + (' ' if start % 2 else '') + GITHUB_TOKEN + ' tail'
+        assert scan(text) == [('github_token', start)], start
+
+
+def test_stream_scan_matches_whole_text_scan():
+    parts = ['filler line\n' * 70000, AWS_KEY, '\n', 'y' * 1000, ' ', GITHUB_TOKEN, '\n' * 3]
+    text = ''.join(parts)
+    found = secret_scanner.get_scanner().scan_stream(io.StringIO(text), first_only=False)
+    assert [(f.name, f.offset) for f in found] == scan(text)
+    assert len(found) == 2
+
+
+def test_redact_replaces_only_the_secret():
+    text = f'key={AWS_KEY}; other=1'
+    assert secret_scanner.get_scanner().redact(text) == 'key=[REDACTED:aws_access_key]; other=1'
+
+
+def test_write_edit_and_multiedit_content_is_blocked():
+    calls = [
+        ('Write', {'file_path': 'config.py', 'content': f'KEY = "{AWS_KEY}"\n'}),
+        ('Edit', {'file_path': 'config.py', 'old_string': 'KEY = None', 'new_string': f'KEY = "{GITHUB_TOKEN}"'}),
+        ('MultiEdit', {'file_path': 'id_rsa', 'edits': [{'old_string': 'a', 'new_string': 'b'},
+                                                       {'old_string': '', 'new_string': PRIVATE_KEY}]}),
+    ]
+    rules = [pre_tool_use.check_tool_use(tool_name, tool_input).rule for tool_name, tool_input in calls]
+    assert rules == ['secret:aws_access_key', 'secret:github_token', 'secret:private_key']
+
+    verdict = pre_tool_use.check_tool_use(*calls[0])
+    assert verdict.blocked and AWS_KEY not in ' '.join(verdict.messages)
+    # Removing a secret is fine
+    assert not pre_tool_use.check_tool_use('Edit', {'file_path': 'config.py', 'old_string': AWS_KEY,
+                                                    'new_string': 'os.environ["KEY"]'}).blocked
+
+
+def test_multi_megabyte_write_is_scanned_within_budget():
+    content = ('def handler(event):\n    return {"status": 200, "body": event}\n' * 60000)
+    assert len(content) > 3 * 1024 * 1024
+    started = time.perf_counter()
+    assert not pre_tool_use.check_tool_use('Write', {'file_path': 'big.py', 'content': content}).blocked
+    assert time.perf_counter() - started < pre_tool_use.CHECK_DEADLINE
+
+    content += AWS_KEY
+    assert pre_tool_use.check_tool_use('Write', {'file_path': 'big.py', 'content': content}).rule == \
+        'secret:aws_access_key'
+
+
+def test_scan_stops_at_the_deadline():
+    text = 'AKIA ' * (3 * secret_scanner.CHUNK_CHARS // 5)
+    try:
+        secret_scanner.get_scanner().scan(text, deadline=time.monotonic() - 1)
+    except shell_lexer.DeadlineExceeded:
+        pass
+    else:
+        raise AssertionError('scan ran past its deadline')
+
+
+def test_audit_store_gets_the_redacted_payload():
+    import audit_store
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['CLAUDE_GUARD_AUDIT_DB'] = os.path.join(tmp, 'audit.sqlite')
+        try:
+            payload = {'session_id': 's', 'tool_name': 'Write',
+                       'tool_input': {'file_path': 'a.py', 'content': f'k = "{AWS_KEY}"'}}
+            verdict = pre_tool_use.evaluate(payload)
+            pre_tool_use.audit_tool_use(payload, verdict, tmp)
+            store = audit_store.AuditStore(os.environ['CLAUDE_GUARD_AUDIT_DB'])
+            (row,) = store.query()
+            stored = store.payload(row['id'])
+            store.close()
+        finally:
+            del os.environ['CLAUDE_GUARD_AUDIT_DB']
+    assert row['rule'] == 'secret:aws_access_key'
+    assert stored['tool_input']['content'] == 'k = "[REDACTED:aws_access_key]"'
+
+
+def test_prefix_only_write_is_stopped_at_the_deadline():
+    content = 'AKIA' * 2000000
+    started = time.perf_counter()
+    verdict = pre_tool_use.check_tool_use('Write', {'file_path': 'keys.txt', 'content': content})
+    assert (verdict.blocked, verdict.rule) == (True, 'deadline')
+    # Checked every CHECK_HITS hits, not only between chunks
+    assert time.perf_counter() - started < pre_tool_use.CHECK_DEADLINE + 0.25
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass shell lexer and the rm checks built on it.
+"""
+
+import os
+import sys
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import shell_lexer
+from pre_tool_use import is_dangerous_rm_command
+
+
+def words(command):
+    return [segment.words for segment in shell_lexer.split_commands(command)]
+
+
+def test_operators_and_quotes():
+    assert words('ls && rm -rf x; echo "a; b" | grep y') == [
+        ['ls'], ['rm', '-rf', 'x'], ['echo', 'a; b'], ['grep', 'y'],
+    ]
+    assert words("rm -rf 'my dir' a\\ b") == [['rm', '-rf', 'my dir', 'a b']]
+    assert words('ls # rm -rf /') == [['ls']]
+    assert words('rm -rf build 2>/dev/null') == [['rm', '-rf', 'build']]
+
+
+def test_substitutions_are_visible():
+    assert ['rm', '-rf', '/'] in words('echo $(rm -rf /)')
+    assert ['rm', '-rf', '~'] in words('echo "`rm -rf ~`"')
+    assert ['rm', '-rf', '/'] in words('diff <(rm -rf /) b')
+    assert ['rm', '-rf', '/'] in words('x=$(ls $(rm -rf /))')
+
+
+def test_heredoc_bodies():
+    command = 'cat <<EOF > notes.md\nrm -rf /\n$(rm -rf /etc)\nEOF\nrm -rf dist'
+    assert words(command) == [['cat'], ['rm', '-rf', '/etc'], ['rm', '-rf', 'dist']]
+    quoted = "cat <<'EOF'\n$(rm -rf /)\nEOF"
+    assert words(quoted) == [['cat']]
+
+
+def test_nesting_limit():
+    command = '$(' * (shell_lexer.MAX_NESTING + 2) + 'rm -rf /' + ')' * (shell_lexer.MAX_NESTING + 2)
+    try:
+        shell_lexer.split_commands(command)
+    except shell_lexer.ShellSyntaxError:
+        pass
+    else:
+        raise AssertionError("expected ShellSyntaxError")
+    assert is_dangerous_rm_command(command)
+
+
+def test_rm_verdicts():
+    blocked = [
+        'rm -rf /', 'sudo -u root rm -rf /etc', '/bin/rm -rf ~', 'ls && rm -fr ..',
+        'echo $(rm -rf /)', 'rm --rec --force /', 'rm -r build -f /', 'rm -rf .git',
+        'cat <<EOF\n$(rm -rf ~)\nEOF',
+    ]
+    allowed = [
+        'rm -rf node_modules', 'git rm -rf src', 'rm -rf dist 2>/dev/null',
+        'cat <<EOF\nrm -rf /\nEOF', 'echo "rm -rf /"', 'rm -f /tmp/file',
+    ]
+    for command in blocked:
+        assert is_dangerous_rm_command(command), command
+    for command in allowed:
+        assert not is_dangerous_rm_command(command), command
+
+
+def test_large_heredoc_is_linear():
+    body = 'line with "quotes" and $vars and `ticks\n' * 50000
+    command = "cat <<'EOF' > big.txt\n" + body + "EOF\nrm -rf dist"
+    started = time.perf_counter()
+    assert words(command) == [['cat'], ['rm', '-rf', 'dist']]
+    assert time.perf_counter() - started < 2.0
+
+
+if __name__ == '__main__':
+    test_operators_and_quotes()
+    test_substitutions_are_visible()
+    test_heredoc_bodies()
+    test_nesting_limit()
+    test_rm_verdicts()
+    test_large_heredoc_is_linear()
+    print("✅ Shell lexer tests passed")
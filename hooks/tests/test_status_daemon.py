@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the status line daemon: a render hands its workspace over, the
+daemon keeps the line current as HEAD, the index and refs change (with
+inotify and with the polling fallback), and renders fall back to reading
+git metadata again once the daemon is gone. The dirty check runs off the
+daemon's event loop.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUS_DIR = os.path.join(os.path.dirname(HOOKS_DIR), 'status')
+sys.path.insert(0, STATUS_DIR)
+
+import status_daemon
+import status_line
+import git_metadata  # On sys.path via status_line
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args], cwd=repo,
+                   check=True, capture_output=True)
+
+
+def make_repo(tmp):
+    repo = os.path.join(tmp, 'repo')
+    os.makedirs(os.path.join(repo, 'src'))
+    git(repo, 'init', '-q', '-b', 'main')
+    with open(os.path.join(repo, 'src', 'app.py'), 'w') as f:
+        f.write('print(1)\n')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'init')
+    return repo
+
+
+def render(workspace, cache_dir):
+    payload = json.dumps({'model': {'display_name': 'Opus'}, 'workspace': {'current_dir': workspace}})
+    result = subprocess.run([sys.executable, os.path.join(STATUS_DIR, 'status_line.py')], input=payload,
+                            capture_output=True, text=True, timeout=10,
+                            env=dict(os.environ, CLAUDE_STATUS_CACHE_DIR=cache_dir))
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def daemon_line(workspace, cache_dir):
+    status_line.DAEMON_DIR = os.path.join(cache_dir, 'daemon')
+    return status_line.read_daemon_line(workspace)
+
+
+def wait_for_line(workspace, cache_dir, expected):
+    line = None
+    for _ in range(200):
+        line = daemon_line(workspace, cache_dir)
+        if line == expected:
+            return
+        time.sleep(0.025)
+    raise AssertionError(f'daemon line {line!r}, expected {expected!r}')
+
+
+def start_daemon(cache_dir, *args):
+    process = subprocess.Popen([sys.executable, os.path.join(STATUS_DIR, 'status_daemon.py'), *args],
+                               env=dict(os.environ, CLAUDE_STATUS_CACHE_DIR=cache_dir),
+                               stderr=subprocess.PIPE, text=True)
+    # Ready once it has said where it writes
+    assert 'writing lines' in process.stderr.readline()
+    return process
+
+
+def stop_daemon(process):
+    process.terminate()
+    assert process.wait(timeout=10) == 0
+
+
+def check_daemon_follows_repository(*args):
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        workspace = os.path.join(repo, 'src')
+        cache_dir = os.path.join(tmp, 'cache')
+        daemon = start_daemon(cache_dir, *args)
+        try:
+            # First render computes the line itself and hands the workspace over
+            assert render(workspace, cache_dir).startswith('[Opus] \U0001F4C1 src | \U0001F33F main')
+            wait_for_line(workspace, cache_dir, '\U0001F4C1 src | \U0001F33F main')
+            assert render(workspace, cache_dir) == '[Opus] \U0001F4C1 src | \U0001F33F main'
+
+            git(repo, 'checkout', '-q', '-b', 'feature/x')
+            wait_for_line(workspace, cache_dir, '\U0001F4C1 src | \U0001F33F feature/x')
+
+            with open(os.path.join(repo, 'new.txt'), 'w') as f:
+                f.write('x')
+            git(repo, 'add', 'new.txt')
+            wait_for_line(workspace, cache_dir, '\U0001F4C1 src | \U0001F33F feature/x*')
+
+            git(repo, 'commit', '-q', '-m', 'second')
+            wait_for_line(workspace, cache_dir, '\U0001F4C1 src | \U0001F33F feature/x')
+        finally:
+            stop_daemon(daemon)
+
+        # Lines are removed on exit; renders work without the daemon
+        assert daemon_line(workspace, cache_dir) is None
+        assert render(workspace, cache_dir).startswith('[Opus] \U0001F4C1 src | \U0001F33F feature/x')
+
+
+def test_daemon_follows_repository_with_inotify():
+    check_daemon_follows_repository()
+
+
+def test_daemon_follows_repository_by_polling():
+    check_daemon_follows_repository('--poll')
+
+
+def test_line_of_a_dead_daemon_is_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        status_line.DAEMON_DIR = tmp
+        process = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                 capture_output=True, text=True)
+        path = os.path.join(tmp, status_line.escape_path('/work') + '.line')
+        with open(path, 'w') as f:
+            f.write(f'{process.stdout.strip()}\n\U0001F4C1 work')
+        assert status_line.read_daemon_line('/work') is None
+        with open(path, 'w') as f:
+            f.write(f'{os.getpid()}\n\U0001F4C1 work')
+        assert status_line.read_daemon_line('/work') == '\U0001F4C1 work'
+
+
+def test_idle_workspaces_are_dropped():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        daemon = status_daemon.StatusDaemon(tmp, status_daemon.Inotify())
+        try:
+            daemon.add_workspace(repo)
+            assert os.path.exists(daemon.line_path(repo)) and daemon.watches
+            daemon.drop_idle(time.monotonic() + status_daemon.IDLE_TIMEOUT + 1)
+            assert not os.path.exists(daemon.line_path(repo))
+            assert not daemon.repos and not daemon.watches
+        finally:
+            daemon.inotify.close()
+
+
+def test_dirty_check_does_not_block_the_loop():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        with open(os.path.join(repo, 'src', 'app.py'), 'w') as f:
+            f.write('print(2)\n')
+        release = threading.Event()
+        check = git_metadata.Repository.has_tracked_changes
+
+        def slow_check(self, run_git=False):
+            release.wait(10)
+            return check(self, run_git)
+
+        daemon = status_daemon.StatusDaemon(tmp)
+        git_metadata.Repository.has_tracked_changes = slow_check
+        try:
+            daemon.add_workspace(repo)
+            # The branch is written while the check still runs
+            assert daemon.lines[repo] == '\U0001F4C1 repo | \U0001F33F main'
+            release.set()
+            for _ in range(200):
+                daemon.apply_checks()
+                if daemon.lines[repo].endswith('*'):
+                    break
+                time.sleep(0.025)
+            assert daemon.lines[repo] == '\U0001F4C1 repo | \U0001F33F main*'
+        finally:
+            git_metadata.Repository.has_tracked_changes = check
+            release.set()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the status line's cached git dirty marker: renders never wait for
+git, show the last known value with a staleness marker, and pick up the
+result of the background refresh unless the repository changed while it ran.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUS_LINE = os.path.join(os.path.dirname(HOOKS_DIR), 'status', 'status_line.py')
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args], cwd=repo,
+                   check=True, capture_output=True)
+
+
+def make_repo(tmp):
+    repo = os.path.join(tmp, 'repo')
+    os.makedirs(os.path.join(repo, 'src'))
+    git(repo, 'init', '-q', '-b', 'main')
+    with open(os.path.join(repo, 'src', 'app.py'), 'w') as f:
+        f.write('print(1)\n')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'init')
+    return repo
+
+
+def render(workspace, cache_dir):
+    payload = json.dumps({'model': {'display_name': 'Opus'}, 'workspace': {'current_dir': workspace}})
+    result = subprocess.run([sys.executable, STATUS_LINE], input=payload, capture_output=True,
+                            text=True, timeout=10, env=dict(os.environ, CLAUDE_STATUS_CACHE_DIR=cache_dir))
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def render_until(workspace, cache_dir, expected):
+    for _ in range(200):
+        line = render(workspace, cache_dir)
+        if line.endswith(expected):
+            return line
+        time.sleep(0.025)
+    raise AssertionError(f'{line!r} never ended with {expected!r}')
+
+
+def test_stale_value_then_refreshed_value():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(tmp)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        # Nothing known yet: no marker, flagged as stale, refresh started
+        assert render(repo, cache_dir) == '[Opus] \U0001F4C1 repo | \U0001F33F main?'
+        render_until(repo, cache_dir, 'main')
+
+        # An untracked file changes the root directory but is not a change
+        with open(os.path.join(repo, 'new.txt'), 'w') as f:
+            f.write('x')
+        assert render(repo, cache_dir).endswith('main?')
+        render_until(repo, cache_dir, 'main')
+
+        # Staging changes the index
+        git(repo, 'add', 'new.txt')
+        assert render(repo, cache_dir).endswith('main?')
+        render_until(repo, cache_dir, 'main*')
+
+
+def test_render_does_not_wait_for_git():
+    sys.path.insert(0, os.path.dirname(STATUS_LINE))
+    import status_line  # Puts hooks/ on sys.path
+    import git_metadata
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = git_metadata.find_repository(make_repo(tmp))
+        status_line.CACHE_DIR = os.path.join(tmp, 'cache')
+        calls = []
+        status_line.start_refresh = lambda *args: calls.append(args)
+
+        assert status_line.get_dirty_status(repo) == '?'
+        assert len(calls) == 1
+
+        # A refresh in flight is not started again
+        status_line.write_cache(repo.worktree, {'refreshing_since': time.time()})
+        assert status_line.get_dirty_status(repo) == '?'
+        assert len(calls) == 1
+
+        status_line.write_cache(repo.worktree, {'key': status_line.cache_key(repo.worktree, repo.git_dir),
+                                                'dirty': '*', 'checked_at': time.time()})
+        assert status_line.get_dirty_status(repo) == '*'
+        assert len(calls) == 1
+
+
+def test_change_during_refresh_is_not_cached_as_fresh():
+    sys.path.insert(0, os.path.dirname(STATUS_LINE))
+    import status_line  # Puts hooks/ on sys.path
+    import git_metadata
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = git_metadata.find_repository(make_repo(tmp))
+        status_line.CACHE_DIR = os.path.join(tmp, 'cache')
+        check = repo.has_tracked_changes
+
+        def stage_while_checking(run_git=False):
+            changed = check(run_git)
+            with open(os.path.join(repo.worktree, 'new.txt'), 'w') as f:
+                f.write('x')
+            git(repo.worktree, 'add', 'new.txt')
+            return changed
+
+        repo.has_tracked_changes = stage_while_checking
+        status_line.refresh_dirty_status(repo, {})
+        assert status_line.read_cache(repo.worktree)['dirty'] == ''
+        # Stored under the key the check started with, so the next render re-checks
+        status_line.start_refresh = lambda *args: None
+        assert status_line.get_dirty_status(repo) == '?'
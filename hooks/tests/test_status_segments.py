@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tests for the status line segments: the renderer keeps to its budget by
+serving cached values and refreshing slow segments in the background, and
+each built-in segment reads what it should.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUS_DIR = os.path.join(os.path.dirname(HOOKS_DIR), 'status')
+sys.path.insert(0, STATUS_DIR)
+
+import segments
+import status_line
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args], cwd=repo,
+                   check=True, capture_output=True)
+
+
+def make_repo(path):
+    os.makedirs(path)
+    git(path, 'init', '-q', '-b', 'main')
+    with open(os.path.join(path, 'app.py'), 'w') as f:
+        f.write('print(1)\n')
+    git(path, 'add', '.')
+    git(path, 'commit', '-q', '-m', 'init')
+    return path
+
+
+def with_segments(*extra):
+    """Temporarily register `extra` segments; returns a restore function."""
+    saved = dict(segments.SEGMENTS)
+    segments.SEGMENTS.update((segment.name, segment) for segment in extra)
+    return lambda: (segments.SEGMENTS.clear(), segments.SEGMENTS.update(saved))
+
+
+def test_slow_segments_are_served_stale_and_refreshed_in_background():
+    calls = []
+
+    def slow(context):
+        time.sleep(0.2)
+        calls.append('slow')
+        return f'slow {len(calls)}'
+
+    restore = with_segments(segments.Segment('slow', slow, cost=0.2, interval=0.0),
+                            segments.Segment('fast', lambda context: 'fast', cost=0.0001, interval=60.0))
+    detached = []
+    run_detached = status_line.run_detached
+    status_line.run_detached = lambda function, *args: detached.append((function, args))
+    with tempfile.TemporaryDirectory() as tmp:
+        status_line.CACHE_DIR = tmp
+        try:
+            started = time.perf_counter()
+            assert segments.render({}, tmp, ['slow', 'fast'], budget=0.05) == ['fast']
+            assert time.perf_counter() - started < 0.1
+            assert calls == [] and len(detached) == 1
+
+            # One refresh at a time
+            assert segments.render({}, tmp, ['slow', 'fast'], budget=0.05) == ['fast']
+            assert len(detached) == 1
+
+            function, args = detached.pop()
+            function(*args)
+            assert segments.render({}, tmp, ['slow', 'fast'], budget=0.05) == ['slow 1', 'fast']
+            assert len(detached) == 1  # Stale again at once (interval 0)
+        finally:
+            status_line.run_detached = run_detached
+            restore()
+
+
+def test_measured_time_overrides_declared_cost():
+    def underestimated(context):
+        time.sleep(0.03)
+        return 'done'
+
+    restore = with_segments(segments.Segment('under', underestimated, cost=0.0001, interval=0.0))
+    detached = []
+    run_detached = status_line.run_detached
+    status_line.run_detached = lambda function, *args: detached.append(function)
+    with tempfile.TemporaryDirectory() as tmp:
+        status_line.CACHE_DIR = tmp
+        try:
+            assert segments.render({}, tmp, ['under'], budget=0.01) == ['done']  # Inline, once
+            started = time.perf_counter()
+            assert segments.render({}, tmp, ['under'], budget=0.01) == ['done']  # Now stale
+            assert time.perf_counter() - started < 0.02
+            assert len(detached) == 1
+        finally:
+            status_line.run_detached = run_detached
+            restore()
+
+
+def test_git_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        origin = make_repo(os.path.join(tmp, 'origin'))
+        clone = os.path.join(tmp, 'clone')
+        subprocess.run(['git', 'clone', '-q', origin, clone], check=True, capture_output=True)
+        context = segments.SegmentContext({}, clone)
+        assert segments.ahead_behind(context) == ''
+        assert segments.stash_count(context) == ''
+        assert segments.commit_age(context) == '\U0001F552 now'
+
+        git(origin, 'commit', '-q', '--allow-empty', '-m', 'upstream')
+        git(clone, 'fetch', '-q')
+        git(clone, 'commit', '-q', '--allow-empty', '-m', 'local 1')
+        git(clone, 'commit', '-q', '--allow-empty', '-m', 'local 2')
+        assert segments.ahead_behind(context) == '↑2 ↓1'
+
+        for text in ('a', 'b'):
+            with open(os.path.join(clone, 'app.py'), 'w') as f:
+                f.write(text)
+            git(clone, 'stash', '-q')
+        assert segments.stash_count(context) == '\U0001F4E6 2'
+
+
+def assistant(message_id, sidechain=False, **usage):
+    entry = {'type': 'assistant', 'message': {'id': message_id, 'usage': usage}}
+    if sidechain:
+        entry['isSidechain'] = True
+    return entry
+
+
+def append(path, *entries):
+    with open(path, 'a') as f:
+        f.writelines(json.dumps(entry) + '\n' for entry in entries)
+
+
+def usage_context(transcript, tmp, deadline=None):
+    status_line.CACHE_DIR = os.path.join(tmp, 'cache')
+    return segments.SegmentContext({'transcript_path': transcript, 'session_id': 's1'}, tmp, deadline)
+
+
+def test_usage_segments_aggregate_incrementally():
+    with tempfile.TemporaryDirectory() as tmp:
+        transcript = os.path.join(tmp, 'session.jsonl')
+        append(transcript,
+               assistant('m1', input_tokens=10, cache_read_input_tokens=50000, output_tokens=200),
+               {'type': 'user', 'message': {'content': 'x' * 1000}},
+               # One entry per content block, all carrying the same usage
+               assistant('m2', input_tokens=100, cache_creation_input_tokens=900,
+                         cache_read_input_tokens=99000, output_tokens=800),
+               assistant('m2', input_tokens=100, cache_creation_input_tokens=900,
+                         cache_read_input_tokens=99000, output_tokens=800),
+               assistant('m3', sidechain=True, input_tokens=5, output_tokens=1000))
+        assert segments.context_usage(usage_context(transcript, tmp)) == '\U0001F9E0 50%'
+        assert segments.token_usage(usage_context(transcript, tmp)) == '\U0001F522 150.0k in 2.0k out'
+
+        # Already parsed bytes are not read again: scribbling over them changes nothing
+        size = os.path.getsize(transcript)
+        with open(transcript, 'r+') as f:
+            f.write(' ' * 40)
+        append(transcript, assistant('m4', input_tokens=1, cache_read_input_tokens=20000, output_tokens=1))
+        assert segments.context_usage(usage_context(transcript, tmp)) == '\U0001F9E0 10%'
+        assert segments.token_usage(usage_context(transcript, tmp)) == '\U0001F522 170.0k in 2.0k out'
+
+        # A new transcript at the same path is read from the start
+        os.remove(transcript)
+        append(transcript, assistant('n1', input_tokens=2000, output_tokens=3))
+        assert os.path.getsize(transcript) < size
+        assert segments.token_usage(usage_context(transcript, tmp)) == '\U0001F522 2.0k in 3 out'
+        assert segments.context_usage(segments.SegmentContext({}, tmp)) == ''
+
+
+def test_usage_backlog_is_parsed_in_steps_within_the_deadline():
+    with tempfile.TemporaryDirectory() as tmp:
+        transcript = os.path.join(tmp, 'session.jsonl')
+        filler = {'type': 'user', 'message': {'content': 'y' * 4000}}
+        append(transcript, *([filler] * (2 * segments.TAIL_CHUNK_BYTES // 4000)),
+               assistant('m1', input_tokens=1000, output_tokens=1))
+        try:
+            segments.context_usage(usage_context(transcript, tmp, deadline=time.perf_counter() - 1))
+        except segments.Incomplete:
+            pass
+        else:
+            raise AssertionError('parsed past the deadline')
+        # The background refresh (no deadline) continues from the checkpoint
+        assert segments.context_usage(usage_context(transcript, tmp)) == '\U0001F9E0 0%'
+
+
+def test_spec_progress_uses_latest_task_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text in (('old', '- [x] a\n- [ ] b\n'), ('app', '- [x] a\n  - [X] b\n- [ ] c\nnotes\n')):
+            os.makedirs(os.path.join(tmp, 'specs', name))
+            with open(os.path.join(tmp, 'specs', name, f'{name}-tasks.md'), 'w') as f:
+                f.write(text)
+            time.sleep(0.01)
+        assert segments.spec_progress(segments.SegmentContext({}, tmp)) == '\U0001F4CB app 2/3'
+
+
+def test_status_line_appends_configured_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(os.path.join(tmp, 'repo'))
+        os.makedirs(os.path.join(repo, 'specs', 'app'))
+        with open(os.path.join(repo, 'specs', 'app', 'app-tasks.md'), 'w') as f:
+            f.write('- [x] a\n- [ ] b\n')
+        payload = json.dumps({'model': {'display_name': 'Opus'}, 'workspace': {'current_dir': repo}})
+        env = dict(os.environ, CLAUDE_STATUS_CACHE_DIR=os.path.join(tmp, 'cache'),
+                   CLAUDE_STATUS_SEGMENTS='stash,spec,nonexistent', CLAUDE_STATUS_BUDGET_MS='50')
+        result = subprocess.run([sys.executable, os.path.join(STATUS_DIR, 'status_line.py')], input=payload,
+                                capture_output=True, text=True, timeout=10, env=env)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().endswith(' | \U0001F4CB app 1/2')
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the append-only JSONL hook log: appends, rotation, gzip of old
+segments, the legacy-array migrator, concurrent writers, the lock
+fallback to shards and the background maintainer that merges and gzips.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import tool_use_log
+
+
+def settle(log_dir, timeout=10):
+    """Wait for the background maintainer to merge shards and gzip segments."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not tool_use_log.pending_work(log_dir):
+            # And no maintainer is still running
+            fd = os.open(os.path.join(log_dir, tool_use_log.MAINTAIN_LOCK_NAME), os.O_RDWR | os.O_CREAT)
+            try:
+                if tool_use_log.try_lock(fd, 0):
+                    return
+            finally:
+                os.close(fd)
+        time.sleep(0.01)
+    raise AssertionError(f'{log_dir} still has shards or plain segments')
+
+
+def test_append_and_read_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(5):
+            tool_use_log.append_record(tmp, {'tool_name': 'Bash', 'n': i})
+        records = list(tool_use_log.iter_records(tmp))
+        assert [r['n'] for r in records] == list(range(5))
+
+
+def test_rotation_by_size_compresses_old_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(30):
+            tool_use_log.append_record(tmp, {'n': i, 'pad': 'x' * 40}, max_bytes=200)
+        settle(tmp)
+        segments = tool_use_log.segment_files(tmp)
+        assert len(segments) > 2
+        # All but the newest rotated segment are gzipped
+        assert all(p.name.endswith('.jsonl.gz') for p in segments[:-1])
+        assert [r['n'] for r in tool_use_log.iter_records(tmp)] == list(range(30))
+
+
+def test_rotation_by_day():
+    with tempfile.TemporaryDirectory() as tmp:
+        tool_use_log.append_record(tmp, {'n': 0})
+        active = os.path.join(tmp, tool_use_log.ACTIVE_NAME)
+        yesterday = time.time() - 86400
+        os.utime(active, (yesterday, yesterday))
+        tool_use_log.append_record(tmp, {'n': 1})
+        assert len(tool_use_log.segment_files(tmp)) == 1
+        assert [r['n'] for r in tool_use_log.iter_records(tmp)] == [0, 1]
+
+
+def test_migrate_legacy_array():
+    legacy_logs = os.path.join(HOOKS_DIR, 'logs')
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(legacy_logs, 'pre_tool_use.json'), tmp)
+        with open(os.path.join(tmp, 'pre_tool_use.json')) as f:
+            expected = json.load(f)
+        tool_use_log.append_record(tmp, {'n': 'newer'})
+
+        assert tool_use_log.migrate(tmp) == len(expected)
+        assert list(tool_use_log.iter_records(tmp)) == expected + [{'n': 'newer'}]
+        assert os.path.exists(os.path.join(tmp, 'pre_tool_use.json.migrated'))
+        assert tool_use_log.migrate(tmp) == 0
+
+
+def test_concurrent_writers_lose_nothing():
+    writer = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import tool_use_log\n"
+        "for i in range(200): tool_use_log.append_record(sys.argv[2], {'w': sys.argv[3], 'i': i})\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        procs = [subprocess.Popen([sys.executable, '-c', writer, HOOKS_DIR, tmp, str(w)])
+                 for w in range(4)]
+        for proc in procs:
+            assert proc.wait(timeout=60) == 0
+        settle(tmp)
+        records = list(tool_use_log.iter_records(tmp))
+        assert len(records) == 800
+
+
+def test_concurrent_legacy_writers_lose_nothing():
+    writer = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import tool_use_log\n"
+        "for i in range(50):\n"
+        "    tool_use_log.append_record(sys.argv[2], {'w': sys.argv[3], 'i': i}, legacy=True)\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        procs = [subprocess.Popen([sys.executable, '-c', writer, HOOKS_DIR, tmp, str(w)])
+                 for w in range(4)]
+        for proc in procs:
+            assert proc.wait(timeout=60) == 0
+        settle(tmp)
+        with open(os.path.join(tmp, 'pre_tool_use.json')) as f:
+            assert len(json.load(f)) + tool_use_log.log_stats(tmp)['pending'] == 200
+
+
+def test_locked_log_falls_back_to_shard():
+    with tempfile.TemporaryDirectory() as tmp:
+        with tool_use_log.log_lock(tmp) as locked:
+            assert locked
+            started = time.monotonic()
+            status = tool_use_log.append_record(tmp, {'n': 0}, timeout=0.05)
+            assert time.monotonic() - started < 1.0
+            assert status == tool_use_log.DELAYED
+            assert tool_use_log.log_stats(tmp) == {'delayed': 0, 'pending': 1, 'dropped': 0}
+            assert [r['n'] for r in tool_use_log.iter_records(tmp)] == [0]
+
+        # The shard is merged in the background, not by the call itself
+        assert tool_use_log.append_record(tmp, {'n': 1}) == tool_use_log.WRITTEN
+        settle(tmp)
+        assert tool_use_log.shard_files(tmp) == []
+        assert tool_use_log.log_stats(tmp) == {'delayed': 1, 'pending': 0, 'dropped': 0}
+        assert sorted(r['n'] for r in tool_use_log.iter_records(tmp)) == [0, 1]
+
+
+def test_unwritable_record_is_counted_as_dropped():
+    with tempfile.TemporaryDirectory() as tmp:
+        # A directory where the shard file should go makes the fallback fail
+        os.mkdir(os.path.join(tmp, f'{tool_use_log.SHARD_PREFIX}{os.getpid()}'))
+        with tool_use_log.log_lock(tmp):
+            assert tool_use_log.append_record(tmp, {'n': 0}, timeout=0.01) == tool_use_log.DROPPED
+        assert tool_use_log.log_stats(tmp)['dropped'] == 1
+
+
+def test_tool_call_does_not_merge_or_compress():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = tool_use_log.start_maintenance
+        started = []
+        tool_use_log.start_maintenance = lambda *args: started.append(args)
+        try:
+            with tool_use_log.log_lock(tmp):
+                tool_use_log.append_record(tmp, {'n': 0}, timeout=0.01)
+            for i in range(1, 20):
+                tool_use_log.append_record(tmp, {'n': i, 'pad': 'x' * 40}, max_bytes=200)
+        finally:
+            tool_use_log.start_maintenance = saved
+        assert len(tool_use_log.shard_files(tmp)) == 1
+        assert not any(p.name.endswith('.gz') for p in tool_use_log.segment_files(tmp))
+        assert started and started[-1][1:] == (False, 200, None)
+
+        assert tool_use_log.maintain(tmp, max_bytes=200) == 1
+        assert not tool_use_log.pending_work(tmp)
+        assert sorted(r['n'] for r in tool_use_log.iter_records(tmp)) == list(range(20))
+
+
+if __name__ == '__main__':
+    test_append_and_read_back()
+    test_rotation_by_size_compresses_old_segments()
+    test_rotation_by_day()
+    test_migrate_legacy_array()
+    test_concurrent_writers_lose_nothing()
+    test_concurrent_legacy_writers_lose_nothing()
+    test_locked_log_falls_back_to_shard()
+    test_unwritable_record_is_counted_as_dropped()
+    test_tool_call_does_not_merge_or_compress()
+    print("✅ Tool-use log tests passed")
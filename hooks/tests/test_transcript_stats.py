@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the transcript analytics: rollups per project, session and tool,
+and the (size, mtime) cache that only parses new or grown transcripts.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import transcript_stats
+
+
+def tool_use(tool_id, name, second, session='s1'):
+    return {'type': 'assistant', 'sessionId': session, 'cwd': '/work/app',
+            'timestamp': f'2025-07-01T10:00:{second:02d}.000Z',
+            'message': {'id': f'msg-{tool_id}', 'usage': {'input_tokens': 100, 'output_tokens': 10},
+                        'content': [{'type': 'tool_use', 'id': tool_id, 'name': name, 'input': {}}]}}
+
+
+def tool_result(tool_id, second, text='ok', is_error=False, session='s1'):
+    return {'type': 'user', 'sessionId': session, 'timestamp': f'2025-07-01T10:00:{second:02d}.000Z',
+            'message': {'content': [{'type': 'tool_result', 'tool_use_id': tool_id,
+                                     'content': text, 'is_error': is_error}]}}
+
+
+def write(path, *entries, mode='a'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.writelines(json.dumps(entry) + '\n' for entry in entries)
+
+
+def make_projects(root):
+    app = os.path.join(root, '-work-app')
+    write(os.path.join(app, 's1.jsonl'),
+          tool_use('t1', 'Bash', 0), tool_result('t1', 2),
+          tool_use('t2', 'Bash', 3),
+          tool_result('t2', 4, 'PreToolUse:Bash hook error: BLOCKED: rm -rf /', is_error=True),
+          tool_use('t3', 'Read', 5), tool_result('t3', 11, 'No such file', is_error=True))
+    write(os.path.join(app, 's2.jsonl'),
+          tool_use('u1', 'Grep', 0, session='s2'), tool_result('u1', 1, session='s2'))
+    write(os.path.join(root, '-work-lib', 's3.jsonl'),
+          tool_use('v1', 'Bash', 0, session='s3'))  # Still waiting for its result
+    return app
+
+
+def rows_by(states, root, by, key):
+    return {row[key]: row for row in transcript_stats.rollup(states, root, by)}
+
+
+def test_rollups():
+    with tempfile.TemporaryDirectory() as root:
+        make_projects(root)
+        states, summary = transcript_stats.scan(root)
+        assert summary['files'] == summary['parsed'] == 3
+
+        projects = rows_by(states, root, 'project', 'project')
+        app = projects['-work-app']
+        assert (app['sessions'], app['tool_calls'], app['blocked'], app['errors']) == (2, 4, 1, 2)
+        assert app['tools'] == {'Bash': 2, 'Read': 1, 'Grep': 1}
+        assert app['total_tokens'] == 4 * 110
+        assert (app['waits'], app['wait_s'], app['max_wait_s']) == (4, 10.0, 6.0)
+        assert projects['-work-lib']['tool_calls'] == 1 and projects['-work-lib']['waits'] == 0
+
+        sessions = rows_by(states, root, 'session', 'session_id')
+        assert set(sessions) == {'s1', 's2', 's3'} and sessions['s1']['cwd'] == '/work/app'
+
+        tools = rows_by(states, root, 'tool', 'tool')
+        assert (tools['Bash']['tool_calls'], tools['Bash']['blocked'], tools['Bash']['mean_wait_s']) == (3, 1, 1.5)
+
+
+def test_cache_parses_only_new_and_grown_transcripts():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'projects')
+        app = make_projects(root)
+        cache = transcript_stats.TranscriptStatsCache(os.path.join(tmp, 'stats.sqlite'))
+        try:
+            transcript_stats.scan(root, cache)
+            states, summary = transcript_stats.scan(root, cache)
+            assert summary['parsed'] == 0 and summary['bytes'] == 0
+
+            # Grown: only the appended lines are read, pending calls carry over
+            lib = os.path.join(root, '-work-lib', 's3.jsonl')
+            before = os.path.getsize(lib)
+            write(lib, tool_result('v1', 30, session='s3'))
+            with open(lib, 'a') as f:
+                f.write('{"type": "user", "partial')  # Not parsed until complete
+            states, summary = transcript_stats.scan(root, cache)
+            assert summary['parsed'] == 1 and summary['bytes'] == os.path.getsize(lib) - before
+            assert rows_by(states, root, 'project', 'project')['-work-lib']['max_wait_s'] == 30.0
+
+            # Replaced by a shorter file: parsed from the start
+            write(os.path.join(app, 's1.jsonl'), tool_use('t9', 'Edit', 0), mode='w')
+            # Removed: dropped from the cache
+            os.remove(os.path.join(app, 's2.jsonl'))
+            states, summary = transcript_stats.scan(root, cache)
+            assert summary['parsed'] == 1
+            assert rows_by(states, root, 'project', 'project')['-work-app']['tools'] == {'Edit': 1}
+            assert len(cache.load()) == 2
+        finally:
+            cache.close()
+
+
+def test_pool_matches_in_process():
+    with tempfile.TemporaryDirectory() as root:
+        make_projects(root)
+        expected, _ = transcript_stats.scan(root, jobs=1)
+        saved = transcript_stats.MIN_POOL_BYTES
+        transcript_stats.MIN_POOL_BYTES = 0
+        try:
+            states, _ = transcript_stats.scan(root, jobs=2)
+        finally:
+            transcript_stats.MIN_POOL_BYTES = saved
+        assert states == expected
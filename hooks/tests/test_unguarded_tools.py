@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-tool settings generator and the batched transcript logger
+that records the tools the PreToolUse hook is no longer registered for, in
+the hook log and in the audit store.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import audit_store
+import generate_settings
+import log_unguarded_tools
+import pre_tool_use
+import tool_use_log
+import transcript_tail
+
+
+def assistant(*blocks, timestamp='2025-01-01T00:00:00Z'):
+    return {'type': 'assistant', 'timestamp': timestamp, 'cwd': '/work',
+            'message': {'role': 'assistant', 'content': list(blocks)}}
+
+
+def tool_use(name, **tool_input):
+    return {'type': 'tool_use', 'id': 'toolu_' + name, 'name': name, 'input': tool_input}
+
+
+def append_lines(path, entries, tail=''):
+    with open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.write(tail)
+
+
+def test_matcher_lists_exactly_the_guarded_tools():
+    hooks = generate_settings.generate_hooks('/hooks')
+    (entry,) = hooks['PreToolUse']
+    assert entry['matcher'] == 'Bash|Read|Edit|MultiEdit|Write'
+    assert set(entry['matcher'].split('|')) == set(pre_tool_use.GUARDED_TOOLS)
+    assert entry['hooks'][0]['command'] == 'python3 /hooks/guard_client.py'
+    assert hooks['Stop'][0]['hooks'][0]['command'] == 'python3 /hooks/log_unguarded_tools.py'
+
+
+def test_unguarded_tools_are_always_allowed():
+    for tool_name in ('TodoWrite', 'Glob', 'Grep', 'mcp__Playwright__browser_click'):
+        verdict = pre_tool_use.check_tool_use(tool_name, {'command': 'rm -rf /', 'file_path': '.env'})
+        assert not verdict.blocked
+
+
+def test_merge_replaces_managed_entries_and_keeps_others():
+    settings = {'model': 'sonnet', 'hooks': {
+        'PreToolUse': [{'matcher': '', 'hooks': [
+            {'type': 'command', 'command': 'python3 /old/hooks/guard_client.py'}]}],
+        'PreCompact': [{'matcher': '', 'hooks': [
+            {'type': 'command', 'command': '/old/hooks/precompact_session_summary.sh'}]}],
+        'Stop': [{'matcher': '', 'hooks': [{'type': 'command', 'command': '/old/hooks/stop_sound.sh'}]}],
+    }}
+    generated = generate_settings.generate_hooks('/hooks')
+    merged = generate_settings.merge_hooks(settings, generated)
+
+    assert merged['model'] == 'sonnet'
+    assert merged['hooks']['PreToolUse'] == generated['PreToolUse']
+    assert merged['hooks']['PreCompact'] == settings['hooks']['PreCompact']
+    assert [e['hooks'][0]['command'] for e in merged['hooks']['Stop']] == [
+        'python3 /hooks/log_unguarded_tools.py', '/old/hooks/stop_sound.sh']
+    # Merging again is a no-op
+    assert generate_settings.merge_hooks(merged, generated) == merged
+
+
+def test_tail_reads_only_new_complete_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        transcript = os.path.join(tmp, 'session.jsonl')
+        state = os.path.join(tmp, 'state')
+        append_lines(transcript, [{'n': 1}, {'n': 2}], tail='{"n": 3')
+
+        tail = transcript_tail.TranscriptTail(transcript, 'test', 'session', state)
+        assert [e['n'] for e in tail.read()] == [1, 2]
+        tail.commit()
+
+        append_lines(transcript, [], tail='}\n')
+        tail = transcript_tail.TranscriptTail(transcript, 'test', 'session', state)
+        assert [e['n'] for e in tail.read()] == [3]
+        tail.commit()
+        assert transcript_tail.TranscriptTail(transcript, 'test', 'session', state).read() == []
+
+        # A replaced transcript is read from the start
+        os.remove(transcript)
+        append_lines(transcript, [{'n': 4}])
+        assert [e['n'] for e in transcript_tail.TranscriptTail(transcript, 'test', 'session', state).read()] == [4]
+
+
+def test_logs_unguarded_calls_once_in_a_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['CLAUDE_HOOK_TRANSCRIPT_STATE'] = os.path.join(tmp, 'state')
+        # No audit store: only the log
+        saved_db = os.environ.get('CLAUDE_GUARD_AUDIT_DB')
+        os.environ['CLAUDE_GUARD_AUDIT_DB'] = os.path.join(tmp, 'audit.sqlite')
+        try:
+            transcript = os.path.join(tmp, 'session.jsonl')
+            append_lines(transcript, [
+                {'type': 'user', 'message': {'role': 'user', 'content': 'hi'}},
+                assistant(tool_use('Bash', command='ls'), tool_use('Glob', pattern='*.py')),
+                assistant(tool_use('TodoWrite', todos=[]), timestamp='2025-01-01T00:00:01Z'),
+            ])
+            payload = {'session_id': 's1', 'transcript_path': transcript, 'cwd': tmp,
+                       'hook_event_name': 'Stop'}
+
+            assert log_unguarded_tools.log_unguarded_tools(payload) == 2
+            assert log_unguarded_tools.log_unguarded_tools(payload) == 0
+
+            append_lines(transcript, [assistant(tool_use('mcp__Playwright__browser_click', ref='e1'))])
+            assert log_unguarded_tools.log_unguarded_tools(payload) == 1
+            assert not os.path.exists(os.path.join(tmp, 'audit.sqlite'))
+        finally:
+            del os.environ['CLAUDE_HOOK_TRANSCRIPT_STATE']
+            restore_env('CLAUDE_GUARD_AUDIT_DB', saved_db)
+
+        records = list(tool_use_log.iter_records(os.path.join(tmp, 'logs')))
+        assert [r['tool_name'] for r in records] == ['Glob', 'TodoWrite', 'mcp__Playwright__browser_click']
+        assert records[0] == {
+            'session_id': 's1', 'transcript_path': transcript, 'cwd': '/work',
+            'hook_event_name': 'PreToolUse', 'tool_name': 'Glob', 'tool_input': {'pattern': '*.py'},
+            'tool_use_id': 'toolu_Glob', 'source': 'transcript', 'timestamp': '2025-01-01T00:00:00Z',
+        }
+
+
+def restore_env(name, value):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
+
+
+def test_unguarded_calls_are_audited_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'audit.sqlite')
+        audit_store.AuditStore(db_path).close()  # Auditing is on once the store exists
+        saved = {name: os.environ.get(name) for name in ('CLAUDE_HOOK_TRANSCRIPT_STATE', 'CLAUDE_GUARD_AUDIT_DB')}
+        os.environ['CLAUDE_HOOK_TRANSCRIPT_STATE'] = os.path.join(tmp, 'state')
+        os.environ['CLAUDE_GUARD_AUDIT_DB'] = db_path
+        try:
+            transcript = os.path.join(tmp, 'session.jsonl')
+            append_lines(transcript, [assistant(tool_use('Bash', command='ls'), tool_use('Glob', pattern='*.py'),
+                                                tool_use('TodoWrite', todos=[]))])
+            payload = {'session_id': 's1', 'transcript_path': transcript, 'cwd': tmp}
+            assert log_unguarded_tools.log_unguarded_tools(payload) == 2
+            # A batch retried after a failed log append is not audited twice
+            with open(transcript) as f:
+                entries = [json.loads(line) for line in f]
+            records = log_unguarded_tools.unguarded_records(entries, payload, pre_tool_use.GUARDED_TOOLS)
+            assert log_unguarded_tools.audit_records(records)
+        finally:
+            for name, value in saved.items():
+                restore_env(name, value)
+
+        store = audit_store.AuditStore(db_path)
+        try:
+            events = store.query(session_id='s1')
+        finally:
+            store.close()
+    assert sorted((e['tool_name'], e['verdict']) for e in events) == [('Glob', 'allow'), ('TodoWrite', 'allow')]
+    assert {e['timestamp'] for e in events} == {1735689600.0}
+
+
+def test_hook_returns_immediately_and_logs_in_background():
+    with tempfile.TemporaryDirectory() as tmp:
+        transcript = os.path.join(tmp, 'session.jsonl')
+        append_lines(transcript, [assistant(tool_use('Grep', pattern='x'))])
+        payload = json.dumps({'session_id': 's1', 'transcript_path': transcript, 'cwd': tmp})
+        env = dict(os.environ, CLAUDE_HOOK_TRANSCRIPT_STATE=os.path.join(tmp, 'state'),
+                   CLAUDE_GUARD_AUDIT_DB=os.path.join(tmp, 'audit.sqlite'))
+
+        result = subprocess.run([sys.executable, os.path.join(HOOKS_DIR, 'log_unguarded_tools.py')],
+                                input=payload, capture_output=True, text=True, env=env, timeout=10)
+        assert result.returncode == 0
+
+        log_dir = os.path.join(tmp, 'logs')
+        for _ in range(200):
+            if list(tool_use_log.iter_records(log_dir)):
+                break
+            time.sleep(0.025)
+        assert [r['tool_name'] for r in tool_use_log.iter_records(log_dir)] == ['Grep']
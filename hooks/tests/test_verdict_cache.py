@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent verdict cache: hit/miss counters, LRU eviction,
+invalidation on policy and limit changes, lookups that do not write, and
+its use by pre_tool_use.evaluate().
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import pre_tool_use
+import verdict_cache
+from verdict_cache import VerdictCache
+
+
+def test_hits_and_misses():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerdictCache(os.path.join(tmp, 'v.sqlite'), 'v1')
+        key = cache.key('npm test')
+        assert cache.get(key) is None
+        cache.put(key, False, [])
+        assert cache.get(key) == (False, [], None)
+        assert cache.key(' npm test\n') == key
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_policy_change_invalidates():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'v.sqlite')
+        cache = VerdictCache(path, 'v1')
+        cache.put(cache.key('rm -rf dist'), False, [])
+        cache.close()
+
+        assert VerdictCache(path, 'v1').stats()['entries'] == 1
+        cache = VerdictCache(path, 'v2')
+        assert cache.stats()['entries'] == 0
+        assert cache.get(cache.key('rm -rf dist')) is None
+
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerdictCache(os.path.join(tmp, 'v.sqlite'), 'v1', max_entries=10)
+        for i in range(10):
+            cache.put(cache.key(f'cmd {i}'), False, [])
+        cache.get(cache.key('cmd 0'))  # Recently used, must survive
+        cache.put(cache.key('cmd 10'), False, [])
+        assert cache.stats()['entries'] <= 10
+        assert cache.get(cache.key('cmd 0')) is not None
+        assert cache.get(cache.key('cmd 1')) is None
+
+
+def test_lookups_do_not_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'v.sqlite')
+        cache = VerdictCache(path, 'v1')
+        cache.put(cache.key('npm test'), False, [])
+        # Another process holds the write lock: lookups still answer
+        other = sqlite3.connect(path)
+        other.execute('BEGIN IMMEDIATE')
+        try:
+            for _ in range(verdict_cache.FLUSH_EVERY + 1):
+                assert cache.get(cache.key('npm test')) == (False, [], None)
+            assert cache.get(cache.key('npm run build')) is None
+        finally:
+            other.rollback()
+            other.close()
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses']) == (verdict_cache.FLUSH_EVERY + 1, 1)
+        cache.close()
+
+
+def test_policy_version_covers_the_limits():
+    version = pre_tool_use.policy_version()
+    for name, value in (('MAX_COMMAND_CHARS', 1024), ('MAX_LEXED_CHARS', 1024),
+                        ('CHECK_DEADLINE', 0.5), ('SECRET_SCAN_ENABLED', False)):
+        saved = getattr(pre_tool_use, name)
+        setattr(pre_tool_use, name, value)
+        try:
+            assert pre_tool_use.policy_version() != version, name
+        finally:
+            setattr(pre_tool_use, name, saved)
+    assert pre_tool_use.policy_version() == version
+
+
+def test_evaluate_uses_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = pre_tool_use.VERDICT_CACHE_ENABLED, pre_tool_use._verdict_cache
+        pre_tool_use.VERDICT_CACHE_ENABLED = True
+        pre_tool_use._verdict_cache = VerdictCache(os.path.join(tmp, 'v.sqlite'),
+                                                   pre_tool_use.policy_version())
+        try:
+            payload = {'tool_name': 'Bash', 'cwd': tmp, 'tool_input': {'command': 'rm -rf .git'}}
+            first = pre_tool_use.evaluate(payload)
+            second = pre_tool_use.evaluate(payload)
+            assert first.blocked and first == second
+            assert pre_tool_use.GIT_DIRECTORY_MESSAGE in second.messages
+            assert second.rule == 'rm_git_directory'
+            assert pre_tool_use._verdict_cache.stats()['hits'] == 1
+        finally:
+            pre_tool_use._verdict_cache.close()
+            pre_tool_use.VERDICT_CACHE_ENABLED, pre_tool_use._verdict_cache = saved
+
+
+if __name__ == '__main__':
+    test_hits_and_misses()
+    test_policy_change_invalidates()
+    test_lru_eviction()
+    test_lookups_do_not_write()
+    test_policy_version_covers_the_limits()
+    test_evaluate_uses_cache()
+    print("✅ Verdict cache tests passed")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the write amplification report: temp write / rename pairing,
+same-size rewrites, per-minute buckets, and the rewrites of our own hooks
+and commands recorded with CLAUDE_WRITE_JOURNAL.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOOKS_DIR)
+
+import tool_use_log
+import write_amplification
+import write_journal
+
+MINUTE = 1760000040000  # Start of a minute, epoch ms
+
+
+def atomic_write(target, size, ms, rename=True):
+    temp = f'{target}.tmp.42.{ms}'
+    lines = [f'[DEBUG] Writing to temp file: {temp}',
+             '[DEBUG] Preserving file permissions: 100664',
+             f'[DEBUG] Temp file written successfully, size: {size} bytes',
+             '[DEBUG] Applied original permissions to temp file']
+    if rename:
+        lines += [f'[DEBUG] Renaming {temp} to {target}', f'[DEBUG] File {target} written atomically']
+    return ''.join(line + '\n' for line in lines)
+
+
+def write_log(directory, session, *writes):
+    path = os.path.join(directory, f'{session}.txt')
+    with open(path, 'w') as f:
+        f.write('[DEBUG] Executing hook command: uv run hook.py with timeout 60000ms\n')
+        f.write(''.join(writes))
+    return path
+
+
+def make_logs(directory):
+    write_log(directory, 'a',
+              atomic_write('/home/u/.claude.json', 5000, MINUTE),
+              atomic_write('/home/u/.claude.json', 5000, MINUTE + 1000),
+              atomic_write('/home/u/.claude/todos/a.json', 2, MINUTE + 2000),
+              atomic_write('/home/u/.claude.json', 5100, MINUTE + 61000),
+              atomic_write('/home/u/.claude.json', 9999, MINUTE + 62000, rename=False))
+    write_log(directory, 'b', atomic_write('/home/u/.claude.json', 5100, MINUTE + 120000))
+
+
+def test_pairs_writes_per_session_file_and_minute():
+    with tempfile.TemporaryDirectory() as tmp:
+        make_logs(tmp)
+        sequential = write_amplification.analyze([tmp], jobs=1)
+        parallel = write_amplification.analyze([tmp], jobs=2)
+    assert parallel == sequential
+    result = sequential
+
+    assert (result['logs'], result['writes'], result['bytes']) == (2, 5, 5000 * 2 + 2 + 5100 * 2)
+    assert result['unmatched'] == {'temp_files': 1, 'renames': 0}
+    # Same size as the previous write of the file, even from another session
+    assert (result['same_size'], result['same_size_bytes']) == (2, 5000 + 5100)
+
+    sessions = {row['session']: row for row in result['sessions']}
+    assert (sessions['a']['writes'], sessions['a']['active_minutes'], sessions['a']['bytes_per_minute']) == \
+        (4, 2, (5000 * 2 + 2 + 5100) // 2)
+    assert sessions['b']['same_size'] == 1
+
+    claude_json = result['files'][0]
+    assert (claude_json['path'], claude_json['writes'], claude_json['same_size']) == ('/home/u/.claude.json', 4, 2)
+    assert [row['bytes'] for row in result['minutes']] == [10002, 5100, 5100]
+    assert result['minutes'][0]['minute'] == '2025-10-09T08:54Z'
+
+
+def test_journal_adds_hook_rewrites_and_summary_copies():
+    with tempfile.TemporaryDirectory() as tmp:
+        make_logs(tmp)
+        journal = os.path.join(tmp, 'writes.jsonl')
+        env = dict(os.environ, CLAUDE_WRITE_JOURNAL=journal, CLAUDE_HOOK_LOG_FORMAT='json',
+                   CLAUDE_GUARD_AUDIT='0', CLAUDE_GUARD_SOCKET=os.path.join(tmp, 'no-daemon.sock'))
+        for command in ('ls', 'pwd'):
+            payload = {'session_id': 'a', 'tool_name': 'Bash', 'tool_input': {'command': command}}
+            subprocess.run([sys.executable, os.path.join(HOOKS_DIR, 'pre_tool_use.py')], input=json.dumps(payload),
+                           capture_output=True, text=True, cwd=tmp, env=env, timeout=30)
+
+        sessions_dir = os.path.join(tmp, 'claude-sessions')
+        os.makedirs(sessions_dir)
+        # An earlier summary from today is copied to the current minute's file
+        earlier = time.strftime('%Y%m%d_0000' if time.strftime('%H%M') != '0000' else '%Y%m%d_0001')
+        with open(os.path.join(sessions_dir, f'work_session_summary_{earlier}.md'), 'w') as f:
+            f.write('# Summary\n')
+        script = os.path.join(os.path.dirname(HOOKS_DIR), 'commands', 'create_update_session_summary.py')
+        subprocess.run([sys.executable, script, 'work'], capture_output=True, text=True, cwd=tmp, env=env,
+                       timeout=30, check=True)
+
+        result = write_amplification.analyze([tmp], journal, jobs=1)
+
+    hooks = [row for row in result['files'] if row['origin'] == 'hooks']
+    (rewrite,) = [row for row in hooks if row['kind'] == 'rewrite']
+    assert rewrite['path'] == os.path.join(os.path.realpath(tmp), 'logs', 'pre_tool_use.json')
+    assert rewrite['writes'] == 2 and rewrite['same_size'] == 0
+    (copy,) = [row for row in hooks if row['kind'] == 'copy']
+    assert (copy['bytes'], copy['same_size']) == (len('# Summary\n'), 1)
+
+    sessions = {row['session']: row['writes'] for row in result['sessions']}
+    # The hook knows its session; the copy is outside every log's time span
+    assert sessions == {'a': 4 + 2, 'b': 1, 'unknown': 1}
+
+
+def test_journal_names_the_session_of_each_concurrent_writer():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = os.path.join(tmp, 'writes.jsonl')
+        log_dir = os.path.join(tmp, 'logs')
+        statuses = {}
+
+        def append(session):
+            statuses[session] = [tool_use_log.append_record(log_dir, {'session_id': session, 'n': n},
+                                                            legacy=True, timeout=5, session_id=session)
+                                 for n in range(5)]
+
+        saved = write_journal.JOURNAL
+        write_journal.JOURNAL = journal
+        try:
+            threads = [threading.Thread(target=append, args=(f's{i}',)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            write_journal.JOURNAL = saved
+
+        counts = {}
+        for session, path, size, ms, kind in write_amplification.read_journal(journal):
+            assert path == os.path.join(log_dir, 'pre_tool_use.json')
+            counts[session] = counts.get(session, 0) + 1
+    assert counts == {session: result.count(tool_use_log.WRITTEN) for session, result in statuses.items()}
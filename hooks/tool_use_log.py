@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL storage for PreToolUse hook logs.
+
+Each hook call appends one JSON line to logs/pre_tool_use.jsonl with a single
+O_APPEND write, so the cost per call is constant and concurrent sessions
+cannot overwrite each other's records. The active file is rotated when it
+exceeds a size limit or when the day changes; rotated segments are gzipped.
+
+Writers (and rotation) hold an advisory lock on logs/pre_tool_use.lock. A
+writer that cannot take it within LOCK_TIMEOUT seconds does not wait any
+longer: it appends to its own shard file (pre_tool_use.jsonl.shard.<pid>)
+instead. Records that cannot be written at all are counted in
+pre_tool_use.dropped. `stats` reports delayed, pending and dropped records.
+
+A tool call only appends and, when rotating, renames. Merging pending
+shards into the log and gzipping rotated segments take longer, so a writer
+that sees such work starts maintain() in a detached process instead; one
+maintainer runs at a time (pre_tool_use.maintain.lock).
+
+Large strings and lists in JSONL records (file contents, todo lists) are
+kept once in the content-addressed blob store under logs/blobs and the
+record holds a reference (see blob_store.py); `cat --rehydrate` and
+iter_records(rehydrate=True) put the values back.
+
+Usage:
+    python3 tool_use_log.py migrate LOG_DIR [LOG_DIR ...]
+    python3 tool_use_log.py cat [--rehydrate] LOG_DIR
+    python3 tool_use_log.py merge LOG_DIR [LOG_DIR ...]
+    python3 tool_use_log.py stats LOG_DIR [LOG_DIR ...]
+"""
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import blob_store
+import write_journal
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, rely on O_APPEND alone
+    fcntl = None
+
+LOG_NAME = 'pre_tool_use'
+ACTIVE_NAME = LOG_NAME + '.jsonl'
+LEGACY_NAME = LOG_NAME + '.json'
+LOCK_NAME = LOG_NAME + '.lock'
+MAINTAIN_LOCK_NAME = LOG_NAME + '.maintain.lock'
+STATS_NAME = LOG_NAME + '.stats.json'
+DROPPED_NAME = LOG_NAME + '.dropped'
+SHARD_PREFIX = ACTIVE_NAME + '.shard.'
+BLOBS_NAME = 'blobs'
+
+# Rotate the active file once it grows past this many bytes
+MAX_BYTES = int(os.environ.get('CLAUDE_HOOK_LOG_MAX_BYTES', 10 * 1024 * 1024))
+
+# Longest a tool call waits (seconds) for the log lock before using a shard
+LOCK_TIMEOUT = float(os.environ.get('CLAUDE_HOOK_LOG_LOCK_TIMEOUT', 0.05))
+
+# Longest the background maintainer waits (seconds) for the log lock
+MAINTAIN_LOCK_TIMEOUT = 10.0
+
+# What happened to a record passed to append_record()
+WRITTEN = 'written'    # Appended to the log
+DELAYED = 'delayed'    # Appended to a shard; merged into the log later
+DROPPED = 'dropped'    # Could not be stored anywhere
+
+
+def try_lock(fd, timeout):
+    """Take an exclusive flock on `fd`, polling for at most `timeout` seconds."""
+    if fcntl is None:
+        return True
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+
+
+@contextmanager
+def log_lock(log_dir, timeout=LOCK_TIMEOUT):
+    """
+    Hold the log directory's lock for the duration of the block. Yields True
+    if it was acquired, False if another process held it for `timeout` seconds.
+    """
+    fd = os.open(Path(log_dir) / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        yield try_lock(fd, timeout)
+    finally:
+        os.close(fd)  # Releases the lock
+
+
+def encode_record(record):
+    """Serialize a record as one compact JSON line (bytes)."""
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def needs_rotation(stat_result, max_bytes=MAX_BYTES, now=None):
+    """True if the active file is over the size limit or from an earlier day."""
+    if stat_result.st_size == 0:
+        return False
+    if stat_result.st_size >= max_bytes:
+        return True
+    now = time.time() if now is None else now
+    return time.localtime(stat_result.st_mtime)[:3] != time.localtime(now)[:3]
+
+
+def segment_files(log_dir):
+    """Rotated segments (compressed or not) in chronological order."""
+    log_dir = Path(log_dir)
+    return sorted(p for p in log_dir.glob(LOG_NAME + '.*.jsonl*')
+                  if p.name != ACTIVE_NAME and p.name.endswith(('.jsonl', '.jsonl.gz')))
+
+
+def shard_files(log_dir):
+    """Shards written by writers that could not take the lock, oldest first."""
+    shards = Path(log_dir).glob(SHARD_PREFIX + '*')
+    return sorted((p for p in shards if p.name[len(SHARD_PREFIX):].isdigit()),
+                  key=lambda p: p.stat().st_mtime_ns if p.exists() else 0)
+
+
+def compress_segment(path, session_id=None):
+    """
+    Gzip a rotated segment in place and remove the plain file. `session_id`
+    (the session whose call triggered it) is only used for write_journal.
+    """
+    gz_path = path.with_name(path.name + '.gz')
+    tmp_path = gz_path.with_name(gz_path.name + f'.tmp.{os.getpid()}')
+    with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, gz_path)
+    write_journal.record(gz_path, gz_path.stat().st_size, 'compress', session_id=session_id)
+    path.unlink()
+
+
+def compress_segments(log_dir, session_id=None):
+    """
+    Gzip every uncompressed segment but the newest: a concurrent writer may
+    still hold the segment it has just rotated open for one last append.
+    """
+    plain = [path for path in segment_files(log_dir) if path.suffix == '.jsonl']
+    for path in plain[:-1]:
+        try:
+            compress_segment(path, session_id)
+        except OSError:
+            pass
+
+
+def rotate(log_dir, stat_result):
+    """Move the active file aside as a timestamped segment (compressed by maintain())."""
+    log_dir = Path(log_dir)
+    micros = stat_result.st_mtime_ns // 1000 % 1000000
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(stat_result.st_mtime)) + f'{micros:06d}'
+    segment = log_dir / f'{LOG_NAME}.{stamp}.{os.getpid()}.jsonl'
+    try:
+        os.rename(log_dir / ACTIVE_NAME, segment)
+    except FileNotFoundError:
+        pass  # Another process rotated it first
+
+
+def write_active(log_dir, data, max_bytes=MAX_BYTES):
+    """Append encoded lines to the active file, rotating it first if needed."""
+    active = Path(log_dir) / ACTIVE_NAME
+    try:
+        stat_result = os.stat(active)
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is not None and needs_rotation(stat_result, max_bytes):
+        rotate(log_dir, stat_result)
+
+    fd = os.open(active, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def write_legacy(log_dir, data, session_id=None):
+    """Append encoded lines to the legacy pre_tool_use.json array."""
+    log_path = Path(log_dir) / LEGACY_NAME
+    records = []
+    if log_path.exists():
+        with open(log_path, 'r') as f:
+            try:
+                records = json.load(f)
+            except (json.JSONDecodeError, ValueError):
+                records = []
+    for line in data.splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # Blank or torn line from a shard
+
+    # Replace atomically so readers never see a truncated array
+    tmp_path = log_path.with_name(f'{LEGACY_NAME}.tmp.{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(records, f, indent=2)
+        size = f.tell()
+    os.replace(tmp_path, log_path)
+    write_journal.record(log_path, size, session_id=session_id)
+
+
+def write_shard(log_dir, data):
+    """Append encoded lines to this process's shard file."""
+    path = Path(log_dir) / f'{SHARD_PREFIX}{os.getpid()}'
+    for _ in range(3):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # The merger holds a shard's lock while it reads and removes it
+            if not try_lock(fd, LOCK_TIMEOUT):
+                raise TimeoutError(f"{path} is locked")
+            if os.fstat(fd).st_nlink == 0:
+                continue  # Merged and removed while we waited; start a new one
+            os.write(fd, data)
+            return
+        finally:
+            os.close(fd)
+    raise TimeoutError(f"{path} kept being merged")
+
+
+def make_writer(legacy=False, max_bytes=MAX_BYTES, session_id=None):
+    """The write(log_dir, data) function of the log format."""
+    if legacy:
+        def write(log_dir, data):
+            write_legacy(log_dir, data, session_id)
+    else:
+        def write(log_dir, data):
+            write_active(log_dir, data, max_bytes)
+    return write
+
+
+def merge_shards(log_dir, write=write_active, session_id=None):
+    """
+    Move the records of pending shards into the log with `write`. The caller
+    must hold the log lock. Shards whose writer is mid-append are left for
+    the next merge. Returns the number of merged records.
+
+    A shard is only locked while it is read and removed, not while `write`
+    runs: its writer waits at most LOCK_TIMEOUT for that lock. Records whose
+    write fails go back into a shard.
+    """
+    merged = 0
+    for path in shard_files(log_dir):
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except OSError:
+            continue  # Gone already, or not a file
+        try:
+            if not try_lock(fd, 0):
+                continue
+            with open(fd, 'rb', closefd=False) as f:
+                data = f.read()
+            os.unlink(path)
+        finally:
+            os.close(fd)
+        if data and not data.endswith(b'\n'):
+            data += b'\n'  # Torn last line; read_jsonl skips it
+        if data:
+            try:
+                write(log_dir, data)
+            except (OSError, ValueError):
+                write_shard(log_dir, data)
+                raise
+            merged += data.count(b'\n')
+
+    if merged:
+        stats = read_stats(log_dir)
+        stats['delayed'] = stats.get('delayed', 0) + merged
+        tmp_path = Path(log_dir) / f'{STATS_NAME}.tmp.{os.getpid()}'
+        size = tmp_path.write_text(json.dumps(stats))
+        os.replace(tmp_path, Path(log_dir) / STATS_NAME)
+        write_journal.record(Path(log_dir) / STATS_NAME, size, session_id=session_id)
+    return merged
+
+
+def pending_work(log_dir):
+    """True if shards wait to be merged or rotated segments to be gzipped."""
+    plain = 0
+    for name in os.listdir(log_dir):
+        if name.startswith(SHARD_PREFIX):
+            return True
+        if name.startswith(LOG_NAME + '.') and name.endswith('.jsonl') and name != ACTIVE_NAME:
+            plain += 1
+    return plain > 1  # The newest segment is left plain
+
+
+def maintain(log_dir, legacy=False, max_bytes=MAX_BYTES, session_id=None):
+    """
+    Merge pending shards into the log and gzip rotated segments. Returns
+    the number of merged records, or None at once if another maintainer
+    holds the maintenance lock.
+    """
+    log_dir = Path(log_dir)
+    fd = os.open(log_dir / MAINTAIN_LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not try_lock(fd, 0):
+            return None
+        merged = 0
+        if shard_files(log_dir):
+            with log_lock(log_dir, MAINTAIN_LOCK_TIMEOUT) as locked:
+                if locked:
+                    merged = merge_shards(log_dir, make_writer(legacy, max_bytes, session_id), session_id)
+        compress_segments(log_dir, session_id)
+        return merged
+    finally:
+        os.close(fd)
+
+
+def start_maintenance(log_dir, legacy=False, max_bytes=MAX_BYTES, session_id=None):
+    """Run maintain() in a detached process unless one is running; returns at once."""
+    fd = os.open(Path(log_dir) / MAINTAIN_LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not try_lock(fd, 0):
+            return  # A maintainer is at work
+    finally:
+        os.close(fd)
+    import subprocess
+    # By module rather than by path, so it also runs from a zipapp bundle
+    code = ('import sys; sys.path.insert(0, sys.argv[1]); import tool_use_log; '
+            'tool_use_log.maintain(sys.argv[2], sys.argv[3] == "legacy", int(sys.argv[4]), sys.argv[5] or None)')
+    subprocess.Popen([sys.executable, '-c', code, os.path.dirname(os.path.abspath(__file__)), str(log_dir),
+                      'legacy' if legacy else 'jsonl', str(max_bytes), session_id or ''],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+
+def record_drop(log_dir, error):
+    """Count a record that could not be stored (best effort, lock-free)."""
+    line = json.dumps({'time': time.time(), 'pid': os.getpid(), 'error': str(error)})
+    try:
+        fd = os.open(Path(log_dir) / DROPPED_NAME, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8') + b'\n')
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def append_record(log_dir, record, max_bytes=MAX_BYTES, legacy=False, timeout=LOCK_TIMEOUT, session_id=None):
+    """
+    Append one record to LOG_DIR/pre_tool_use.jsonl (or, with `legacy`, the
+    pre_tool_use.json array), rotating if needed, and start the maintainer if
+    shards or segments wait for it. Waits at most about `timeout` seconds for
+    the lock, then falls back to a shard. Returns WRITTEN, DELAYED or
+    DROPPED; an error is never raised. Rewrites are journaled under
+    `session_id` (see write_journal.py).
+    """
+    return append_records(log_dir, [record], max_bytes, legacy, timeout, session_id)
+
+
+def append_records(log_dir, records, max_bytes=MAX_BYTES, legacy=False, timeout=LOCK_TIMEOUT, session_id=None):
+    """Append a batch of records with one write under one lock (see append_record)."""
+    log_dir = Path(log_dir)
+    try:
+        log_dir.mkdir(parents=True, exist_ok=True)
+        if not legacy and blob_store.MIN_BYTES > 0:
+            # Outside the lock: blobs are written atomically and never change
+            blobs = blob_store.BlobStore(log_dir / BLOBS_NAME)
+            records = [blobs.externalize(record) for record in records]
+        data = b''.join(encode_record(record) for record in records)
+        with log_lock(log_dir, timeout) as locked:
+            if locked:
+                make_writer(legacy, max_bytes, session_id)(log_dir, data)
+        if not locked:
+            write_shard(log_dir, data)
+    except (OSError, ValueError) as e:
+        record_drop(log_dir, e)
+        return DROPPED
+
+    try:
+        if pending_work(log_dir):
+            start_maintenance(log_dir, legacy, max_bytes, session_id)
+    except OSError:
+        pass  # Picked up by a later call
+    return WRITTEN if locked else DELAYED
+
+
+def read_stats(log_dir):
+    """Return {'delayed': n} from the stats file (merged shard records)."""
+    try:
+        with open(Path(log_dir) / STATS_NAME) as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return {'delayed': 0}
+    return stats if isinstance(stats, dict) else {'delayed': 0}
+
+
+def log_stats(log_dir):
+    """
+    Delivery counters for LOG_DIR: `delayed` records went through a shard and
+    were merged, `pending` records sit in shards, `dropped` were lost.
+    """
+    log_dir = Path(log_dir)
+    pending = 0
+    for path in shard_files(log_dir):
+        try:
+            with open(path, 'rb') as f:
+                pending += sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 16), b''))
+        except OSError:
+            continue
+
+    dropped = 0
+    try:
+        with open(log_dir / DROPPED_NAME, 'rb') as f:
+            dropped = sum(1 for _ in f)
+    except OSError:
+        pass
+    return {'delayed': int(read_stats(log_dir).get('delayed', 0)), 'pending': pending, 'dropped': dropped}
+
+
+def read_jsonl(path):
+    """Yield records from a .jsonl or .jsonl.gz file, skipping torn lines."""
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def iter_records(log_dir, rehydrate=False):
+    """
+    Yield every record in LOG_DIR oldest first: the legacy JSON array,
+    rotated segments, then the active JSONL file. With `rehydrate`, blob
+    references are replaced by the stored values.
+    """
+    log_dir = Path(log_dir)
+    if rehydrate:
+        blobs = blob_store.BlobStore(log_dir / BLOBS_NAME)
+        for record in iter_records(log_dir):
+            yield blobs.rehydrate(record)
+        return
+
+    legacy = log_dir / LEGACY_NAME
+    if legacy.exists():
+        with open(legacy, 'r') as f:
+            try:
+                yield from json.load(f)
+            except (json.JSONDecodeError, ValueError):
+                pass
+
+    for path in segment_files(log_dir):
+        yield from read_jsonl(path)
+
+    active = log_dir / ACTIVE_NAME
+    if active.exists():
+        yield from read_jsonl(active)
+
+    # Not merged yet
+    for path in shard_files(log_dir):
+        try:
+            yield from read_jsonl(path)
+        except FileNotFoundError:
+            continue
+
+
+def migrate(log_dir):
+    """
+    Convert LOG_DIR/pre_tool_use.json (a JSON array) into JSONL.
+
+    Legacy records are placed before anything already in the active JSONL
+    file; the original array is kept as pre_tool_use.json.migrated.
+    Run it while no session is logging to LOG_DIR.
+    Returns the number of migrated records.
+    """
+    log_dir = Path(log_dir)
+    legacy = log_dir / LEGACY_NAME
+    if not legacy.exists():
+        return 0
+
+    with open(legacy, 'r') as f:
+        records = json.load(f)
+    if not isinstance(records, list):
+        raise ValueError(f"{legacy} does not contain a JSON array")
+
+    active = log_dir / ACTIVE_NAME
+    tmp_path = log_dir / f'{ACTIVE_NAME}.tmp.{os.getpid()}'
+    with open(tmp_path, 'wb') as out:
+        for record in records:
+            out.write(encode_record(record))
+        if active.exists():
+            with open(active, 'rb') as current:
+                shutil.copyfileobj(current, out)
+    os.replace(tmp_path, active)
+    os.rename(legacy, legacy.with_name(LEGACY_NAME + '.migrated'))
+    return len(records)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('migrate', 'cat', 'merge', 'stats'):
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(1)
+
+    command, log_dirs = sys.argv[1], sys.argv[2:]
+    rehydrate = command == 'cat' and '--rehydrate' in log_dirs
+    log_dirs = [d for d in log_dirs if d != '--rehydrate']
+    if command == 'migrate':
+        for log_dir in log_dirs:
+            try:
+                count = migrate(log_dir)
+            except (OSError, ValueError) as e:
+                print(f"{log_dir}: migration failed: {e}", file=sys.stderr)
+                sys.exit(1)
+            print(f"{log_dir}: migrated {count} records")
+    elif command == 'merge':
+        for log_dir in log_dirs:
+            with log_lock(log_dir, timeout=10) as locked:
+                if not locked:
+                    print(f"{log_dir}: log is locked, try again", file=sys.stderr)
+                    sys.exit(1)
+                print(f"{log_dir}: merged {merge_shards(log_dir)} records")
+    elif command == 'stats':
+        for log_dir in log_dirs:
+            print(json.dumps({'log_dir': log_dir, **log_stats(log_dir)}))
+    else:
+        for log_dir in log_dirs:
+            for record in iter_records(log_dir, rehydrate):
+                sys.stdout.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
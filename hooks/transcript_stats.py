@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Tool-call and token analytics over all Claude Code session transcripts.
+
+Scans every *.jsonl under the projects directory (~/.claude/projects, one
+subdirectory per project), parses the transcripts in a process pool and
+prints rollups per project, per session or per tool:
+
+    tool_calls   tool_use blocks, also per tool name ('tools')
+    blocked      tool results rejected by a PreToolUse hook
+    errors       tool results flagged is_error (blocked included)
+    tokens       summed usage (see transcript_tail.add_usage)
+    wait         seconds from a tool_use entry to its tool_result entry
+
+Each file is read line by line from where the last run stopped: the state
+of every transcript (parse offset, running totals, tool calls still
+waiting for a result) is cached in SQLite and keyed on (size, mtime), so
+an unchanged transcript is not opened again and a grown one is only read
+from its previous end. A transcript that shrank or was replaced is parsed
+again from the start.
+
+Usage:
+    python3 transcript_stats.py [--by project|session|tool] [--sort KEY] [--limit N]
+                                [--projects-dir DIR] [--jobs N] [--no-cache]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+HOOKS_DIR = os.path.dirname(os.path.abspath(__file__))
+if HOOKS_DIR not in sys.path:
+    sys.path.insert(0, HOOKS_DIR)
+
+import transcript_tail
+
+DEFAULT_PROJECTS_DIR = os.path.join(os.path.expanduser('~'), '.claude', 'projects')
+DEFAULT_CACHE_PATH = os.path.join(HOOKS_DIR, 'cache', 'transcript_stats.sqlite')
+
+# Transcripts are handed to the pool largest first, one per task
+MIN_POOL_BYTES = 4 * 1024 * 1024  # Less than this in total is parsed in-process
+
+# Start of the tool_result text of a call a PreToolUse hook blocked
+BLOCK_PREFIXES = ('PreToolUse:', 'BLOCKED:')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+
+def projects_dir():
+    return os.environ.get('CLAUDE_PROJECTS_DIR', DEFAULT_PROJECTS_DIR)
+
+
+def cache_path():
+    return os.environ.get('CLAUDE_TRANSCRIPT_STATS_DB', DEFAULT_CACHE_PATH)
+
+
+def find_transcripts(root):
+    """{path: os.stat_result} of the transcripts under `root`."""
+    found = {}
+    for directory, _subdirs, files in os.walk(root):
+        for name in files:
+            if name.endswith('.jsonl'):
+                path = os.path.join(directory, name)
+                try:
+                    found[path] = os.stat(path)
+                except OSError:
+                    continue
+    return found
+
+
+def parse_time(value):
+    """Epoch seconds of a transcript timestamp, or None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def result_text(block):
+    content = block.get('content')
+    if isinstance(content, list):
+        return ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content if isinstance(content, str) else ''
+
+
+def new_state(path):
+    return {'session_id': None, 'cwd': None, 'first': None, 'last': None, 'entries': 0,
+            'tools': {}, 'tokens': {}, 'pending': {},
+            'fallback_session': os.path.splitext(os.path.basename(path))[0]}
+
+
+def tool_stats(state, name):
+    return state['tools'].setdefault(name, {'calls': 0, 'blocked': 0, 'errors': 0,
+                                            'waits': 0, 'wait_s': 0.0, 'max_wait_s': 0.0})
+
+
+def add_entry(state, entry):
+    """Fold one transcript entry into the per-file `state`."""
+    state['entries'] += 1
+    state['session_id'] = state['session_id'] or entry.get('sessionId')
+    state['cwd'] = state['cwd'] or entry.get('cwd')
+    when = parse_time(entry.get('timestamp'))
+    if when is not None:
+        state['first'] = when if state['first'] is None else min(state['first'], when)
+        state['last'] = when if state['last'] is None else max(state['last'], when)
+
+    transcript_tail.add_usage(state['tokens'], entry)
+    for block in transcript_tail.tool_uses(entry):
+        name = block.get('name') or '?'
+        tool_stats(state, name)['calls'] += 1
+        if block.get('id'):
+            state['pending'][block['id']] = [name, when]
+
+    message = entry.get('message')
+    if entry.get('type') != 'user' or not isinstance(message, dict) or not isinstance(message.get('content'), list):
+        return
+    for block in message['content']:
+        if not isinstance(block, dict) or block.get('type') != 'tool_result':
+            continue
+        name, requested = state['pending'].pop(block.get('tool_use_id'), (None, None))
+        if name is None:
+            continue
+        stats = tool_stats(state, name)
+        if block.get('is_error'):
+            stats['errors'] += 1
+            if result_text(block).lstrip().startswith(BLOCK_PREFIXES):
+                stats['blocked'] += 1
+        if requested is not None and when is not None:
+            wait = max(0.0, when - requested)
+            stats['waits'] += 1
+            stats['wait_s'] += wait
+            stats['max_wait_s'] = max(stats['max_wait_s'], wait)
+
+
+def parse_transcript(path, offset, state):
+    """
+    Parse the complete lines of `path` from byte `offset` on, streaming;
+    returns (offset, state) after the last complete line. Runs in the pool.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Still being written
+            offset += len(line)
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                add_entry(state, entry)
+    return offset, state
+
+
+class TranscriptStatsCache:
+    """Per-transcript parse state, keyed on path and checked against (size, mtime)."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def load(self):
+        """{path: (size, mtime_ns, inode, offset, state)}"""
+        rows = self.conn.execute('SELECT path, size, mtime_ns, inode, offset, state FROM transcripts')
+        return {row[0]: (row[1], row[2], row[3], row[4], json.loads(row[5])) for row in rows}
+
+    def store(self, updates, removed):
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO transcripts (path, size, mtime_ns, inode, offset, state) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(path, st.st_size, st.st_mtime_ns, st.st_ino, offset, json.dumps(state))
+                 for path, (st, offset, state) in updates.items()])
+            self.conn.executemany('DELETE FROM transcripts WHERE path = ?', [(path,) for path in removed])
+
+    def close(self):
+        self.conn.close()
+
+
+def plan(found, cached):
+    """
+    Split the transcripts into {path: state} needing no work and
+    {path: (offset, state)} to parse from `offset`.
+    """
+    done, todo = {}, {}
+    for path, st in found.items():
+        entry = cached.get(path)
+        if entry is not None:
+            size, mtime_ns, inode, offset, state = entry
+            if (size, mtime_ns) == (st.st_size, st.st_mtime_ns):
+                done[path] = state
+                continue
+            if inode == st.st_ino and st.st_size >= size:
+                todo[path] = (offset, state)  # Grown: continue where we stopped
+                continue
+        todo[path] = (0, new_state(path))
+    return done, todo
+
+
+def scan(root, cache=None, jobs=None):
+    """
+    Bring every transcript under `root` up to date; returns
+    ({path: state}, {'files', 'parsed', 'bytes', 'seconds'}).
+    """
+    started = time.perf_counter()
+    found = find_transcripts(root)
+    cached = cache.load() if cache is not None else {}
+    states, todo = plan(found, cached)
+
+    pending = sorted(todo, key=lambda path: found[path].st_size - todo[path][0], reverse=True)
+    work_bytes = sum(found[path].st_size - todo[path][0] for path in pending)
+    jobs = jobs or os.cpu_count() or 1
+    updates = {}
+    if jobs > 1 and len(pending) > 1 and work_bytes >= MIN_POOL_BYTES:
+        with ProcessPoolExecutor(min(jobs, len(pending))) as pool:
+            futures = [(path, pool.submit(parse_transcript, path, *todo[path])) for path in pending]
+            for path, future in futures:
+                updates[path] = future.result()
+    else:
+        for path in pending:
+            updates[path] = parse_transcript(path, *todo[path])
+
+    for path, (offset, state) in updates.items():
+        states[path] = state
+    if cache is not None:
+        removed = [path for path in cached if path not in found and path.startswith(root.rstrip(os.sep) + os.sep)]
+        cache.store({path: (found[path], offset, state) for path, (offset, state) in updates.items()}, removed)
+    return states, {'files': len(found), 'parsed': len(updates), 'bytes': work_bytes,
+                    'seconds': round(time.perf_counter() - started, 3)}
+
+
+# Rollups
+
+def empty_row(**keys):
+    return dict(keys, tool_calls=0, blocked=0, errors=0, tokens={}, tools={},
+                waits=0, wait_s=0.0, max_wait_s=0.0, first=None, last=None)
+
+
+def add_to_row(row, state, tools=None):
+    """Add a transcript's (or, with `tools`, only those tools') stats to a rollup row."""
+    for name, stats in state['tools'].items():
+        if tools is not None and name not in tools:
+            continue
+        row['tool_calls'] += stats['calls']
+        row['blocked'] += stats['blocked']
+        row['errors'] += stats['errors']
+        row['waits'] += stats['waits']
+        row['wait_s'] += stats['wait_s']
+        row['max_wait_s'] = max(row['max_wait_s'], stats['max_wait_s'])
+        row['tools'][name] = row['tools'].get(name, 0) + stats['calls']
+    if tools is not None:
+        return  # Tokens and times are per message, not per tool
+    for key in transcript_tail.USAGE_KEYS:
+        if key in state['tokens']:
+            row['tokens'][key] = row['tokens'].get(key, 0) + state['tokens'][key]
+    for key, pick in (('first', min), ('last', max)):
+        if state[key] is not None:
+            row[key] = state[key] if row[key] is None else pick(row[key], state[key])
+
+
+def finish_row(row):
+    tokens = row.pop('tokens')
+    row['total_tokens'] = sum(tokens.values()) if tokens is not None else None
+    row['mean_wait_s'] = round(row['wait_s'] / row['waits'], 3) if row['waits'] else None
+    row['wait_s'] = round(row['wait_s'], 3)
+    row['max_wait_s'] = round(row['max_wait_s'], 3)
+    for key in ('first', 'last'):
+        if row.get(key) is not None:
+            row[key] = datetime.fromtimestamp(row[key]).isoformat(timespec='seconds')
+    if 'tools' in row:
+        row['tools'] = dict(sorted(row['tools'].items(), key=lambda item: -item[1]))
+    return row
+
+
+def rollup(states, root, by='project'):
+    """Rollup rows of the transcript `states`, grouped `by` project, session or tool."""
+    rows = {}
+    for path, state in states.items():
+        project = os.path.relpath(path, root).split(os.sep)[0]
+        if by == 'tool':
+            for name in state['tools']:
+                row = rows.setdefault(name, empty_row(tool=name))
+                add_to_row(row, state, tools={name})
+            continue
+        if by == 'session':
+            session = state['session_id'] or state['fallback_session']
+            row = rows.setdefault((project, session), empty_row(project=project, session_id=session,
+                                                                cwd=state['cwd']))
+        else:
+            row = rows.setdefault(project, empty_row(project=project, cwd=state['cwd'], sessions=set()))
+            row['sessions'].add(state['session_id'] or state['fallback_session'])
+        row['cwd'] = row['cwd'] or state['cwd']
+        add_to_row(row, state)
+    for row in rows.values():
+        if 'sessions' in row:
+            row['sessions'] = len(row['sessions'])
+        if by == 'tool':
+            del row['tools'], row['first'], row['last']
+            row['tokens'] = None
+    return [finish_row(row) for row in rows.values()]
+
+
+SORT_KEYS = ('tool_calls', 'total_tokens', 'blocked', 'errors', 'wait_s', 'max_wait_s', 'last')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tool-call and token rollups over session transcripts')
+    parser.add_argument('--by', choices=('project', 'session', 'tool'), default='project')
+    parser.add_argument('--sort', choices=SORT_KEYS, default='tool_calls')
+    parser.add_argument('--limit', type=int, default=20, help='Rows to print (0: all)')
+    parser.add_argument('--projects-dir', default=None,
+                        help='Transcript root (default: $CLAUDE_PROJECTS_DIR or ~/.claude/projects)')
+    parser.add_argument('--jobs', type=int, default=None, help='Parser processes (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true', help='Parse every transcript from the start')
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.projects_dir or projects_dir())
+    if not os.path.isdir(root):
+        print(json.dumps({'error': f'No projects directory at {root}'}))
+        sys.exit(1)
+    cache = None if args.no_cache else TranscriptStatsCache(cache_path())
+    try:
+        states, summary = scan(root, cache, args.jobs)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    rows = rollup(states, root, args.by)
+    rows.sort(key=lambda row: (row.get(args.sort) is not None, row.get(args.sort)), reverse=True)
+    for row in rows[:args.limit or None]:
+        print(json.dumps(row))
+    print(f"{summary['files']} transcripts, {summary['parsed']} parsed "
+          f"({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
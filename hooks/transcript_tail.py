@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Incremental reader for Claude Code session transcripts (JSONL).
+
+A TranscriptTail remembers, per consumer and session, how far it has read
+a transcript (byte offset and inode) in a small checkpoint file, so each run
+only parses the entries appended since the previous one. A partial last
+line is left for the next run; a transcript that was replaced or truncated
+is read again from the start. Consumers that may run concurrently for one
+session hold locked() around read() and commit(). A consumer that keeps a
+running aggregate stores it in `state`, which is saved with the offset and
+emptied whenever reading starts over.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'transcripts')
+
+# Longest a consumer waits (seconds) for another run on the same checkpoint
+LOCK_TIMEOUT = 0.5
+
+
+def state_dir():
+    return os.environ.get('CLAUDE_HOOK_TRANSCRIPT_STATE', DEFAULT_STATE_DIR)
+
+
+def safe_name(value):
+    """Make a session id usable as a file name."""
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in value) or '_'
+
+
+class TranscriptTail:
+    """Reads the entries appended to one transcript since the last commit()."""
+
+    def __init__(self, transcript_path, consumer, session_id, directory=None):
+        self.path = transcript_path
+        self.checkpoint_path = os.path.join(directory or state_dir(), consumer,
+                                            safe_name(session_id) + '.json')
+        self.offset = 0
+        self.inode = None
+        self.state = {}
+        self.next_offset = None
+        self.at_end = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(checkpoint, dict) and checkpoint.get('path') == self.path:
+            self.offset = int(checkpoint.get('offset', 0))
+            self.inode = checkpoint.get('inode')
+            state = checkpoint.get('state')
+            self.state = state if isinstance(state, dict) else {}
+
+    @contextmanager
+    def locked(self, timeout=LOCK_TIMEOUT):
+        """Hold this checkpoint's lock; yields False if another run kept it."""
+        import tool_use_log
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        fd = os.open(self.checkpoint_path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            acquired = tool_use_log.try_lock(fd, timeout)
+            if acquired:
+                self._load()  # The other run may have moved the checkpoint
+            yield acquired
+        finally:
+            os.close(fd)
+
+    def read(self, max_bytes=None):
+        """
+        Return the complete entries appended since the checkpoint, parsed.
+        With `max_bytes`, stop after about that many bytes (at least one
+        line); `at_end` tells whether everything was read.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return []
+        with f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != self.inode or st.st_size < self.offset:
+                self.offset = 0  # Replaced or truncated: start over
+                self.state = {}
+            self.inode = st.st_ino
+            f.seek(self.offset)
+            available = st.st_size - self.offset
+            data = f.read(available if max_bytes is None else min(available, max_bytes))
+            if max_bytes is not None and b'\n' not in data and len(data) < available:
+                data += f.read(available - len(data))  # One line longer than max_bytes
+        self.at_end = self.offset + len(data) >= st.st_size
+
+        end = data.rfind(b'\n') + 1  # Leave a partial last line for next time
+        self.next_offset = self.offset + end
+        entries = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                entries.append(entry)
+        return entries
+
+    def commit(self):
+        """Record that the entries returned by read() were processed."""
+        if self.next_offset is None:
+            return
+        self.offset = self.next_offset
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = f'{self.checkpoint_path}.tmp.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump({'path': self.path, 'inode': self.inode, 'offset': self.offset, 'state': self.state}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def tool_uses(entry):
+    """Yield the tool_use content blocks of an assistant transcript entry."""
+    message = entry.get('message')
+    if entry.get('type') != 'assistant' or not isinstance(message, dict):
+        return
+    content = message.get('content')
+    if not isinstance(content, list):
+        return
+    for block in content:
+        if isinstance(block, dict) and block.get('type') == 'tool_use':
+            yield block
+
+
+# Usage fields summed by add_usage()
+USAGE_KEYS = ('input_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens', 'output_tokens')
+
+
+def context_tokens(usage):
+    """Tokens in the context window for a message with `usage`."""
+    return (usage.get('input_tokens', 0) + usage.get('cache_creation_input_tokens', 0)
+            + usage.get('cache_read_input_tokens', 0))
+
+
+def add_usage(totals, entry):
+    """
+    Add an assistant entry's token usage to the running `totals` (USAGE_KEYS,
+    plus 'context': the tokens of the last main-chain message).
+    """
+    message = entry.get('message')
+    if entry.get('type') != 'assistant' or not isinstance(message, dict):
+        return
+    usage = message.get('usage')
+    if not isinstance(usage, dict):
+        return
+    # A response is written as one entry per content block, each with its usage
+    message_id = message.get('id')
+    if message_id and message_id == totals.get('message_id'):
+        return
+    totals['message_id'] = message_id
+    for key in USAGE_KEYS:
+        value = usage.get(key)
+        if isinstance(value, int):
+            totals[key] = totals.get(key, 0) + value
+    if not entry.get('isSidechain'):
+        totals['context'] = context_tokens(usage)
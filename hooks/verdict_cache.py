@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Persistent verdict cache for the PreToolUse guard.
+
+Stores the verdict for a Bash command in a small SQLite database shared by
+all hook processes and the guard daemon. Entries are keyed by a hash of the
+command and the policy version (a hash of the rule sources), so editing the
+rules invalidates the cache automatically. The least recently used entries
+are evicted once the cache exceeds MAX_ENTRIES.
+
+Lookups only read: their hit/miss counts and last-use times are kept in
+memory and written together with the next put, every FLUSH_EVERY lookups,
+or at exit.
+
+Usage:
+    python3 verdict_cache.py stats
+    python3 verdict_cache.py clear
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'verdicts.sqlite')
+
+# Evict least recently used entries beyond this many
+MAX_ENTRIES = int(os.environ.get('CLAUDE_GUARD_CACHE_MAX_ENTRIES', 20000))
+
+# Never wait longer than this (seconds) for another process holding the lock
+BUSY_TIMEOUT = 0.1
+
+# Lookups whose counts and last-use times are held in memory before a write
+FLUSH_EVERY = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY,
+    blocked INTEGER NOT NULL,
+    messages TEXT NOT NULL,  -- JSON: {"messages": [...], "rule": ...}
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value
+);
+"""
+
+COUNTERS = ('hits', 'misses', 'evictions')
+
+
+class VerdictCache:
+    """SQLite-backed LRU cache of (blocked, messages, rule) verdicts."""
+
+    def __init__(self, path=DEFAULT_PATH, policy_version=None, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.policy_version = policy_version
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.pending = dict.fromkeys(('hits', 'misses'), 0)
+        self.touched = {}  # key -> last use not yet written
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        if policy_version is not None:
+            self._check_policy_version()
+        atexit.register(self.flush)
+
+    def _check_policy_version(self):
+        """Drop every entry when the policy rules changed since last use."""
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'policy_version'").fetchone()
+        if row is None or row[0] != self.policy_version:
+            with self.db:
+                self.db.execute('DELETE FROM verdicts')
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('policy_version', ?)",
+                                (self.policy_version,))
+
+    def key(self, command):
+        """Hash of the normalized command and policy version."""
+        material = '\0'.join([self.policy_version or '', command.strip()])
+        return hashlib.sha256(material.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def _bump(self, counter, amount=1):
+        self.db.execute(
+            'INSERT INTO meta VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?',
+            (counter, amount, amount))
+
+    def _write_pending(self):
+        # Caller holds the lock, inside a transaction
+        if self.touched:
+            self.db.executemany('UPDATE verdicts SET last_used = ? WHERE key = ?',
+                                [(used, key) for key, used in self.touched.items()])
+        for counter, amount in self.pending.items():
+            if amount:
+                self._bump(counter, amount)
+
+    def _clear_pending(self):
+        self.touched.clear()
+        self.pending = dict.fromkeys(self.pending, 0)
+
+    def flush(self):
+        """Write the counts and last-use times held since the last write."""
+        with self.lock:
+            if not self.touched and not any(self.pending.values()):
+                return
+            try:
+                with self.db:
+                    self._write_pending()
+            except sqlite3.Error:
+                return  # Busy or closed: kept for the next write
+            self._clear_pending()
+
+    def get(self, key):
+        """Return (blocked, messages, rule) for `key`, or None on a miss."""
+        with self.lock:
+            row = self.db.execute('SELECT blocked, messages FROM verdicts WHERE key = ?',
+                                  (key,)).fetchone()
+            if row is None:
+                self.pending['misses'] += 1
+            else:
+                self.pending['hits'] += 1
+                self.touched[key] = time.time()
+            due = sum(self.pending.values()) >= FLUSH_EVERY
+        if due:
+            self.flush()
+        if row is None:
+            return None
+        detail = json.loads(row[1])
+        return bool(row[0]), detail['messages'], detail.get('rule')
+
+    def put(self, key, blocked, messages, rule=None):
+        """Store a verdict and evict least recently used entries if over the limit."""
+        detail = json.dumps({'messages': messages, 'rule': rule})
+        with self.lock:
+            with self.db:
+                # Held last-use times first, so eviction sees them
+                self._write_pending()
+                self.db.execute('INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)',
+                                (key, int(blocked), detail, time.time()))
+                excess = self.db.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0] - self.max_entries
+                if excess > 0:
+                    # Evict an extra batch so the next inserts do not have to evict again
+                    batch = excess + self.max_entries // 10
+                    self.db.execute(
+                        'DELETE FROM verdicts WHERE key IN '
+                        '(SELECT key FROM verdicts ORDER BY last_used LIMIT ?)', (batch,))
+                    self._bump('evictions', batch)
+            self._clear_pending()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current entry count."""
+        self.flush()
+        with self.lock:
+            values = dict(self.db.execute('SELECT name, value FROM meta').fetchall())
+            entries = self.db.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+        stats = {name: int(values.get(name) or 0) for name in COUNTERS}
+        lookups = stats['hits'] + stats['misses']
+        stats['entries'] = entries
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['policy_version'] = values.get('policy_version', '')
+        return stats
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self.lock, self.db:
+            self._clear_pending()
+            self.db.execute('DELETE FROM verdicts')
+            self.db.execute('DELETE FROM meta WHERE name IN (%s)' % ','.join('?' * len(COUNTERS)),
+                            COUNTERS)
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self.db.close()
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ('stats', 'clear'):
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(1)
+
+    path = os.environ.get('CLAUDE_GUARD_CACHE', DEFAULT_PATH)
+    if not os.path.exists(path):
+        print(json.dumps({'error': f'No verdict cache at {path}'}))
+        sys.exit(1)
+
+    # No policy version: inspecting the cache must not wipe its entries
+    cache = VerdictCache(path)
+    if sys.argv[1] == 'clear':
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Write amplification from Claude Code debug logs (~/.claude/debug/*.txt).
+
+Claude Code replaces files such as ~/.claude.json atomically, and logs
+each replacement:
+
+    [DEBUG] Writing to temp file: FILE.tmp.<pid>.<epoch ms>
+    [DEBUG] Temp file written successfully, size: N bytes
+    [DEBUG] Renaming FILE.tmp.<pid>.<epoch ms> to FILE
+
+Each log is memory-mapped and scanned with one regular expression (the
+files of a directory are spread over a process pool, as in
+debug_latency.py), and every size is paired with the temp file it belongs
+to and the rename that publishes it. The time of a write is the epoch
+suffix of its temp file; the session is the log's file name.
+
+Our own rewrites are not in those logs: run the hooks and commands with
+CLAUDE_WRITE_JOURNAL=FILE (see write_journal.py) and pass the file with
+--journal to include them. Journal writes that do not name their session
+are assigned to the one session whose log spans their time, if any.
+
+The report gives bytes written per session, per file and per minute. A
+rewrite of a file with the same size as its previous write (across all
+sessions, in time order) is counted as `same_size`: most likely nothing
+changed. A copy always duplicates bytes already on disk and is counted
+as `same_size` too.
+
+Usage:
+    python3 write_amplification.py [DEBUG_DIR_OR_FILE ...] [--journal FILE] [--top N] [--jobs N]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from debug_latency import debug_dir, find_logs, summarize
+
+# Files and minutes listed in the report
+DEFAULT_TOP = 20
+
+# Session of journal writes that no debug log accounts for
+UNKNOWN_SESSION = 'unknown'
+
+WRITE_PATTERN = re.compile(
+    rb'^\[DEBUG\] (?:'
+    rb'Writing to temp file: (?P<temp>.*?)'
+    rb'|Temp file written successfully, size: (?P<size>\d+) bytes'
+    rb'|Renaming (?P<renamed>.*?\.tmp\.\d+\.\d+) to (?P<target>.*?)'
+    rb')\r?$',
+    re.MULTILINE)
+
+TEMP_CLOCK = re.compile(rb'\.tmp\.\d+\.(\d{13})$')
+
+
+def analyze_file(path):
+    """
+    Pair the temp writes and renames of one log. Returns {'session': id,
+    'writes': [(target, bytes, epoch ms or None), ...], 'unmatched': {...}}.
+    """
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            data = b''  # Empty file
+    try:
+        return pair_writes(path, data)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def pair_writes(path, data):
+    sizes = {}       # Temp file -> size, None until its size line
+    last_temp = None
+    writes = []
+    unmatched = {'temp_files': 0, 'renames': 0}
+
+    for match in WRITE_PATTERN.finditer(data):
+        group = match.group
+        if group('temp') is not None:
+            last_temp = group('temp')
+            sizes[last_temp] = None
+        elif group('size') is not None:
+            if last_temp is not None:
+                sizes[last_temp] = int(group('size'))
+                last_temp = None
+        else:
+            size = sizes.pop(group('renamed'), None)
+            if size is None:
+                unmatched['renames'] += 1
+                continue
+            clock = TEMP_CLOCK.search(group('renamed'))
+            writes.append((group('target').decode('utf-8', 'replace'), size,
+                           int(clock.group(1)) if clock else None))
+    unmatched['temp_files'] = len(sizes)
+    session = os.path.splitext(os.path.basename(path))[0]
+    return {'session': session, 'writes': writes, 'unmatched': unmatched}
+
+
+def read_journal(path):
+    """Writes recorded with CLAUDE_WRITE_JOURNAL: (session, path, bytes, ms, kind)."""
+    writes = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                writes.append((entry.get('session'), entry['path'], int(entry['bytes']),
+                               entry.get('time_ms'), entry.get('kind', 'rewrite')))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return writes
+
+
+def session_spans(results):
+    """{session: (first ms, last ms)} of the timed writes in each debug log."""
+    spans = {}
+    for result in results:
+        times = [ms for _, _, ms in result['writes'] if ms is not None]
+        if times:
+            first, last = spans.get(result['session'], (min(times), max(times)))
+            spans[result['session']] = (min(first, min(times)), max(last, max(times)))
+    return spans
+
+
+def attribute(ms, spans):
+    if ms is None:
+        return UNKNOWN_SESSION
+    matches = [session for session, (first, last) in spans.items() if first <= ms <= last]
+    return matches[0] if len(matches) == 1 else UNKNOWN_SESSION
+
+
+def minute_label(minute):
+    return time.strftime('%Y-%m-%dT%H:%MZ', time.gmtime(minute * 60))
+
+
+def report(results, journal=(), top=DEFAULT_TOP):
+    """Combine per-log results and journal writes into the report."""
+    spans = session_spans(results)
+    writes = []      # (ms, session, path, bytes, origin, kind)
+    unmatched = defaultdict(int)
+    for result in results:
+        for target, size, ms in result['writes']:
+            writes.append((ms, result['session'], target, size, 'claude', 'rewrite'))
+        for key, count in result['unmatched'].items():
+            unmatched[key] += count
+    for session, path, size, ms, kind in journal:
+        writes.append((ms, session or attribute(ms, spans), path, size, 'hooks', kind))
+    # Untimed writes keep their log order, ahead of the timed ones
+    writes.sort(key=lambda write: -1 if write[0] is None else write[0])
+
+    sessions = defaultdict(lambda: {'writes': 0, 'bytes': 0, 'same_size': 0, 'same_size_bytes': 0,
+                                    'minutes': set()})
+    targets = defaultdict(lambda: {'writes': 0, 'bytes': 0, 'same_size': 0, 'same_size_bytes': 0})
+    minutes = defaultdict(lambda: {'writes': 0, 'bytes': 0})
+    previous = {}
+    for ms, session, path, size, origin, kind in writes:
+        same = kind == 'copy' or previous.get(path) == size
+        previous[path] = size
+        for stats in (sessions[session], targets[(path, origin, kind)]):
+            stats['writes'] += 1
+            stats['bytes'] += size
+            stats['same_size'] += same
+            stats['same_size_bytes'] += size if same else 0
+        if ms is not None:
+            minute = ms // 60000
+            sessions[session]['minutes'].add(minute)
+            minutes[minute]['writes'] += 1
+            minutes[minute]['bytes'] += size
+
+    session_rows = []
+    for session, stats in sorted(sessions.items(), key=lambda item: -item[1]['bytes']):
+        active = len(stats.pop('minutes'))
+        stats['active_minutes'] = active
+        stats['bytes_per_minute'] = stats['bytes'] // active if active else None
+        session_rows.append(dict(session=session, **stats))
+    target_rows = [dict(path=path, origin=origin, kind=kind, mean_bytes=stats['bytes'] // stats['writes'], **stats)
+                   for (path, origin, kind), stats in sorted(targets.items(), key=lambda item: -item[1]['bytes'])]
+    minute_rows = [dict(minute=minute_label(minute), **stats)
+                   for minute, stats in sorted(minutes.items(), key=lambda item: -item[1]['bytes'])]
+    return {
+        'writes': len(writes),
+        'bytes': sum(write[3] for write in writes),
+        'same_size': sum(row['same_size'] for row in session_rows),
+        'same_size_bytes': sum(row['same_size_bytes'] for row in session_rows),
+        'bytes_per_minute': summarize([stats['bytes'] for stats in minutes.values()]),
+        'sessions': session_rows,
+        'files': target_rows[:top],
+        'minutes': minute_rows[:top],
+        'unmatched': dict(unmatched),
+    }
+
+
+def analyze(paths, journal_path=None, jobs=None, top=DEFAULT_TOP):
+    files = find_logs(paths)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(min(jobs, len(files))) as pool:
+            results = list(pool.map(analyze_file, files))
+    else:
+        results = [analyze_file(path) for path in files]
+    result = report(results, read_journal(journal_path) if journal_path else (), top)
+    result['logs'] = len(files)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write amplification from Claude Code debug logs')
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help='Debug log files or directories (default: $CLAUDE_DEBUG_DIR or ~/.claude/debug)')
+    parser.add_argument('--journal', help='Write journal recorded with CLAUDE_WRITE_JOURNAL')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Files and minutes to list')
+    parser.add_argument('--jobs', type=int, default=None, help='Parser processes (default: CPU count)')
+    args = parser.parse_args()
+
+    paths = args.paths or [debug_dir()]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(json.dumps({'error': f"No debug logs at {', '.join(missing)}"}))
+        sys.exit(1)
+    print(json.dumps(analyze(paths, args.journal, args.jobs, args.top), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Journal of the files our hooks and commands rewrite, for write_amplification.py.
+
+Claude Code's debug logs record its own atomic rewrites; ours are not in
+them. With CLAUDE_WRITE_JOURNAL set to a file, the legacy pre_tool_use.json
+rewrites, the log stats file, compressed log segments and session summary
+copies each append one JSON line:
+
+    time_ms   wall clock at the write, epoch milliseconds
+    pid       process id
+    session   Claude Code session id, when the writer knows it
+    kind      rewrite, compress or copy
+    path      file written
+    bytes     bytes written
+    source    file copied from (copies only)
+
+Each line is one O_APPEND write, so concurrent hooks do not interleave.
+"""
+
+import json
+import os
+import time
+
+JOURNAL = os.environ.get('CLAUDE_WRITE_JOURNAL')
+
+
+def record(path, size, kind='rewrite', source=None, session_id=None):
+    """Append a write of `size` bytes to `path` by `session_id` to the journal, if enabled."""
+    if not JOURNAL:
+        return
+    entry = {'time_ms': time.time_ns() // 1000000, 'pid': os.getpid(), 'session': session_id,
+             'kind': kind, 'path': os.path.abspath(path), 'bytes': size}
+    if source is not None:
+        entry['source'] = os.path.abspath(source)
+    try:
+        fd = os.open(JOURNAL, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    except OSError:
+        return
+    try:
+        os.write(fd, (json.dumps(entry) + '\n').encode('utf-8'))
+    finally:
+        os.close(fd)
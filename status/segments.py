@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Optional status line segments, rendered within a fixed time budget.
+
+Each Segment declares how long it expects to take (`cost`, in seconds) and
+how long a value stays fresh (`interval`). Values are cached per workspace
+and session under status_line.CACHE_DIR/segments. A render serves fresh
+values from the cache and recomputes a stale one inline only if its cost
+(or its last measured time, whichever is larger) fits in what is left of
+RENDER_BUDGET. The others show their last value, and one detached process
+recomputes them for the next render. Adding segments therefore adds cache
+lookups, not latency.
+
+Segments are enabled by name, in display order, with CLAUDE_STATUS_SEGMENTS
+(e.g. "ahead_behind,stash,commit_age,context,tokens,spec"); see SEGMENTS. A
+segment with nothing to show (no upstream, no stash, ...) is left out.
+
+The context and tokens segments keep a running usage aggregate per session
+next to a byte-offset checkpoint (transcript_tail.TranscriptTail), so each
+refresh parses only the transcript lines appended since the last one. A
+long backlog is parsed in steps, and a render that reaches its deadline
+leaves the rest to the background refresh (Incomplete).
+
+Usage:
+    python3 segments.py WORKSPACE [NAME ...]   Compute segments, ignoring the cache
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+
+import status_line
+
+# Time allowed for all segments of one render, in seconds
+RENDER_BUDGET = float(os.environ.get('CLAUDE_STATUS_BUDGET_MS', 5)) / 1000
+
+# Tokens that make 100% in the context segment
+CONTEXT_WINDOW = int(os.environ.get('CLAUDE_STATUS_CONTEXT_WINDOW', 200000))
+
+# Transcript bytes parsed per step; a render stops between steps at its deadline
+TAIL_CHUNK_BYTES = 1024 * 1024
+
+# Checkpoint namespace of the usage aggregate (see transcript_tail.py)
+USAGE_CONSUMER = 'status_usage'
+
+# Seconds allowed for a git command run by a segment
+GIT_TIMEOUT = 5.0
+
+
+class Segment:
+    """A named status line part: `compute(context)` returns its text ('' hides it)."""
+
+    def __init__(self, name, compute, cost, interval):
+        self.name = name
+        self.compute = compute
+        self.cost = cost
+        self.interval = interval
+
+
+class Incomplete(Exception):
+    """Raised by a segment that ran out of time; it keeps its last value and is refreshed later."""
+
+
+class SegmentContext:
+    """
+    What segments compute from: the status line input and its repository.
+    `deadline` (perf_counter) is set while rendering and None in the
+    background refresh.
+    """
+
+    def __init__(self, data, workspace_dir, deadline=None):
+        self.data = data
+        self.workspace_dir = workspace_dir
+        self.deadline = deadline
+        self._repo = False
+        self._usage = None
+
+    @property
+    def repo(self):
+        if self._repo is False:
+            import git_metadata
+            self._repo = git_metadata.find_repository(self.workspace_dir)
+        return self._repo
+
+    @property
+    def transcript_path(self):
+        return self.data.get('transcript_path')
+
+    @property
+    def session_id(self):
+        return self.data.get('session_id') or ''
+
+
+def run_git(repo, *args):
+    """stdout of a read-only git command in `repo`, or None if it failed."""
+    try:
+        result = subprocess.run(['git', '--no-optional-locks', *args], cwd=repo.worktree,
+                                capture_output=True, text=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def format_age(seconds):
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= size:
+            return f'{int(seconds // size)}{unit}'
+    return 'now'
+
+
+# Segments
+
+def ahead_behind(context):
+    """Commits ahead of / behind the upstream branch: "↑2 ↓1"."""
+    if context.repo is None:
+        return ''
+    counts = run_git(context.repo, 'rev-list', '--left-right', '--count', 'HEAD...@{upstream}')
+    if not counts:
+        return ''
+    ahead, behind = (int(n) for n in counts.split())
+    parts = ([f'↑{ahead}'] if ahead else []) + ([f'↓{behind}'] if behind else [])
+    return ' '.join(parts)
+
+
+def stash_count(context):
+    """Number of stash entries: one reflog line each."""
+    if context.repo is None:
+        return ''
+    try:
+        with open(os.path.join(context.repo.common_dir, 'logs', 'refs', 'stash'), 'rb') as f:
+            count = sum(1 for line in f if line.strip())
+    except OSError:
+        return ''
+    return f'\U0001F4E6 {count}' if count else ''
+
+
+def commit_age(context):
+    """Time since the HEAD commit was made."""
+    if context.repo is None:
+        return ''
+    timestamp = run_git(context.repo, 'log', '-1', '--format=%ct')
+    if not timestamp:
+        return ''
+    return f'\U0001F552 {format_age(max(0, time.time() - int(timestamp)))}'
+
+
+def transcript_usage(context):
+    """
+    Usage totals of the session transcript, plus 'context' (the tokens of
+    the last main-chain message). Only the bytes appended since the last
+    call are parsed; raises Incomplete if the context deadline passes
+    first or another process is reading.
+    """
+    if context._usage is not None:
+        return context._usage
+    import transcript_tail
+    tail = transcript_tail.TranscriptTail(
+        context.transcript_path, USAGE_CONSUMER, context.session_id or context.transcript_path,
+        directory=os.path.join(status_line.CACHE_DIR, 'transcripts'))
+    with tail.locked(timeout=0) as acquired:
+        if not acquired:
+            raise Incomplete()
+        while True:
+            for entry in tail.read(TAIL_CHUNK_BYTES):
+                transcript_tail.add_usage(tail.state, entry)
+            tail.commit()
+            if tail.at_end:
+                break
+            if context.deadline is not None and time.perf_counter() >= context.deadline:
+                raise Incomplete()
+    context._usage = tail.state
+    return tail.state
+
+
+def format_tokens(count):
+    for unit, size in (('M', 1000000), ('k', 1000)):
+        if count >= size:
+            return f'{count / size:.1f}{unit}'
+    return str(count)
+
+
+def context_usage(context):
+    """Share of the context window used by the session: "🧠 45%"."""
+    if not context.transcript_path:
+        return ''
+    context_size = transcript_usage(context).get('context')
+    if context_size is None:
+        return ''
+    return f'\U0001F9E0 {100 * context_size // CONTEXT_WINDOW}%'
+
+
+def token_usage(context):
+    """Tokens the session sent (with cache reads and writes) and received: "🔢 1.2M in 40.1k out"."""
+    if not context.transcript_path:
+        return ''
+    totals = transcript_usage(context)
+    if 'output_tokens' not in totals:
+        return ''
+    sent = sum(totals.get(key, 0) for key in ('input_tokens', 'cache_creation_input_tokens',
+                                              'cache_read_input_tokens'))
+    return f"\U0001F522 {format_tokens(sent)} in {format_tokens(totals['output_tokens'])} out"
+
+
+def find_task_file(project_dir):
+    """The most recently modified specs/<project>/*tasks*.md, or None."""
+    specs_dir = os.path.join(project_dir, 'specs')
+    latest = None
+    try:
+        projects = os.scandir(specs_dir)
+    except OSError:
+        return None
+    with projects:
+        for project in projects:
+            if not project.is_dir():
+                continue
+            try:
+                files = os.listdir(project.path)
+            except OSError:
+                continue
+            for name in files:
+                if name.lower().endswith('.md') and 'tasks' in name.lower():
+                    path = os.path.join(project.path, name)
+                    try:
+                        mtime = os.stat(path).st_mtime
+                    except OSError:
+                        continue
+                    if latest is None or mtime > latest[0]:
+                        latest = (mtime, path)
+    return latest[1] if latest else None
+
+
+def spec_progress(context):
+    """Checked tasks in the active spec (see commands/start-exec-plan-tasks.md): "📋 app 3/12"."""
+    project_dir = context.repo.worktree if context.repo is not None else context.workspace_dir
+    path = find_task_file(project_dir)
+    if path is None:
+        return ''
+    done = total = 0
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            item = line.lstrip()
+            if item.startswith(('- [ ]', '* [ ]')):
+                total += 1
+            elif item.startswith(('- [x]', '- [X]', '* [x]', '* [X]')):
+                done += 1
+                total += 1
+    if not total:
+        return ''
+    return f'\U0001F4CB {os.path.basename(os.path.dirname(path))} {done}/{total}'
+
+
+SEGMENTS = {segment.name: segment for segment in (
+    Segment('ahead_behind', ahead_behind, cost=0.02, interval=60.0),
+    Segment('stash', stash_count, cost=0.0005, interval=10.0),
+    Segment('commit_age', commit_age, cost=0.01, interval=60.0),
+    Segment('context', context_usage, cost=0.003, interval=5.0),
+    Segment('tokens', token_usage, cost=0.003, interval=5.0),
+    Segment('spec', spec_progress, cost=0.002, interval=15.0),
+)}
+
+
+# Cache
+
+def cache_path(workspace_dir, session_id):
+    name = status_line.escape_path(workspace_dir)
+    if session_id:
+        name += '@' + status_line.escape_path(session_id)
+    return os.path.join(status_line.CACHE_DIR, 'segments', name + '.json')
+
+
+def read_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def update_cache(path, values=None, **fields):
+    """Merge `values` ({segment name: entry}) and `fields` into the cache file."""
+    cache = read_cache(path)
+    if values:
+        cache['values'] = dict(cache.get('values') or {}, **values)
+    cache.update(fields)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def compute_entry(segment, context):
+    """{'text', 'at', 'took'} for one computation of `segment`; None if Incomplete."""
+    started = time.perf_counter()
+    try:
+        text = segment.compute(context)
+    except Incomplete:
+        return None
+    except Exception:
+        text = ''
+    return {'text': text, 'at': time.time(), 'took': time.perf_counter() - started}
+
+
+def refresh_segments(path, segments, context):
+    """Recompute `segments` and store them; the background half of render()."""
+    for segment in segments:
+        entry = compute_entry(segment, context)
+        if entry is not None:
+            update_cache(path, {segment.name: entry})
+    update_cache(path, refreshing_since=None)
+
+
+def selected_segments(names):
+    return [SEGMENTS[name] for name in (n.strip() for n in names) if name in SEGMENTS]
+
+
+def render(data, workspace_dir, names, budget=None):
+    """
+    Texts of the segments `names` (empty ones left out), within `budget`
+    seconds (RENDER_BUDGET) plus at most one cache write and fork.
+    """
+    deadline = time.perf_counter() + (RENDER_BUDGET if budget is None else budget)
+    context = SegmentContext(data, workspace_dir, deadline)
+    path = cache_path(workspace_dir, context.session_id)
+    cache = read_cache(path)
+    values = cache.get('values') or {}
+    computed = {}
+    stale = []
+    texts = []
+    now = time.time()
+    for segment in selected_segments(names):
+        entry = values.get(segment.name)
+        if not entry or now - entry.get('at', 0) >= segment.interval:
+            expected = max(segment.cost, entry.get('took', 0) if entry else 0)
+            fresh = None
+            if time.perf_counter() + expected <= deadline:
+                fresh = compute_entry(segment, context)
+            if fresh is None:
+                stale.append(segment)
+            else:
+                entry = computed[segment.name] = fresh
+        if entry and entry.get('text'):
+            texts.append(entry['text'])
+
+    refreshing = now - (cache.get('refreshing_since') or 0) < status_line.REFRESH_TIMEOUT
+    start = bool(stale) and not refreshing
+    try:
+        if computed or start:
+            update_cache(path, computed, **({'refreshing_since': now} if start else {}))
+        if start:
+            context.deadline = None
+            status_line.run_detached(refresh_segments, path, stale, context)
+    except OSError:
+        pass
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute status line segments, ignoring the cache')
+    parser.add_argument('workspace')
+    parser.add_argument('names', nargs='*', metavar='NAME', help=f"Segments (default: {', '.join(SEGMENTS)})")
+    args = parser.parse_args()
+    context = SegmentContext({}, os.path.abspath(args.workspace))
+    for segment in selected_segments(args.names or list(SEGMENTS)):
+        entry = compute_entry(segment, context)
+        print(f"{segment.name:<14} {entry['took'] * 1000:8.2f}ms  {entry['text']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Resident status line daemon.
+
+Keeps the "📁 dir | 🌿 branch*" part of the status line precomputed for
+every active workspace, so status_line.py only reads one small file per
+render instead of locating the repository and reading HEAD and the index.
+
+Workspaces are handed over by status_line.py: a render that finds no line
+creates DAEMON_DIR/<workspace>.want, the daemon picks it up, watches the
+repository's HEAD, index, packed-refs and refs/heads with inotify, and
+rewrites DAEMON_DIR/<workspace>.line ("<pid>\\n<line>") whenever they
+change. Tracked-file edits do not touch any of those, so the dirty marker
+is also re-checked every RECHECK_INTERVAL seconds. The dirty check stats
+every index entry and may run git, so it runs in a worker thread: the
+branch is written at once and the marker when the check finishes. A
+workspace whose line has not been read for IDLE_TIMEOUT seconds is
+dropped again.
+
+Without inotify (not Linux, or --poll), the daemon stats the same files
+every POLL_INTERVAL seconds instead and keeps workspaces until it exits.
+
+Usage:
+    python3 status_daemon.py [--poll]
+"""
+
+import argparse
+import ctypes
+import errno
+import fcntl
+import os
+import queue
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+
+import status_line
+import git_metadata  # On sys.path via status_line
+
+# Seconds to wait after a change before re-rendering: a commit writes the
+# index, the branch ref and the reflog one after the other
+DEBOUNCE = 0.05
+
+# Re-check the dirty marker this often even without events
+RECHECK_INTERVAL = status_line.MAX_AGE
+
+# Drop a workspace whose line was not read for this many seconds
+IDLE_TIMEOUT = 600.0
+
+# Stat interval of the polling fallback
+POLL_INTERVAL = 1.0
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_OPEN = 0x00000020
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+GIT_DIR_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ONLYDIR
+REQUEST_DIR_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_OPEN | IN_ONLYDIR
+
+# Files directly in the git and common dirs that affect the line
+GIT_FILES = frozenset(('HEAD', 'index', 'packed-refs'))
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal ctypes binding of inotify(7); raises OSError where unavailable."""
+
+    def __init__(self):
+        try:
+            self._libc = ctypes.CDLL(None, use_errno=True)
+            init = self._libc.inotify_init1
+        except (OSError, AttributeError):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """[(wd, mask, name)] of the queued events; [] if there are none."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchedRepository:
+    """A repository with at least one active workspace."""
+
+    def __init__(self, worktree, git_dir):
+        self.worktree = worktree
+        self.git_dir = git_dir
+        self.workspaces = set()
+        self.wds = set()
+        self.common_dir = git_metadata.Repository(worktree, git_dir).common_dir
+        self.branch = None
+        self.dirty = ''
+        self.checked = 0.0
+        self.checking = False   # A dirty check is running in a worker thread
+        self.recheck = False    # Refreshed meanwhile: check again once it is done
+        self.key = None  # status_line.cache_key() at the last check (polling)
+
+    def watched_dirs(self):
+        """The directories whose changes affect the line."""
+        dirs = [self.git_dir]
+        if self.common_dir != self.git_dir:
+            dirs.append(self.common_dir)
+        for root, _subdirs, _files in os.walk(os.path.join(self.common_dir, 'refs', 'heads')):
+            dirs.append(root)
+        return dirs
+
+
+class StatusDaemon:
+    def __init__(self, directory, inotify=None):
+        self.directory = directory
+        self.inotify = inotify
+        self.workspaces = {}    # workspace path -> last read (monotonic)
+        self.lines = {}         # workspace path -> last written line
+        self.line_names = {}    # line file name -> workspace path
+        self.repos = {}         # git dir -> WatchedRepository
+        self.repo_of = {}       # workspace path -> git dir, or None
+        self.watches = {}       # wd -> (directory, is under refs/, set of git dirs)
+        self.request_wd = None  # Watch on `directory`
+        self.due = {}           # git dir -> monotonic time to re-render
+        self.checks = queue.SimpleQueue()  # (WatchedRepository, changed) of finished dirty checks
+        self.wakeup_lock = threading.Lock()
+        self.wakeup_w = None    # Write end of the loop's wakeup pipe while it runs
+        self.stopping = False
+
+    # Workspaces
+
+    def scan_requests(self):
+        """Adopt the workspaces of all pending .want files."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.want'):
+                self.take_request(name)
+
+    def take_request(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                workspace = f.read()
+            if not workspace:
+                return  # Still being written: taken again on the next poll or its close
+            os.unlink(path)
+        except OSError:
+            return  # Already taken
+        if os.path.isabs(workspace) and os.path.isdir(workspace):
+            self.add_workspace(workspace)
+
+    def add_workspace(self, workspace):
+        self.workspaces[workspace] = time.monotonic()
+        if workspace in self.repo_of:
+            return
+        self.line_names[os.path.basename(self.line_path(workspace))] = workspace
+        git_path = git_metadata.find_git_path(workspace)
+        git_dir = git_metadata.resolve_git_dir(git_path) if git_path else None
+        self.repo_of[workspace] = git_dir
+        if git_dir is None:
+            self.write_line(workspace, status_line.format_location(workspace, None, ''))
+            return
+        repo = self.repos.get(git_dir)
+        if repo is None:
+            repo = self.repos[git_dir] = WatchedRepository(os.path.dirname(git_path), git_dir)
+            self.watch(repo)
+        repo.workspaces.add(workspace)
+        self.refresh(repo)
+
+    def remove_workspace(self, workspace):
+        del self.workspaces[workspace]
+        self.lines.pop(workspace, None)
+        del self.line_names[os.path.basename(self.line_path(workspace))]
+        git_dir = self.repo_of.pop(workspace)
+        try:
+            os.unlink(self.line_path(workspace))
+        except OSError:
+            pass
+        repo = self.repos.get(git_dir)
+        if repo is None:
+            return
+        repo.workspaces.discard(workspace)
+        if not repo.workspaces:
+            self.unwatch(repo)
+            del self.repos[git_dir]
+            self.due.pop(git_dir, None)
+
+    def drop_idle(self, now):
+        if self.inotify is None:
+            return  # Reads are only seen through inotify
+        for workspace, last_read in list(self.workspaces.items()):
+            if now - last_read > IDLE_TIMEOUT:
+                self.remove_workspace(workspace)
+
+    # Watches
+
+    def watch(self, repo):
+        if self.inotify is None:
+            return
+        refs_dir = os.path.join(repo.common_dir, 'refs', 'heads')
+        for directory in repo.watched_dirs():
+            self.add_watch(repo, directory, is_refs=directory.startswith(refs_dir))
+
+    def add_watch(self, repo, directory, is_refs):
+        try:
+            wd = self.inotify.add_watch(directory, GIT_DIR_MASK)
+        except OSError:
+            return
+        # The same directory (a shared common dir) yields the same wd
+        self.watches.setdefault(wd, (directory, is_refs, set()))[2].add(repo.git_dir)
+        repo.wds.add(wd)
+
+    def unwatch(self, repo):
+        for wd in repo.wds:
+            directory, is_refs, git_dirs = self.watches[wd]
+            git_dirs.discard(repo.git_dir)
+            if not git_dirs:
+                del self.watches[wd]
+                self.inotify.rm_watch(wd)
+        repo.wds.clear()
+
+    def handle_events(self, events, now):
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: check everything
+                self.scan_requests()
+                for git_dir in self.repos:
+                    self.schedule(git_dir, now)
+                continue
+            if wd == self.request_wd:
+                self.handle_request_event(mask, name, now)
+                continue
+            watched = self.watches.get(wd)
+            if watched is None:
+                continue
+            directory, is_refs, git_dirs = watched
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                for git_dir in git_dirs:
+                    if git_dir in self.repos:
+                        self.repos[git_dir].wds.discard(wd)
+                continue
+            if mask & IN_ISDIR:
+                if is_refs and mask & (IN_CREATE | IN_MOVED_TO):
+                    # New branch namespace, e.g. refs/heads/feature/
+                    for git_dir in list(git_dirs):
+                        self.add_watch(self.repos[git_dir], os.path.join(directory, name), is_refs=True)
+                continue
+            if name.endswith('.lock') or not (is_refs or name in GIT_FILES):
+                continue
+            for git_dir in git_dirs:
+                self.schedule(git_dir, now + DEBOUNCE)
+
+    def handle_request_event(self, mask, name, now):
+        if name.endswith('.want') and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.take_request(name)
+        elif mask & IN_OPEN and name in self.line_names:
+            self.workspaces[self.line_names[name]] = now
+
+    # Rendering
+
+    def schedule(self, git_dir, when):
+        self.due[git_dir] = min(self.due.get(git_dir, when), when)
+
+    def refresh(self, repo):
+        """Re-read the repository and rewrite the lines of its workspaces."""
+        self.due.pop(repo.git_dir, None)
+        # Keyed before reading, so a change made meanwhile is seen by the next poll
+        repo.key = status_line.cache_key(repo.worktree, repo.git_dir)
+        repo.checked = time.monotonic()
+        try:
+            repo.branch = git_metadata.Repository(repo.worktree, repo.git_dir).short_head()
+        except (OSError, ValueError) as e:
+            print(f"Cannot read {repo.git_dir}: {e!r}", file=sys.stderr)
+            repo.branch = None
+        else:
+            if repo.branch:
+                self.start_check(repo)
+            else:
+                repo.dirty = ''
+        self.write_lines(repo)
+
+    def write_lines(self, repo):
+        for workspace in repo.workspaces:
+            self.write_line(workspace, status_line.format_location(workspace, repo.branch, repo.dirty))
+
+    def start_check(self, repo):
+        """Run the dirty check of `repo` in a worker thread, one at a time."""
+        if repo.checking:
+            repo.recheck = True
+            return
+        repo.checking = True
+        meta = git_metadata.Repository(repo.worktree, repo.git_dir)
+        threading.Thread(target=self.check_dirty, args=(repo, meta), daemon=True).start()
+
+    def check_dirty(self, repo, meta):
+        """Worker thread: hand the dirty check's result to the loop and wake it."""
+        try:
+            changed = meta.has_tracked_changes(run_git=True)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read {repo.git_dir}: {e!r}", file=sys.stderr)
+            changed = None
+        self.checks.put((repo, changed))
+        with self.wakeup_lock:
+            if self.wakeup_w is not None:
+                try:
+                    os.write(self.wakeup_w, b'\0')
+                except BlockingIOError:
+                    pass  # Already woken
+
+    def apply_checks(self):
+        """Write the markers of the dirty checks finished since the last call."""
+        while True:
+            try:
+                repo, changed = self.checks.get_nowait()
+            except queue.Empty:
+                return
+            repo.checking = False
+            if self.repos.get(repo.git_dir) is not repo:
+                continue  # Dropped meanwhile
+            if changed is not None:  # Unknown (e.g. split index): keep the last value
+                repo.dirty = '*' if changed else ''
+            self.write_lines(repo)
+            if repo.recheck:
+                repo.recheck = False
+                self.start_check(repo)
+
+    def line_path(self, workspace):
+        return os.path.join(self.directory, status_line.escape_path(workspace) + '.line')
+
+    def write_line(self, workspace, line):
+        if self.lines.get(workspace) == line:
+            return
+        path = self.line_path(workspace)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{os.getpid()}\n{line}')
+        os.replace(tmp_path, path)
+        self.lines[workspace] = line
+
+    def poll(self, now):
+        """Polling fallback: schedule repositories whose files changed."""
+        self.scan_requests()
+        for git_dir, repo in self.repos.items():
+            if status_line.cache_key(repo.worktree, git_dir) != repo.key:
+                self.schedule(git_dir, now)
+
+    def run_due(self, now):
+        for git_dir, repo in self.repos.items():
+            if now - repo.checked >= RECHECK_INTERVAL:
+                self.schedule(git_dir, now)
+        for git_dir, when in list(self.due.items()):
+            if when <= now and git_dir in self.repos:
+                self.refresh(self.repos[git_dir])
+
+    def next_timeout(self, now):
+        deadlines = list(self.due.values())
+        deadlines += [repo.checked + RECHECK_INTERVAL for repo in self.repos.values()]
+        if self.inotify is None:
+            deadlines.append(now + POLL_INTERVAL)
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    # Main loop
+
+    def run(self):
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_w, False)
+        old_wakeup = signal.set_wakeup_fd(wakeup_w)
+        self.wakeup_w = wakeup_w
+        self.request_wd = None
+        if self.inotify is not None:
+            self.request_wd = self.inotify.add_watch(self.directory, REQUEST_DIR_MASK)
+        try:
+            self.scan_requests()
+            fds = [wakeup_r] + ([self.inotify.fd] if self.inotify is not None else [])
+            while not self.stopping:
+                ready, _, _ = select.select(fds, [], [], self.next_timeout(time.monotonic()))
+                now = time.monotonic()
+                if wakeup_r in ready:
+                    os.read(wakeup_r, 512)
+                    self.apply_checks()
+                if self.inotify is None:
+                    self.poll(now)
+                elif self.inotify.fd in ready:
+                    self.handle_events(self.inotify.read_events(), now)
+                self.run_due(now)
+                self.drop_idle(now)
+        finally:
+            signal.set_wakeup_fd(old_wakeup)
+            with self.wakeup_lock:
+                self.wakeup_w = None
+            os.close(wakeup_r)
+            os.close(wakeup_w)
+            for workspace in list(self.workspaces):
+                self.remove_workspace(workspace)
+
+
+def serve(directory, use_inotify=True, install_signals=True):
+    """Run the daemon on `directory` until SIGTERM/SIGINT; returns the exit code."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    lock = open(os.path.join(directory, 'daemon.lock'), 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print(f"Status daemon already running on {directory}", file=sys.stderr)
+        lock.close()
+        return 1
+
+    # Lines left by a daemon that did not exit cleanly
+    for name in os.listdir(directory):
+        if name.endswith('.line') or name.endswith('.tmp'):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    inotify = None
+    if use_inotify:
+        try:
+            inotify = Inotify()
+        except OSError as e:
+            print(f"inotify unavailable ({e}); polling every {POLL_INTERVAL}s", file=sys.stderr)
+    daemon = StatusDaemon(directory, inotify)
+
+    def stop(signum, frame):
+        daemon.stopping = True
+
+    if install_signals:
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+    print(f"Status daemon writing lines to {directory}", file=sys.stderr)
+    try:
+        daemon.run()
+    finally:
+        if inotify is not None:
+            inotify.close()
+        lock.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resident status line daemon')
+    parser.add_argument('--poll', action='store_true', help='Stat files periodically instead of using inotify')
+    args = parser.parse_args()
+    sys.exit(serve(status_line.DAEMON_DIR, use_inotify=not args.poll))
+
+
+if __name__ == '__main__':
+    main()
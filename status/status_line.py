@@ -1,82 +1,213 @@
 #!/usr/bin/env python3
+"""
+Claude Code status line: "[model] 📁 dir | 🌿 branch*".
+
+Repository metadata is read in-process by hooks/git_metadata.py; a render
+never runs git. The dirty marker (*) means a tracked file differs from the
+index or something is staged (git_metadata.Repository.has_tracked_changes).
+That check stats every index entry, which can take a while in a large
+repository, and may have to ask `git diff --cached` whether something is
+staged, so a render does not run it. The last result is cached per
+repository under CACHE_DIR, keyed on the mtime and size of the git index,
+HEAD and the working tree root. When the key no longer matches, or the
+value is older than MAX_AGE seconds, the render shows the cached value
+followed by STALE_MARKER and a detached background process re-checks and
+updates the cache for the next render.
+
+When status_daemon.py is running, it keeps the whole "📁 dir | 🌿 branch*"
+part precomputed per workspace in DAEMON_DIR, and a render only reads that
+file. A workspace the daemon does not know yet is rendered as above and
+handed to the daemon with a request file.
+
+More segments (ahead/behind, stash, commit age, context usage, spec
+progress) can be appended with CLAUDE_STATUS_SEGMENTS; segments.py renders
+them within a fixed time budget.
+"""
+
 import json
 import os
-import subprocess
 import sys
+import time
+
+# git_metadata lives in hooks/ (next to this file in the zipapp bundle); it
+# is imported only when the daemon has no line for the workspace
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hooks'))
+
+# Per-user directory for the dirty-state cache (override with CLAUDE_STATUS_CACHE_DIR)
+CACHE_DIR = os.environ.get('CLAUDE_STATUS_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or '/tmp', f'claude-status-{os.getuid()}')
 
+# Precomputed lines written by status_daemon.py
+DAEMON_DIR = os.path.join(CACHE_DIR, 'daemon')
 
-def find_git_dir(start_path):
-    """Walk up directories to find .git folder or file (for submodules)."""
-    path = os.path.abspath(start_path)
-    while path != "/":
-        git_path = os.path.join(path, ".git")
-        if os.path.exists(git_path):
-            return git_path
-        path = os.path.dirname(path)
-    return None
+# Re-check a matching cache entry once it is this many seconds old: edits in
+# subdirectories do not change the key
+MAX_AGE = 30.0
 
+# A refresh that has not finished after this many seconds is assumed dead
+REFRESH_TIMEOUT = 60.0
 
-def get_git_branch(git_path):
-    """Get branch name or short commit hash for detached HEAD."""
-    # Handle submodules where .git is a file pointing to the real git dir
-    if os.path.isfile(git_path):
+# Shown after the dirty marker while the value is being re-checked
+STALE_MARKER = '?'
+
+
+def cache_key(repo_root, git_dir):
+    """[mtime_ns, size] of the index, HEAD and the working tree root."""
+    key = []
+    for path in (os.path.join(git_dir, "index"), os.path.join(git_dir, "HEAD"), repo_root):
         try:
-            with open(git_path, "r") as f:
-                content = f.read().strip()
-                if content.startswith("gitdir: "):
-                    git_path = content.replace("gitdir: ", "")
-        except:
-            return ""
-
-    head_path = os.path.join(git_path, "HEAD") if os.path.isdir(git_path) else git_path
-    if not os.path.isdir(git_path):
-        return ""
-
-    head_path = os.path.join(git_path, "HEAD")
+            st = os.stat(path)
+            key.append([st.st_mtime_ns, st.st_size])
+        except OSError:
+            key.append(None)
+    return key
+
+
+def escape_path(path):
+    # Escaped rather than hashed: no hashlib import on the render path
+    return path.replace('%', '%25').replace('/', '%2F')
+
+
+def cache_path(repo_root):
+    return os.path.join(CACHE_DIR, escape_path(repo_root) + '.json')
+
+
+def read_daemon_line(workspace_dir):
+    """
+    The daemon's precomputed line for `workspace_dir`, or None if there is
+    none or the daemon that wrote it ("<pid>\n<line>") is gone.
+    """
+    try:
+        with open(os.path.join(DAEMON_DIR, escape_path(workspace_dir) + '.line'), encoding='utf-8') as f:
+            pid, _, line = f.read().partition('\n')
+        os.kill(int(pid), 0)
+    except PermissionError:
+        pass  # Running, as another user
+    except (OSError, ValueError):
+        return None
+    return line
+
+
+def request_watch(workspace_dir):
+    """Ask a running daemon to watch `workspace_dir`; a no-op without one."""
+    try:
+        fd = os.open(os.path.join(DAEMON_DIR, escape_path(workspace_dir) + '.want'),
+                     os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except OSError:
+        return  # No daemon directory, or already requested
     try:
-        with open(head_path, "r") as f:
-            ref = f.read().strip()
-            if ref.startswith("ref: refs/heads/"):
-                return ref.replace("ref: refs/heads/", "")
-            else:
-                # Detached HEAD - return short commit hash
-                return ref[:7]
-    except:
-        return ""
-
-
-def get_dirty_status(git_dir):
-    """Check if working tree has uncommitted changes."""
+        os.write(fd, workspace_dir.encode('utf-8'))
+    finally:
+        os.close(fd)
+
+
+def read_cache(repo_root):
+    try:
+        with open(cache_path(repo_root)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return entry if isinstance(entry, dict) else {}
+
+
+def write_cache(repo_root, entry):
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    path = cache_path(repo_root)
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+
+def refresh_dirty_status(repo, entry):
+    """Check for tracked changes and store the result with the key it was computed for."""
+    # Keyed before the check: a change made while it runs no longer matches the key
+    key = cache_key(repo.worktree, repo.git_dir)
+    changed = repo.has_tracked_changes(run_git=True)
+    entry = {'key': key, 'checked_at': time.time(),
+             # Unknown (e.g. split index): keep showing the last value
+             'dirty': entry.get('dirty', '') if changed is None else '*' if changed else ''}
+    write_cache(repo.worktree, entry)
+
+
+def run_detached(function, *args):
+    """Call `function(*args)` in a detached child process; returns at once."""
+    if not hasattr(os, 'fork'):
+        function(*args)
+        return
+    if os.fork() > 0:
+        return
     try:
-        # Get the repo root from git_dir
-        repo_root = os.path.dirname(git_dir) if git_dir.endswith(".git") else os.path.dirname(git_dir)
-        result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            cwd=repo_root,
-            capture_output=True,
-            text=True,
-            timeout=0.5
-        )
-        return "*" if result.stdout.strip() else ""
-    except:
-        return ""
-
-
-# Read JSON from stdin
-data = json.load(sys.stdin)
-
-# Extract values
-model = data["model"]["display_name"]
-workspace_dir = data["workspace"]["current_dir"]
-current_dir = os.path.basename(workspace_dir)
-
-# Find git directory by walking up from workspace
-git_branch = ""
-git_path = find_git_dir(workspace_dir)
-if git_path:
-    branch = get_git_branch(git_path)
-    if branch:
-        dirty = get_dirty_status(git_path)
-        git_branch = f" | \U0001F33F {branch}{dirty}"
-
-print(f"[{model}] \U0001F4C1 {current_dir}{git_branch}")
+        os.setsid()
+        # Claude Code reads the status line until stdout closes: don't hold it open
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        function(*args)
+    finally:
+        os._exit(0)
+
+
+def start_refresh(repo, entry):
+    """Refresh the cache in a detached child process; returns at once."""
+    write_cache(repo.worktree, dict(entry, refreshing_since=time.time()))
+    run_detached(refresh_dirty_status, repo, entry)
+
+
+def get_dirty_status(repo):
+    """The cached dirty marker, with STALE_MARKER appended while it is re-checked."""
+    entry = read_cache(repo.worktree)
+    now = time.time()
+    fresh = (entry.get('key') == cache_key(repo.worktree, repo.git_dir)
+             and now - entry.get('checked_at', 0) < MAX_AGE)
+    if fresh:
+        return entry.get('dirty', '')
+
+    refreshing = now - (entry.get('refreshing_since') or 0) < REFRESH_TIMEOUT
+    if not refreshing:
+        try:
+            start_refresh(repo, entry)
+        except OSError:
+            pass
+    return entry.get('dirty', '') + STALE_MARKER
+
+
+def format_location(workspace_dir, branch, dirty):
+    """The "📁 dir | 🌿 branch*" part of the line."""
+    git_branch = f" | \U0001F33F {branch}{dirty}" if branch else ""
+    return f"\U0001F4C1 {os.path.basename(workspace_dir)}{git_branch}"
+
+
+def render_location(workspace_dir):
+    """format_location() with the cached dirty marker (see get_dirty_status)."""
+    import git_metadata
+
+    # Find the repository by walking up from workspace
+    repo = git_metadata.find_repository(workspace_dir)
+    branch = repo.short_head() if repo else None
+    return format_location(workspace_dir, branch, get_dirty_status(repo) if branch else '')
+
+
+def main():
+    # Read JSON from stdin
+    data = json.load(sys.stdin)
+
+    # Extract values
+    model = data["model"]["display_name"]
+    workspace_dir = data["workspace"]["current_dir"]
+
+    location = read_daemon_line(workspace_dir)
+    if location is None:
+        location = render_location(workspace_dir)
+        request_watch(workspace_dir)
+
+    segment_names = os.environ.get('CLAUDE_STATUS_SEGMENTS')
+    if segment_names:
+        import segments
+        location += ''.join(f" | {text}" for text in segments.render(data, workspace_dir, segment_names.split(',')))
+
+    print(f"[{model}] {location}")
+
+
+if __name__ == '__main__':
+    main()